@@ -7,7 +7,7 @@ from django.utils.translation import gettext_lazy as _
 from easy_thumbnails.fields import ThumbnailerImageField
 from model_utils import Choices
 from model_utils.models import (
-    TimeStampedModel, SoftDeletableModel
+    TimeStampedModel
 )
 from mptt.fields import TreeForeignKey
 from taggit.managers import TaggableManager
@@ -151,7 +151,7 @@ class Category(common_models.AbstractCategory):
         return self.title
 
 
-class Post(SoftDeletableModel, common_models.AbstractPage):
+class Post(common_models.SoftDeletableModel, common_models.AbstractPage):
     STATUS_CHOICES = Choices(
         (0, 'draft', _('draft')),
         (1, 'published', _('published')),
@@ -243,7 +243,7 @@ class Post(SoftDeletableModel, common_models.AbstractPage):
         return self.title
 
 
-class Comment(SoftDeletableModel, common_models.AbstractComment):
+class Comment(common_models.SoftDeletableModel, common_models.AbstractComment):
     post = models.ForeignKey(
         'blog.Post',
         verbose_name=_('post'),
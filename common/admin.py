@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from common import models
+
+
+class BatchCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'position', 'processed', 'modified')
+    search_fields = ('name',)
+    ordering = ['name']
+
+
+admin.site.register(models.BatchCheckpoint, BatchCheckpointAdmin)
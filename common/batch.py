@@ -0,0 +1,18 @@
+def keyset_chunks(queryset, chunk_size, key='pk', start=None):
+    # Walk a queryset in key order without OFFSET so every chunk is an index range scan
+    last = start
+
+    while True:
+        chunk_queryset = queryset.order_by(key)
+
+        if last is not None:
+            chunk_queryset = chunk_queryset.filter(**{f'{key}__gt': last})
+
+        keys = list(chunk_queryset.values_list(key, flat=True)[:chunk_size])
+
+        if not keys:
+            return
+
+        yield keys
+
+        last = keys[-1]
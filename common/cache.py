@@ -0,0 +1,11 @@
+from django.core.cache import cache
+
+
+def incr(key, timeout):
+    # Atomic counter: a single INCR once the key exists, add() creates it without a race
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from common import softdelete
+
+
+class Command(BaseCommand):
+    help = 'List soft-deletable models without an index leading with is_removed and suggest one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--counts', action='store_true', help='Count live and removed rows of each model')
+
+    def handle(self, *args, **options):
+        missing = 0
+
+        for model in softdelete.soft_deletable_models():
+            fields = softdelete.suggested_index(model)
+
+            if options['counts']:
+                live, removed = softdelete.removed_counts(model)
+                self.stdout.write(f'{model._meta.label}: {live} live, {removed} removed')
+
+            if fields is None:
+                continue
+
+            missing += 1
+
+            self.stdout.write(self.style.WARNING(
+                f'{model._meta.label}: models.Index(fields=[{", ".join(repr(f) for f in fields)}, ]),'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(f'{missing} models without an is_removed index'))
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from common import softdelete
+
+
+class Command(BaseCommand):
+    help = 'Hard delete rows soft-deleted longer ago than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='app_label.Model; every soft-deletable model by default')
+        parser.add_argument('--days', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        days = options['days']
+
+        if days is None:
+            days = getattr(settings, 'SOFT_DELETE_RETENTION_DAYS', 365)
+
+        before = now() - timedelta(days=days)
+
+        models = [apps.get_model(label) for label in options['models']] or softdelete.soft_deletable_models()
+
+        for model in models:
+            if model not in softdelete.soft_deletable_models():
+                raise CommandError(f'{model._meta.label} is not soft-deletable')
+
+        total = 0
+
+        for model in models:
+            deleted = sum(softdelete.purge(model, before, options['batch_size']))
+            total += deleted
+
+            if deleted:
+                self.stdout.write(f'{model._meta.label}: {deleted}')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} soft-deleted rows purged'))
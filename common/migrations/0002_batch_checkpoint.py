@@ -0,0 +1,30 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:04
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='batch name')),
+                ('position', models.BigIntegerField(default=0, verbose_name='position')),
+                ('processed', models.BigIntegerField(default=0, verbose_name='processed count')),
+            ],
+            options={
+                'verbose_name': 'batch checkpoint',
+                'verbose_name_plural': 'batch checkpoints',
+            },
+        ),
+    ]
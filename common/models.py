@@ -2,8 +2,11 @@ import uuid
 
 from django.conf import settings
 from django.db import models
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from model_utils import Choices
+from model_utils import managers as model_utils_managers
+from model_utils import models as model_utils_models
 from model_utils.models import TimeStampedModel
 from mptt.fields import TreeForeignKey
 from mptt.models import MPTTModel
@@ -65,6 +68,25 @@ class MenuItem(MPTTModel):
         return self.title
 
 
+class SoftDeletableQuerySet(model_utils_managers.SoftDeletableQuerySet):
+    def delete(self):
+        # Stamp the removal time like an instance delete does through save(); purges age removed rows by `modified`
+        return self.update(is_removed=True, modified=now())
+
+
+class SoftDeletableManager(model_utils_managers.SoftDeletableManager):
+    _queryset_class = SoftDeletableQuerySet
+
+
+class SoftDeletableModel(model_utils_models.SoftDeletableModel):
+    # For models with a `modified` field, i.e. with TimeStampedModel
+    objects = SoftDeletableManager(_emit_deprecation_warnings=True)
+    available_objects = SoftDeletableManager()
+
+    class Meta:
+        abstract = True
+
+
 class AbstractPage(TimeStampedModel):
     title = models.CharField(
         verbose_name=_('title'),
@@ -248,3 +270,29 @@ class Google(TimeStampedModel):
     class Meta:
         verbose_name = _('Google Service')
         verbose_name_plural = _('Google Services')
+
+
+class BatchCheckpoint(TimeStampedModel):
+    name = models.CharField(
+        verbose_name=_('batch name'),
+        max_length=64,
+        unique=True,
+    )
+
+    # Last key processed by the batch, e.g. a primary key or a legacy customer id
+    position = models.BigIntegerField(
+        verbose_name=_('position'),
+        default=0,
+    )
+
+    processed = models.BigIntegerField(
+        verbose_name=_('processed count'),
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = _('batch checkpoint')
+        verbose_name_plural = _('batch checkpoints')
+
+    def __str__(self):
+        return f'{self.name} {self.position}'
@@ -0,0 +1,21 @@
+from django.conf import settings
+
+
+def client_ip(request):
+    """
+    The client address of a request.
+
+    Behind proxies, UNDER_ATTACK_IP_HEADER names the forwarding header and
+    UNDER_ATTACK_PROXY_COUNT the number of trusted proxies appending to it. The client
+    address is the hop added by the outermost trusted proxy; hops to its left are
+    supplied by the client and ignored.
+    """
+    header = getattr(settings, 'UNDER_ATTACK_IP_HEADER', None)
+
+    if header and header in request.META:
+        hops = [hop.strip() for hop in request.META[header].split(',') if hop.strip()]
+
+        if hops:
+            return hops[-min(getattr(settings, 'UNDER_ATTACK_PROXY_COUNT', 1), len(hops))]
+
+    return request.META.get('REMOTE_ADDR', '')
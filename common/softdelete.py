@@ -0,0 +1,102 @@
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+from django.db.models import Count, Exists, OuterRef
+from model_utils.models import SoftDeletableModel
+
+from common.batch import keyset_chunks
+
+# Columns that follow is_removed in a suggested index, in this order, when the model has them
+LEADING_FILTERS = ('status', 'created')
+
+
+def soft_deletable_models():
+    return [model for model in apps.get_models() if issubclass(model, SoftDeletableModel)]
+
+
+def has_field(model, name):
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+
+    return True
+
+
+def indexed_columns(model):
+    # Column lists of every index of a model: Meta.indexes, index_together, unique_together and single fields
+    columns = [tuple(index.fields) for index in model._meta.indexes]
+    columns += [tuple(fields) for fields in model._meta.index_together]
+    columns += [tuple(fields) for fields in model._meta.unique_together]
+    columns += [(field.name,) for field in model._meta.concrete_fields
+                if field.db_index or field.unique or field.primary_key]
+
+    return columns
+
+
+def suggested_index(model):
+    """
+    Fields of a composite index leading with is_removed, or None when one exists already.
+
+    Managers of soft-deletable models filter on is_removed in every query, so an index
+    on the other common filters alone still reads removed rows from the table.
+    """
+    if any(columns[0] == 'is_removed' for columns in indexed_columns(model)):
+        return None
+
+    return ['is_removed'] + [name for name in LEADING_FILTERS if has_field(model, name)]
+
+
+def removed_counts(model):
+    # (live, removed) row counts in one grouped query
+    counts = dict(model.all_objects.values_list('is_removed').annotate(count=Count('pk')).order_by())
+    return counts.get(False, 0), counts.get(True, 0)
+
+
+def protected_relations(model):
+    # Reverse relations blocking a hard delete of the model
+    return [relation for relation in model._meta.related_objects
+            if relation.on_delete == models.PROTECT]
+
+
+def cascading_relations(model):
+    # Reverse relations from the model to itself deleting its referencing rows, such as Order.parent
+    return [relation for relation in model._meta.related_objects
+            if relation.on_delete == models.CASCADE and relation.related_model is model]
+
+
+def purgeable(model, before):
+    """
+    Rows removed before `before`; soft deletes stamp `modified` with the removal time.
+
+    Rows referenced through PROTECT are left, and so are rows whose delete would
+    cascade to live rows of their own model, such as the refund orders of an order.
+    """
+    queryset = model.all_objects.filter(is_removed=True, modified__lt=before)
+
+    for relation in protected_relations(model):
+        queryset = queryset.exclude(Exists(
+            relation.related_model._base_manager.filter(**{relation.field.name: OuterRef('pk')})
+        ))
+
+    for relation in cascading_relations(model):
+        queryset = queryset.exclude(Exists(
+            model.all_objects.filter(**{relation.field.name: OuterRef('pk'), 'is_removed': False})
+        ))
+
+    return queryset
+
+
+def purge(model, before, batch_size=1000):
+    """
+    Hard delete soft-deleted rows in primary key batches, one transaction each.
+
+    Deletes cascade like any delete, so the rows of a removed order go with it. Each
+    batch is filtered by purgeable again, so a row restored or newly referenced since
+    it was picked is kept. Yields the number of rows of the model deleted by each batch.
+    """
+    for ids in keyset_chunks(purgeable(model, before), batch_size):
+        with transaction.atomic():
+            _, deleted = purgeable(model, before).filter(pk__in=ids).delete()
+
+        yield deleted.get(model._meta.label, 0)
@@ -51,6 +51,7 @@ INSTALLED_APPS += [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'shop.middleware.UnderAttackMiddleware',  # before session, auth and OTP
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # i18n
     'django.middleware.common.CommonMiddleware',
@@ -163,3 +164,57 @@ LOGGING = {
 
 # Django allauth
 SITE_ID = 1
+
+# Store
+STORE_CODE = 'default'
+STORE_FLAGS_LOCAL_TTL = 5  # seconds
+
+# Rate limiting while Store.under_attack is set
+UNDER_ATTACK_IP_CAPACITY = 60  # requests per period
+UNDER_ATTACK_SESSION_CAPACITY = 30  # requests per period
+UNDER_ATTACK_PERIOD = 60  # seconds
+UNDER_ATTACK_CHALLENGE = True
+UNDER_ATTACK_EXEMPT_PATHS = ('/shop/payments/', )  # payment gateway callbacks
+UNDER_ATTACK_IP_HEADER = None  # e.g. 'HTTP_X_FORWARDED_FOR' behind a trusted proxy
+UNDER_ATTACK_PROXY_COUNT = 1  # trusted proxies appending to UNDER_ATTACK_IP_HEADER
+
+# Ban list
+BAN_LIST_VERSION_CHECK = 10  # seconds
+BAN_LIST_MAX_AGE = 60 * 60  # seconds
+
+# Signups reject banned email addresses
+ACCOUNT_ADAPTER = 'member.adapters.AccountAdapter'
+SOCIALACCOUNT_ADAPTER = 'member.adapters.SocialAccountAdapter'
+
+# Mileage
+MILEAGE_EXPIRATION_DAYS = 365
+MILEAGE_CHECKPOINT_LAG = 60 * 60  # seconds; checkpoints cover logs older than this
+
+# Refresh tokens
+REFRESH_TOKEN_TTL = 14 * 24 * 60 * 60  # seconds
+REFRESH_TOKEN_INVALID_TTL = 60  # seconds an unknown token stays cached as invalid
+
+# Login logs
+LOGIN_LOG_BUFFER_SIZE = 100
+LOGIN_LOG_FLUSH_INTERVAL = 5  # seconds
+
+# Order fraud scoring
+FRAUD_SUSPICIOUS_SCORE = 50
+
+# Bank deposit matching
+DEPOSIT_MATCH_DAYS = 3
+
+# Customers-also-bought recommendations
+RECOMMENDATION_CACHE_TTL = 24 * 60 * 60
+
+# Voucher holds of pending orders
+VOUCHER_HOLD_TTL = 30 * 60
+
+# Cold archive of closed orders and sold vouchers
+ARCHIVE_AFTER_DAYS = 90
+
+# Purge of soft-deleted rows
+SOFT_DELETE_RETENTION_DAYS = 365
+
+# Payment gateway callbacks
+PAYMENT_CALLBACK_SECRET = secrets.get('paymentCallbackSecret', '')
@@ -1,6 +1,6 @@
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from django.conf import settings
 from conf.views import HomeView
 
@@ -9,6 +9,7 @@ urlpatterns = [
 ]
 
 urlpatterns += [
+    path('shop/', include('shop.urls')),
     path('', HomeView.as_view(), name='home'),
 ]
 
@@ -0,0 +1,25 @@
+from allauth.account.adapter import DefaultAccountAdapter
+from allauth.socialaccount.adapter import DefaultSocialAccountAdapter
+from django import forms
+from django.utils.translation import gettext_lazy as _
+
+from member import bans
+
+
+class AccountAdapter(DefaultAccountAdapter):
+    def clean_email(self, email):
+        email = super(AccountAdapter, self).clean_email(email)
+
+        if bans.is_email_banned(email):
+            raise forms.ValidationError(_('This email address cannot be used to sign up.'))
+
+        return email
+
+
+class SocialAccountAdapter(DefaultSocialAccountAdapter):
+    def is_auto_signup_allowed(self, request, sociallogin):
+        # A banned address goes through the signup form, where AccountAdapter.clean_email rejects it
+        if bans.is_email_banned(sociallogin.user.email):
+            return False
+
+        return super(SocialAccountAdapter, self).is_auto_signup_allowed(request, sociallogin)
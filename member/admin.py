@@ -1,31 +1,84 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.contrib.admin.filters import SimpleListFilter
+from django.core.exceptions import PermissionDenied
+from django.db.models import Case, When, Value, TextField
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import linebreaksbr
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
+from easy_thumbnails.files import get_thumbnailer
 
+from . import bans
+from . import verification
 from .models import (
     Profile, LoginLog, PhoneVerificationLog, Mms, MmsData, EmailBanned, PhoneBanned
 )
 
 
-class MmsDataInline(admin.TabularInline):
+# Text bodies only; image payloads are never read from the data column
+MMS_TEXT = Case(When(mime=MmsData.MIME_CHOICES.txt, then='data'), default=Value(''), output_field=TextField())
+
+
+class MmsDataPreviewMixin:
+    def preview(self, instance):
+        if instance.mime == MmsData.MIME_CHOICES.txt:
+            # `text` comes from the MMS_TEXT annotation; the default of getattr() would load the deferred data
+            return linebreaksbr(instance.text if hasattr(instance, 'text') else instance.data)
+
+        if instance.file:
+            # The browser fetches thumbnails only when they scroll into view
+            return format_html(
+                '<a href="{}"><img src="{}" loading="lazy" alt="{}"></a>',
+                instance.file.url,
+                reverse('admin:member_mmsdata_thumbnail', args=(instance.pk,)),
+                instance.get_mime_display(),
+            )
+
+        return '-'
+
+    preview.short_description = _('data')
+
+
+class MmsDataInline(MmsDataPreviewMixin, admin.TabularInline):
     model = MmsData
     extra = 0
+    fields = ('mime', 'preview', 'size', 'sha256')
+    readonly_fields = ('mime', 'preview', 'size', 'sha256')
+
+    def get_queryset(self, request):
+        return super(MmsDataInline, self).get_queryset(request) \
+            .defer('data') \
+            .annotate(text=MMS_TEXT)
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('phone', 'phone_verified_status', 'document_verified')
-    list_filter = ('phone_verified_status', 'document_verified', 'not_purchased_months', 'allow_order')
+    list_display = ('phone', 'phone_verified_status', 'document_verified', 'rfm_segment')
+    list_filter = ('phone_verified_status', 'document_verified', 'not_purchased_months', 'allow_order', 'rfm_segment')
     search_fields = ('user__email', 'phone')
-    readonly_fields = ('user', 'document_verified', 'not_purchased_months', 'mileage')
+    readonly_fields = ('user', 'document_verified', 'not_purchased_months', 'mileage', 'linked_accounts',
+                       'rfm_recency', 'rfm_frequency', 'rfm_monetary', 'rfm_segment', 'rfm_updated')
     ordering = ['-created']
 
     fieldsets = (
         (_('Account'), {
-            'fields': ('user', 'phone_verified_status', 'document_verified', 'not_purchased_months', 'allow_order')
+            'fields': ('user', 'phone_verified_status', 'document_verified', 'not_purchased_months', 'allow_order',
+                       'linked_accounts')
         }),
         (_('Profile'), {
             'fields': ('phone', 'address', 'mileage', 'memo', 'first_purchased', 'last_purchased')
         }),
+        (_('Segment'), {
+            'fields': ('rfm_segment', 'rfm_recency', 'rfm_frequency', 'rfm_monetary', 'rfm_updated')
+        }),
     )
 
     def get_queryset(self, request):
@@ -42,11 +95,48 @@ class ProfileAdmin(admin.ModelAdmin):
 
     phone_verified_status.short_description = _('phone verified')
 
+    def linked_accounts(self, instance):
+        return verification.format_accounts(verification.linked_accounts(instance.user))
+
+    linked_accounts.short_description = _('accounts with the same identity')
+
+
+class RecentLoginFilterSpec(SimpleListFilter):
+    title = _('login date')
+    parameter_name = 'days'
+    default = '30'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('1', _('Today'),),
+            ('7', _('Past 7 days'),),
+            ('30', _('Past 30 days'),),
+            ('365', _('Past year'),),
+            ('all', _('All'),),
+        )
+
+    def choices(self, changelist):
+        # No unfiltered default: without a choice only recent partitions are read
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': (self.value() or self.default) == lookup,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        value = self.value() or self.default
+
+        if value.isdigit():
+            return queryset.filter(created__gte=now() - timedelta(days=int(value)))
+        return queryset
+
 
 class LoginLogAdmin(admin.ModelAdmin):
     list_display = (
         'full_name', 'user', 'ip_address', 'created'
     )
+    list_filter = (RecentLoginFilterSpec,)
     list_select_related = ('user', 'user__profile')
     search_fields = ('user__email', 'ip_address')
     ordering = ['-created']
@@ -57,32 +147,71 @@ class LoginLogAdmin(admin.ModelAdmin):
             .filter(user__profile__isnull=False)
 
     def full_name(self, instance):
-        return '{} / {} / {}'.format(instance.user.profile.full_name, instance.user.email, instance.user.profile.phone)
+        return '{} / {} / {}'.format(instance.user.get_full_name(), instance.user.email, instance.user.profile.phone)
 
     full_name.short_description = _('Full name')
 
 
 class PhoneVerificationLogAdmin(admin.ModelAdmin):
     list_display = ('fullname', 'cellphone', 'telecom', 'gender', 'date_of_birth', 'created')
-    fields = ('owner', 'fullname', 'cellphone', 'telecom', 'date_of_birth', 'gender', 'domestic', 'token')
+    fields = ('owner', 'fullname', 'cellphone', 'telecom', 'date_of_birth', 'gender', 'domestic', 'token',
+              'linked_owners')
     list_filter = ('telecom', 'gender')
     search_fields = ('fullname', 'cellphone')
     readonly_fields = (
         'owner', 'fullname', 'date_of_birth', 'gender', 'domestic', 'telecom', 'cellphone',
         'token', 'code', 'reason', 'result_code', 'message', 'transaction_id', 'di', 'ci', 'return_message',
+        'linked_owners',
     )
     ordering = ['-created']
 
+    def linked_owners(self, instance):
+        return verification.format_accounts(verification.linked_owners(instance))
+
+    linked_owners.short_description = _('accounts with the same identity')
+
 
 class MmsAdmin(admin.ModelAdmin):
     list_display = ('cellphone', 'sent')
     search_fields = ('cellphone',)
+    date_hierarchy = 'sent'
     inlines = [MmsDataInline]
     ordering = ['-sent']
 
 
-class MmsDataAdmin(admin.ModelAdmin):
-    pass
+class MmsDataAdmin(MmsDataPreviewMixin, admin.ModelAdmin):
+    list_display = ('mms', 'mime', 'size', 'created')
+    list_filter = ('mime',)
+    list_select_related = ('mms',)
+    search_fields = ('mms__cellphone', 'sha256')
+    fields = ('mms', 'mime', 'preview', 'file', 'size', 'sha256')
+    readonly_fields = ('mms', 'mime', 'preview', 'file', 'size', 'sha256')
+    ordering = ['-created']
+
+    def get_queryset(self, request):
+        return super(MmsDataAdmin, self).get_queryset(request) \
+            .defer('data') \
+            .annotate(text=MMS_TEXT)
+
+    def get_urls(self):
+        return [
+            path('<path:object_id>/thumbnail/',
+                 self.admin_site.admin_view(self.thumbnail_view),
+                 name='member_mmsdata_thumbnail'),
+        ] + super(MmsDataAdmin, self).get_urls()
+
+    def thumbnail_view(self, request, object_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        instance = get_object_or_404(MmsData.objects.only('id', 'file'), pk=object_id)
+
+        if not instance.file:
+            raise Http404
+
+        thumbnail = get_thumbnailer(instance.file).get_thumbnail({'size': (160, 160)})
+
+        return HttpResponseRedirect(thumbnail.url)
 
 
 class EmailBannedAdmin(admin.ModelAdmin):
@@ -91,6 +220,11 @@ class EmailBannedAdmin(admin.ModelAdmin):
     readonly_fields = ('is_removed', 'created')
     ordering = ['-created']
 
+    def delete_queryset(self, request, queryset):
+        # Bulk soft delete is an UPDATE and sends no signals
+        super(EmailBannedAdmin, self).delete_queryset(request, queryset)
+        bans.bump_version()
+
 
 class PhoneBannedAdmin(admin.ModelAdmin):
     list_display = ('phone', 'created')
@@ -98,6 +232,11 @@ class PhoneBannedAdmin(admin.ModelAdmin):
     readonly_fields = ('is_removed', 'created')
     ordering = ['-created']
 
+    def delete_queryset(self, request, queryset):
+        # Bulk soft delete is an UPDATE and sends no signals
+        super(PhoneBannedAdmin, self).delete_queryset(request, queryset)
+        bans.bump_version()
+
 
 admin.site.register(Profile, ProfileAdmin)
 admin.site.register(LoginLog, LoginLogAdmin)
@@ -6,3 +6,6 @@ class MemberConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'member'
     verbose_name = _('member')
+
+    def ready(self):
+        from member import signals  # noqa
@@ -0,0 +1,129 @@
+import hashlib
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Lower, Trim
+
+from member import models
+
+VERSION_KEY = 'member:banlist:version'
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone):
+    return re.sub(r'\D', '', phone or '')
+
+
+def fingerprint(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class BanList:
+    """
+    In-process copy of active EmailBanned and PhoneBanned rows.
+
+    Only 64-bit fingerprints of the normalized values are held, so the common
+    "not banned" answer is a set lookup. A fingerprint hit is confirmed against
+    the database because different values may share a fingerprint.
+
+    The copy is rebuilt when the version key in the cache changes; the key is
+    checked at most every BAN_LIST_VERSION_CHECK seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.emails = frozenset()
+        self.phones = frozenset()
+        self.checked = 0
+        self.built = 0
+
+    def refresh(self):
+        now = time.monotonic()
+
+        if now - self.checked < getattr(settings, 'BAN_LIST_VERSION_CHECK', 10):
+            return
+
+        with self.lock:
+            if now - self.checked < getattr(settings, 'BAN_LIST_VERSION_CHECK', 10):
+                return
+
+            version = cache.get(VERSION_KEY)
+
+            if version is None:
+                version = bump_version()
+
+            if version != self.version or now - self.built > getattr(settings, 'BAN_LIST_MAX_AGE', 60 * 60):
+                self.emails = frozenset(
+                    fingerprint(normalize_email(email))
+                    for email in models.EmailBanned.available_objects.values_list('email', flat=True).iterator()
+                )
+                self.phones = frozenset(
+                    fingerprint(normalize_phone(phone))
+                    for phone in models.PhoneBanned.available_objects.values_list('phone', flat=True).iterator()
+                )
+                self.version = version
+                self.built = now
+
+            self.checked = now
+
+    def is_email_banned(self, email):
+        email = normalize_email(email)
+
+        if not email:
+            return False
+
+        self.refresh()
+
+        if fingerprint(email) not in self.emails:
+            return False
+
+        # Stored addresses are normalized like the input, so surrounding whitespace still matches
+        return models.EmailBanned.available_objects \
+            .annotate(normalized=Lower(Trim('email'))) \
+            .filter(normalized=email) \
+            .exists()
+
+    def is_phone_banned(self, phone):
+        phone = normalize_phone(phone)
+
+        if not phone:
+            return False
+
+        self.refresh()
+
+        if fingerprint(phone) not in self.phones:
+            return False
+
+        return any(
+            normalize_phone(banned) == phone
+            for banned in models.PhoneBanned.available_objects.values_list('phone', flat=True)
+            .filter(phone__endswith=phone[-4:])
+        )
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Seed with the clock so that a flushed cache never repeats an old version
+        version = int(time.time() * 1000)
+        cache.set(VERSION_KEY, version, None)
+        return version
+
+
+ban_list = BanList()
+
+
+def is_email_banned(email):
+    return ban_list.is_email_banned(email)
+
+
+def is_phone_banned(phone):
+    return ban_list.is_phone_banned(phone)
@@ -0,0 +1,79 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from member import models
+
+logger = logging.getLogger(__name__)
+
+
+class LoginLogBuffer:
+    """
+    Collects login events in the process and writes them with one bulk insert.
+
+    The buffer is flushed when it holds LOGIN_LOG_BUFFER_SIZE events, by a timer
+    LOGIN_LOG_FLUSH_INTERVAL seconds after the first buffered event even if no other
+    login arrives, and at exit. A process killed without running atexit handlers
+    loses at most the events of the last interval.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []
+        self.timer = None
+
+    def add(self, user_id, ip_address):
+        with self.lock:
+            self.entries.append(models.LoginLog(user_id=user_id, ip_address=ip_address))
+
+            if len(self.entries) < getattr(settings, 'LOGIN_LOG_BUFFER_SIZE', 100):
+                if self.timer is None:
+                    self.timer = threading.Timer(getattr(settings, 'LOGIN_LOG_FLUSH_INTERVAL', 5), self.flush_later)
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+
+            entries = self.take()
+
+        self.write(entries)
+
+    def take(self):
+        # Called with the lock held
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        entries, self.entries = self.entries, []
+
+        return entries
+
+    def flush(self):
+        with self.lock:
+            entries = self.take()
+
+        if entries:
+            self.write(entries)
+
+    @staticmethod
+    def write(entries):
+        # A login never fails on its log; the savepoint keeps an enclosing transaction usable
+        try:
+            with transaction.atomic():
+                models.LoginLog.objects.bulk_create(entries)
+        except DatabaseError:
+            logger.exception('%d login logs could not be written', len(entries))
+
+    def flush_later(self):
+        # Runs in the timer thread, which has a database connection of its own
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+
+login_log_buffer = LoginLogBuffer()
+
+atexit.register(login_log_buffer.flush)
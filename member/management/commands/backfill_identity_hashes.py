@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from common.batch import keyset_chunks
+from member import verification
+from member.models import PhoneVerificationLog
+
+
+class Command(BaseCommand):
+    help = 'Fill di_hash and ci_hash of phone verification logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = PhoneVerificationLog.objects \
+            .filter(Q(ci_hash='') & ~Q(ci='') | Q(di_hash='') & ~Q(di=''))
+
+        updated = 0
+
+        for ids in keyset_chunks(queryset, options['chunk_size']):
+            logs = list(PhoneVerificationLog.objects.filter(pk__in=ids).only('id', 'di', 'ci'))
+
+            for log in logs:
+                verification.set_identity_hashes(log)
+
+            PhoneVerificationLog.objects.bulk_update(logs, ['di_hash', 'ci_hash'])
+
+            updated += len(logs)
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} phone verification logs hashed'))
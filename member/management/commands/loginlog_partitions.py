@@ -0,0 +1,86 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils.timezone import now
+
+from member.models import LoginLog
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition(month):
+    # pYYYYMM holds rows created before the first day of the next month
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{add_months(month, 1):%Y-%m-%d}'))"
+
+
+class Command(BaseCommand):
+    help = 'Partition the login log table by month of created and rotate its partitions (MySQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help='Months to create in advance')
+        parser.add_argument('--retention', type=int, default=0,
+                            help='Drop partitions older than this many months (0 keeps everything)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError('Range partitioning requires MySQL or MariaDB')
+
+        table = LoginLog._meta.db_table
+        this_month = now().date().replace(day=1)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL '
+                'ORDER BY PARTITION_ORDINAL_POSITION',
+                [table]
+            )
+            partitions = [row[0] for row in cursor.fetchall()]
+
+            if not partitions:
+                first = LoginLog.objects.aggregate(first=Min('created'))['first']
+                month = first.date().replace(day=1) if first else this_month
+
+                months = []
+
+                while month <= add_months(this_month, options['months_ahead']):
+                    months.append(partition(month))
+                    month = add_months(month, 1)
+
+                # Every unique key of a partitioned table must contain the partitioning column
+                self.stdout.write(f'Partitioning {table} into {len(months)} monthly partitions')
+                cursor.execute(f'ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `created`)')
+                cursor.execute(
+                    f'ALTER TABLE `{table}` PARTITION BY RANGE (TO_DAYS(`created`)) '
+                    f'({", ".join(months)}, PARTITION pmax VALUES LESS THAN MAXVALUE)'
+                )
+            else:
+                month = this_month
+                missing = []
+
+                while month <= add_months(this_month, options['months_ahead']):
+                    if f'p{month:%Y%m}' not in partitions:
+                        missing.append(partition(month))
+                    month = add_months(month, 1)
+
+                if missing:
+                    self.stdout.write(f'Adding {len(missing)} partitions to {table}')
+                    cursor.execute(
+                        f'ALTER TABLE `{table}` REORGANIZE PARTITION pmax INTO '
+                        f'({", ".join(missing)}, PARTITION pmax VALUES LESS THAN MAXVALUE)'
+                    )
+
+                if options['retention']:
+                    oldest = f'p{add_months(this_month, -options["retention"]):%Y%m}'
+                    expired = [name for name in partitions if name != 'pmax' and name < oldest]
+
+                    if expired:
+                        self.stdout.write(f'Dropping partitions {", ".join(expired)} of {table}')
+                        cursor.execute(f'ALTER TABLE `{table}` DROP PARTITION {", ".join(expired)}')
+
+        self.stdout.write(self.style.SUCCESS(f'{table} partitions are up to date'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from common.batch import keyset_chunks
+from member import mms
+from member.models import MmsData
+
+
+class Command(BaseCommand):
+    help = 'Move inline base64 MMS images to content-addressed file storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        queryset = MmsData.objects \
+            .filter(mime__in=mms.EXTENSIONS.keys(), file='') \
+            .exclude(data='')
+
+        moved = 0
+
+        for ids in keyset_chunks(queryset, options['chunk_size']):
+            offloaded = []
+
+            # One wide row in memory at a time
+            for pk in ids:
+                instance = MmsData.objects.only('id', 'mime', 'data', 'file').get(pk=pk)
+
+                if mms.offload(instance):
+                    offloaded.append(instance)
+
+            MmsData.objects.bulk_update(offloaded, ['data', 'file', 'size', 'sha256'])
+
+            moved += len(offloaded)
+
+        self.stdout.write(self.style.SUCCESS(f'{moved} mms payloads offloaded'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from member import tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired refresh tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = tokens.sweep(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired refresh tokens deleted'))
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mmsdata',
+            name='file',
+            field=models.FileField(blank=True, max_length=255, upload_to='mms', verbose_name='data file'),
+        ),
+        migrations.AddField(
+            model_name='mmsdata',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='mmsdata',
+            name='size',
+            field=models.PositiveIntegerField(default=0, verbose_name='data size'),
+        ),
+        migrations.AlterField(
+            model_name='mmsdata',
+            name='data',
+            field=models.TextField(blank=True, verbose_name='data'),
+        ),
+    ]
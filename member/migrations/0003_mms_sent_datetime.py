@@ -0,0 +1,116 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:06
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, localtime, make_aware
+
+CHUNK_SIZE = 2000
+
+# A frozen copy of the parser: migrations must not depend on application code
+SENT_FORMATS = (
+    '%Y%m%d%H%M%S',
+    '%Y%m%d%H%M',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d %H:%M',
+    '%Y.%m.%d %H:%M:%S',
+    '%Y.%m.%d %H:%M',
+    '%y/%m/%d %H:%M:%S',
+    '%y/%m/%d %H:%M',
+)
+
+
+def parse_sent(value):
+    # Sent datetime strings of the phone gateway in local time, or None if unreadable
+    value = (value or '').strip()
+
+    if not value:
+        return None
+
+    if value.isdigit() and len(value) in (10, 13):
+        # Unix timestamp in seconds or milliseconds
+        return datetime.fromtimestamp(int(value[:10]), tz=timezone.utc)
+
+    try:
+        sent = parse_datetime(value)
+    except ValueError:
+        sent = None
+
+    for sent_format in SENT_FORMATS:
+        if sent:
+            break
+
+        try:
+            sent = datetime.strptime(value, sent_format)
+        except ValueError:
+            pass
+
+    if sent and is_naive(sent):
+        sent = make_aware(sent)
+
+    return sent
+
+
+def chunks(Mms):
+    last = 0
+
+    while True:
+        rows = list(Mms.objects.filter(id__gt=last).order_by('id')[:CHUNK_SIZE])
+
+        if not rows:
+            return
+
+        yield rows
+
+        last = rows[-1].id
+
+
+def parse_sent_strings(apps, schema_editor):
+    Mms = apps.get_model('member', 'Mms')
+
+    for rows in chunks(Mms):
+        for row in rows:
+            # Unreadable strings fall back to the time the row was stored
+            row.sent_at = parse_sent(row.sent) or row.created
+
+        Mms.objects.bulk_update(rows, ['sent_at'])
+
+
+def format_sent_datetimes(apps, schema_editor):
+    Mms = apps.get_model('member', 'Mms')
+
+    for rows in chunks(Mms):
+        for row in rows:
+            row.sent = localtime(row.sent_at).strftime('%Y-%m-%d %H:%M:%S') if row.sent_at else ''
+
+        Mms.objects.bulk_update(rows, ['sent'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0002_mms_data_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mms',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='sent datetime'),
+        ),
+        migrations.RunPython(parse_sent_strings, format_sent_datetimes),
+        migrations.RemoveField(
+            model_name='mms',
+            name='sent',
+        ),
+        migrations.RenameField(
+            model_name='mms',
+            old_name='sent_at',
+            new_name='sent',
+        ),
+        migrations.AddIndex(
+            model_name='mms',
+            index=models.Index(fields=['cellphone', 'sent'], name='member_mms_cellpho_189ae3_idx'),
+        ),
+    ]
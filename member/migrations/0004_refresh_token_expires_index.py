@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0003_mms_sent_datetime'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='refreshtoken',
+            name='expires_in',
+            field=models.DateTimeField(db_index=True, null=True, verbose_name='expires in'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('member', '0004_refresh_token_expires_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loginlog',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+        migrations.AddIndex(
+            model_name='loginlog',
+            index=models.Index(fields=['user', 'created'], name='member_logi_user_id_16ee1b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginlog',
+            index=models.Index(fields=['created'], name='member_logi_created_fd08cf_idx'),
+        ),
+    ]
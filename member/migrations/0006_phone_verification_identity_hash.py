@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0005_loginlog_user_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phoneverificationlog',
+            name='ci_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='ci hash'),
+        ),
+        migrations.AddField(
+            model_name='phoneverificationlog',
+            name='di_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='di hash'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0006_phone_verification_identity_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='rfm_frequency',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='frequency score'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rfm_monetary',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='monetary score'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rfm_recency',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='recency score'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rfm_segment',
+            field=models.IntegerField(choices=[(0, 'no purchase'), (1, 'champions'), (2, 'loyal'), (3, 'potential loyalist'), (4, 'new customer'), (5, 'at risk'), (6, 'hibernating'), (7, 'lost')], db_index=True, default=0, verbose_name='customer segment'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rfm_updated',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='segmented date'),
+        ),
+    ]
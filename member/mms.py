@@ -0,0 +1,81 @@
+import base64
+import binascii
+import hashlib
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from member import models
+
+CHUNK_SIZE = 64 * 1024  # base64 characters, a multiple of 4
+
+EXTENSIONS = {
+    models.MmsData.MIME_CHOICES.jpg: 'jpg',
+    models.MmsData.MIME_CHOICES.png: 'png',
+}
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def decode_chunks(data):
+    # Decode a base64 body piece by piece instead of building the whole binary at once
+    if data.startswith('data:'):
+        data = data[data.find(',') + 1:]
+
+    rest = ''
+
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = rest + WHITESPACE.sub('', data[start:start + CHUNK_SIZE])
+        cut = len(chunk) - len(chunk) % 4
+        rest = chunk[cut:]
+
+        if cut:
+            yield base64.b64decode(chunk[:cut], validate=True)
+
+    if rest:
+        yield base64.b64decode(rest + '=' * (-len(rest) % 4))
+
+
+def store(data, mime):
+    """
+    Decode a base64 payload into content-addressed storage.
+
+    Returns the storage name, the decoded size and the SHA-256 hex digest.
+    Identical payloads share one file, so a rerun or a resent image stores nothing new.
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    with tempfile.TemporaryFile() as f:
+        for chunk in decode_chunks(data):
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+
+        sha256 = digest.hexdigest()
+        name = f'mms/{sha256[:2]}/{sha256[2:4]}/{sha256}.{EXTENSIONS[mime]}'
+
+        if not default_storage.exists(name):
+            f.seek(0)
+            name = default_storage.save(name, File(f))
+
+    return name, size, sha256
+
+
+def offload(instance):
+    # Move the inline payload of an unsaved or loaded MmsData to storage in place
+    if instance.mime not in EXTENSIONS or instance.file or not instance.data:
+        return False
+
+    try:
+        name, instance.size, instance.sha256 = store(instance.data, instance.mime)
+    except (binascii.Error, ValueError):
+        # Not base64 after all; keep the payload inline
+        return False
+
+    instance.file = name
+    instance.data = ''
+
+    return True
@@ -8,9 +8,11 @@ from django.utils.translation import gettext_lazy as _
 from easy_thumbnails.fields import ThumbnailerImageField
 from model_utils import Choices
 from model_utils.models import (
-    TimeStampedModel, SoftDeletableModel
+    TimeStampedModel
 )
 
+from common.models import SoftDeletableModel
+
 
 def upload_directory_path(instance, filename):
     return f"member/{now().strftime('%Y-%m-%d')}/{uuid.uuid4()}.{filename.split('.')[-1]}"
@@ -33,6 +35,17 @@ class Profile(TimeStampedModel):
         (1, 'domestic', _('domestic')),
     )
 
+    RFM_SEGMENT_CHOICES = Choices(
+        (0, 'none', _('no purchase')),
+        (1, 'champions', _('champions')),
+        (2, 'loyal', _('loyal')),
+        (3, 'potential', _('potential loyalist')),
+        (4, 'new', _('new customer')),
+        (5, 'at_risk', _('at risk')),
+        (6, 'hibernating', _('hibernating')),
+        (7, 'lost', _('lost')),
+    )
+
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -177,6 +190,35 @@ class Profile(TimeStampedModel):
         null=True,
     )
 
+    # Quintile scores from 1 to 5, or 0 without purchases
+    rfm_recency = models.PositiveSmallIntegerField(
+        verbose_name=_('recency score'),
+        default=0,
+    )
+
+    rfm_frequency = models.PositiveSmallIntegerField(
+        verbose_name=_('frequency score'),
+        default=0,
+    )
+
+    rfm_monetary = models.PositiveSmallIntegerField(
+        verbose_name=_('monetary score'),
+        default=0,
+    )
+
+    rfm_segment = models.IntegerField(
+        verbose_name=_('customer segment'),
+        choices=RFM_SEGMENT_CHOICES,
+        default=RFM_SEGMENT_CHOICES.none,
+        db_index=True,
+    )
+
+    rfm_updated = models.DateTimeField(
+        verbose_name=_('segmented date'),
+        null=True,
+        blank=True,
+    )
+
     class Meta:
         verbose_name = _('profile')
         verbose_name_plural = _('profiles')
@@ -186,12 +228,14 @@ class Profile(TimeStampedModel):
 
 
 class LoginLog(TimeStampedModel):
+    # MySQL partitioned tables cannot have foreign key constraints (see loginlog_partitions)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         verbose_name=_('user'),
         null=True,
         blank=True,
         editable=True,
+        db_constraint=False,
         on_delete=models.SET_NULL,
     )
 
@@ -203,6 +247,11 @@ class LoginLog(TimeStampedModel):
         verbose_name = _('login log')
         verbose_name_plural = _('login logs')
 
+        indexes = [
+            models.Index(fields=['user', 'created', ]),
+            models.Index(fields=['created', ]),
+        ]
+
     def __str__(self):
         return f'{self.user.email} {self.ip_address} {self.created}'
 
@@ -274,6 +323,21 @@ class PhoneVerificationLog(TimeStampedModel):
         blank=True,
     )
 
+    # SHA-256 of di and ci for indexed identity lookups (member.verification)
+    di_hash = models.CharField(
+        verbose_name=_('di hash'),
+        max_length=64,
+        blank=True,
+        db_index=True,
+    )
+
+    ci_hash = models.CharField(
+        verbose_name=_('ci hash'),
+        max_length=64,
+        blank=True,
+        db_index=True,
+    )
+
     fullname = models.CharField(
         verbose_name=_('fullname'),
         max_length=32,
@@ -333,9 +397,9 @@ class Mms(TimeStampedModel):
         blank=True,
     )
 
-    sent = models.CharField(
+    sent = models.DateTimeField(
         verbose_name=_('sent datetime'),
-        max_length=32,
+        null=True,
         blank=True,
     )
 
@@ -343,6 +407,10 @@ class Mms(TimeStampedModel):
         verbose_name = _('mms')
         verbose_name_plural = _('mms')
 
+        indexes = [
+            models.Index(fields=['cellphone', 'sent', ]),
+        ]
+
     def __str__(self):
         return f'{self.cellphone} {self.sent}'
 
@@ -361,8 +429,29 @@ class MmsData(TimeStampedModel):
         db_index=True,
     )
 
+    # Text bodies stay inline. Base64 image payloads are moved to `file` by member.mms.
     data = models.TextField(
         verbose_name=_('data'),
+        blank=True,
+    )
+
+    file = models.FileField(
+        verbose_name=_('data file'),
+        upload_to='mms',
+        max_length=255,
+        blank=True,
+    )
+
+    size = models.PositiveIntegerField(
+        verbose_name=_('data size'),
+        default=0,
+    )
+
+    sha256 = models.CharField(
+        verbose_name=_('SHA-256'),
+        max_length=64,
+        blank=True,
+        db_index=True,
     )
 
     mms = models.ForeignKey(
@@ -376,7 +465,7 @@ class MmsData(TimeStampedModel):
         verbose_name_plural = _('mms data')
 
     def __str__(self):
-        return f'{self.cellphone} {self.sent}'
+        return f'{self.mms_id} {self.get_mime_display()}'
 
 
 class EmailBanned(SoftDeletableModel, TimeStampedModel):
@@ -420,6 +509,7 @@ class RefreshToken(TimeStampedModel):
     expires_in = models.DateTimeField(
         verbose_name=_('expires in'),
         null=True,
+        db_index=True,
     )
 
     user = models.OneToOneField(
@@ -0,0 +1,36 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from common.network import client_ip
+from member import bans
+from member import loginlog
+from member import mms
+from member import models
+from member import verification
+
+
+@receiver(post_save, sender=models.EmailBanned)
+@receiver(post_save, sender=models.PhoneBanned)
+@receiver(post_delete, sender=models.EmailBanned)
+@receiver(post_delete, sender=models.PhoneBanned)
+def ban_list_changed(sender, **kwargs):
+    bans.bump_version()
+
+
+@receiver(pre_save, sender=models.MmsData)
+def mms_data_saving(sender, instance, **kwargs):
+    mms.offload(instance)
+
+
+@receiver(pre_save, sender=models.PhoneVerificationLog)
+def phone_verification_log_saving(sender, instance, **kwargs):
+    verification.set_identity_hashes(instance)
+
+
+@receiver(user_logged_in)
+def user_logged_in_log(sender, request, user, **kwargs):
+    ip_address = client_ip(request) if request is not None else ''
+
+    if ip_address:
+        loginlog.login_log_buffer.add(user.pk, ip_address)
@@ -1,3 +1,234 @@
-from django.test import TestCase
+import base64
+import hashlib
+import tempfile
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from allauth.account.adapter import get_adapter
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.timezone import localtime
+
+from member import bans
+from member import loginlog
+from member import mms
+from member import models
+from member import tokens
+from member import verification
+
+mms_sent_datetime = import_module('member.migrations.0003_mms_sent_datetime')
+
+
+class ParseSentTest(SimpleTestCase):
+    def test_gateway_formats(self):
+        for value in ('20230115093000', '2023/01/15 09:30:00', '2023.01.15 09:30', '23/01/15 09:30'):
+            sent = localtime(mms_sent_datetime.parse_sent(value))
+            self.assertEqual((sent.year, sent.month, sent.day, sent.hour, sent.minute), (2023, 1, 15, 9, 30), value)
+
+    def test_unreadable(self):
+        self.assertIsNone(mms_sent_datetime.parse_sent('yesterday'))
+        self.assertIsNone(mms_sent_datetime.parse_sent(''))
+
+
+@override_settings(BAN_LIST_VERSION_CHECK=0)
+class BanListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        bans.ban_list = bans.BanList()
+
+    def test_stored_addresses_match_after_normalization(self):
+        models.EmailBanned.objects.create(email=' Banned@Example.com ')
+
+        self.assertTrue(bans.is_email_banned('banned@example.COM '))
+        self.assertFalse(bans.is_email_banned('other@example.com'))
+
+    def test_phone_numbers_match_without_separators(self):
+        models.PhoneBanned.objects.create(phone='010-1234-5678')
+
+        self.assertTrue(bans.is_phone_banned('01012345678'))
+        self.assertFalse(bans.is_phone_banned('010-1234-0000'))
+
+    def test_removed_bans_no_longer_match(self):
+        ban = models.EmailBanned.objects.create(email='banned@example.com')
+        ban.delete()
+
+        self.assertFalse(bans.is_email_banned('banned@example.com'))
+
+    def test_signup_rejects_banned_addresses(self):
+        models.EmailBanned.objects.create(email='banned@example.com')
+
+        with self.assertRaises(ValidationError):
+            get_adapter().clean_email('Banned@example.com')
+
+        self.assertEqual(get_adapter().clean_email('new@example.com'), 'new@example.com')
+
+
+class MmsTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch('member.mms.default_storage', FileSystemStorage(location=directory.name))
+        self.storage = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.image = bytes(range(256)) * 3
+        self.message = models.Mms.objects.create(cellphone='01012345678')
+
+    @mock.patch('member.mms.CHUNK_SIZE', 8)
+    def test_chunks_decode_across_whitespace_and_missing_padding(self):
+        encoded = base64.b64encode(self.image).decode().rstrip('=')
+        wrapped = '\n'.join(encoded[i:i + 7] for i in range(0, len(encoded), 7))
+
+        self.assertEqual(b''.join(mms.decode_chunks(f'data:image/png;base64,{wrapped}')), self.image)
+
+    def test_identical_payloads_share_one_content_addressed_file(self):
+        data = base64.b64encode(self.image).decode()
+        sha256 = hashlib.sha256(self.image).hexdigest()
+
+        first, second = [
+            models.MmsData.objects.create(mms=self.message, mime=models.MmsData.MIME_CHOICES.png, data=data)
+            for _ in range(2)
+        ]
+
+        self.assertEqual(first.file.name, f'mms/{sha256[:2]}/{sha256[2:4]}/{sha256}.png')
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual((first.data, first.size, first.sha256), ('', len(self.image), sha256))
+        self.assertEqual(self.storage.open(first.file.name).read(), self.image)
+
+    def test_text_and_invalid_payloads_stay_inline(self):
+        text = models.MmsData.objects.create(mms=self.message, data='hello')
+        broken = models.MmsData.objects.create(mms=self.message, mime=models.MmsData.MIME_CHOICES.jpg, data='not*b64')
+
+        self.assertEqual((text.data, text.file.name), ('hello', ''))
+        self.assertEqual((broken.data, broken.file.name), ('not*b64', ''))
+
+    def test_preview_reads_text_from_the_annotation(self):
+        models.MmsData.objects.create(mms=self.message, data='hello')
+        inline = admin.site._registry[models.Mms].get_inline_instances(mock.Mock())[0]
+        instance, = inline.get_queryset(mock.Mock())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(inline.preview(instance), 'hello')
+
+
+class VerificationTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.first, self.second, self.third = [
+            User.objects.create_user(username=name, password='secret') for name in ('first', 'second', 'third')
+        ]
+
+    def verify(self, owner, ci='', di=''):
+        return models.PhoneVerificationLog.objects.create(owner=owner, ci=ci, di=di)
+
+    def test_identities_are_stored_hashed(self):
+        log = self.verify(self.first, ci=' ci-1 ', di='')
+
+        self.assertEqual(log.ci_hash, verification.identity_hash('ci-1'))
+        self.assertEqual(len(log.ci_hash), 64)
+        self.assertEqual(log.di_hash, '')
+
+    def test_accounts_sharing_an_identity_are_linked(self):
+        self.verify(self.first, ci='ci-1', di='di-1')
+        self.verify(self.second, ci='ci-1')
+        self.verify(self.third, di='di-1')
+        self.verify(self.third, ci='ci-3')
+
+        self.assertEqual(list(verification.linked_accounts(self.first)), [self.second, self.third])
+        self.assertEqual(list(verification.linked_accounts(self.second)), [self.first])
+
+    def test_owners_of_one_result(self):
+        log = self.verify(self.first, ci='ci-1')
+        self.verify(self.second, ci='ci-1')
+
+        self.assertEqual(list(verification.linked_owners(log)), [self.first, self.second])
+        self.assertFalse(verification.linked_owners(self.verify(self.third)).exists())
+        self.assertFalse(verification.linked_accounts(self.third).exists())
+
+
+class RefreshTokenTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='token', password='secret')
+
+    def test_rotation_invalidates_the_previous_token(self):
+        token = tokens.issue(self.user).refresh_token
+
+        self.assertEqual(tokens.validate(str(token).upper()), self.user.pk)
+
+        rotated = tokens.rotate(token)
+
+        self.assertIsNone(tokens.validate(token))
+        self.assertEqual(tokens.validate(rotated.refresh_token), self.user.pk)
+
+    def test_case_variants_share_one_cache_entry(self):
+        token = str(tokens.issue(self.user).refresh_token)
+        cache.clear()
+
+        tokens.validate(token.upper())
+
+        self.assertEqual(cache.get(tokens.cache_key(token)), self.user.pk)
+        self.assertIsNone(tokens.validate('not-a-token'))
+
+    def test_stale_read_is_not_cached_after_a_concurrent_revoke(self):
+        token = tokens.issue(self.user).refresh_token
+        # revoke() invalidated the cache after validate() missed it but before its read committed
+        cache.set(tokens.cache_key(token), tokens.INVALID)
+        get = cache.get
+
+        with mock.patch.object(cache, 'get', side_effect=[None, tokens.INVALID]):
+            self.assertIsNone(tokens.validate(token))
+
+        self.assertEqual(get(tokens.cache_key(token)), tokens.INVALID)
+
+
+@override_settings(LOGIN_LOG_BUFFER_SIZE=3, LOGIN_LOG_FLUSH_INTERVAL=0.05)
+class LoginLogBufferTest(TestCase):
+    def setUp(self):
+        patcher = mock.patch('member.models.LoginLog.objects.bulk_create')
+        self.bulk_create = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = loginlog.LoginLogBuffer()
+
+    def test_flushes_when_full(self):
+        for user_id in range(3):
+            self.buffer.add(user_id, '127.0.0.1')
+
+        self.assertEqual(len(self.bulk_create.call_args.args[0]), 3)
+        self.assertIsNone(self.buffer.timer)
+
+    def test_flushes_a_quiet_buffer_after_the_interval(self):
+        with mock.patch('threading.Timer') as timer:
+            self.buffer.add(1, '127.0.0.1')
+
+        timer.assert_called_once_with(0.05, self.buffer.flush_later)
+
+        with mock.patch('member.loginlog.connection'):
+            self.buffer.flush_later()
+
+        self.assertEqual(len(self.bulk_create.call_args.args[0]), 1)
+        self.assertEqual(self.buffer.entries, [])
+
+    def test_database_errors_do_not_fail_the_login(self):
+        self.bulk_create.side_effect = DatabaseError
+
+        with self.assertLogs('member.loginlog', 'ERROR'):
+            for user_id in range(3):
+                self.buffer.add(user_id, '127.0.0.1')
+
+        self.assertEqual(self.buffer.entries, [])
+
+    @override_settings(UNDER_ATTACK_IP_HEADER='HTTP_X_FORWARDED_FOR', UNDER_ATTACK_PROXY_COUNT=1)
+    def test_logins_are_logged_from_the_proxy_added_hop(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 1.2.3.4', REMOTE_ADDR='10.0.0.1')
+
+        with mock.patch.object(loginlog.login_log_buffer, 'add') as add:
+            user_logged_in.send(sender=None, request=request, user=mock.Mock(pk=1))
+
+        add.assert_called_once_with(1, '1.2.3.4')
@@ -0,0 +1,146 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+
+from member import models
+
+# Cached for unknown, replaced and revoked tokens, so guessing tokens does not reach the database either
+INVALID = 0
+
+
+def normalize(token):
+    # The canonical form of a token, so case and hyphen variants share one cache entry; None if not a UUID
+    try:
+        return str(uuid.UUID(str(token)))
+    except ValueError:
+        return None
+
+
+def cache_key(token):
+    return f'member:refresh:{token}'
+
+
+def invalid_timeout():
+    return getattr(settings, 'REFRESH_TOKEN_INVALID_TTL', 60)
+
+
+def cache_token(refresh_token):
+    timeout = (refresh_token.expires_in - now()).total_seconds()
+
+    if timeout > 0:
+        cache.set(cache_key(refresh_token.refresh_token), refresh_token.user_id, timeout)
+
+
+def invalidate(tokens):
+    # Replace cache entries with INVALID instead of deleting them; see validate()
+    cache.set_many({cache_key(token): INVALID for token in tokens}, invalid_timeout())
+
+
+def issue(user, ttl=None):
+    # A user has one refresh token; issuing again replaces and invalidates the previous one.
+    return replace(user.pk, ttl)
+
+
+def replace(user_id, ttl=None, expected=None):
+    ttl = ttl or timedelta(seconds=getattr(settings, 'REFRESH_TOKEN_TTL', 14 * 24 * 60 * 60))
+
+    with transaction.atomic():
+        previous = models.RefreshToken.objects \
+            .select_for_update() \
+            .filter(user_id=user_id) \
+            .values_list('refresh_token', flat=True) \
+            .first()
+
+        if expected and str(previous) != str(expected):
+            # Rotated concurrently or revoked since validation
+            return None
+
+        refresh_token, _ = models.RefreshToken.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'refresh_token': uuid.uuid4(),
+                'expires_in': now() + ttl,
+            },
+        )
+
+    if previous:
+        invalidate([previous])
+
+    cache_token(refresh_token)
+
+    return refresh_token
+
+
+def validate(token):
+    """
+    Returns the user id of a valid refresh token or None.
+
+    On a cache miss the token read from the database is cached with add(), never set():
+    a replace() or revoke() committing in between leaves INVALID in the cache, so the
+    add fails and the stale read is not cached or trusted.
+    """
+    token = normalize(token)
+
+    if token is None:
+        return None
+
+    user_id = cache.get(cache_key(token))
+
+    if user_id is None:
+        refresh_token = models.RefreshToken.objects \
+            .filter(refresh_token=token, expires_in__gt=now()) \
+            .only('refresh_token', 'expires_in', 'user_id') \
+            .first()
+
+        if not refresh_token:
+            cache.add(cache_key(token), INVALID, invalid_timeout())
+            return None
+
+        timeout = (refresh_token.expires_in - now()).total_seconds()
+
+        if timeout <= 0 or not cache.add(cache_key(token), refresh_token.user_id, timeout):
+            user_id = cache.get(cache_key(token))
+            return user_id or None
+
+        return refresh_token.user_id
+
+    return user_id or None
+
+
+def rotate(token):
+    user_id = validate(token)
+
+    if not user_id:
+        return None
+
+    return replace(user_id, expected=normalize(token))
+
+
+def revoke(user):
+    tokens = list(models.RefreshToken.objects.filter(user=user).values_list('refresh_token', flat=True))
+
+    models.RefreshToken.objects.filter(user=user).delete()
+
+    invalidate(tokens)
+
+
+def sweep(batch_size=1000):
+    # Delete expired tokens in bounded batches by the expires_in index; cache entries expire on their own
+    deleted = 0
+
+    while True:
+        ids = list(models.RefreshToken.objects
+                   .filter(expires_in__lt=now())
+                   .order_by('expires_in')
+                   .values_list('id', flat=True)[:batch_size])
+
+        if not ids:
+            return deleted
+
+        models.RefreshToken.objects.filter(id__in=ids).delete()
+
+        deleted += len(ids)
@@ -0,0 +1,53 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import format_html_join
+
+from member import models
+
+
+def identity_hash(value):
+    value = (value or '').strip()
+    return hashlib.sha256(value.encode()).hexdigest() if value else ''
+
+
+def set_identity_hashes(log):
+    log.di_hash = identity_hash(log.di)
+    log.ci_hash = identity_hash(log.ci)
+
+
+def linked_owners(log):
+    # Every account verified with the same identity as this result, by the ci_hash and di_hash indexes
+    condition = Q()
+
+    if log.ci_hash:
+        condition |= Q(phoneverificationlog__ci_hash=log.ci_hash)
+    if log.di_hash:
+        condition |= Q(phoneverificationlog__di_hash=log.di_hash)
+
+    if not condition:
+        return get_user_model().objects.none()
+
+    return get_user_model().objects.filter(condition).distinct().order_by('pk')
+
+
+def linked_accounts(user):
+    # Other accounts sharing any identity the user has verified with, in one query
+    logs = models.PhoneVerificationLog.objects.filter(owner=user)
+
+    return get_user_model().objects \
+        .filter(Q(phoneverificationlog__ci_hash__in=logs.exclude(ci_hash='').values('ci_hash'))
+                | Q(phoneverificationlog__di_hash__in=logs.exclude(di_hash='').values('di_hash'))) \
+        .exclude(pk=user.pk) \
+        .distinct() \
+        .order_by('pk')
+
+
+def format_accounts(users):
+    # Admin links for a list of linked accounts
+    return format_html_join(
+        ', ', '<a href="{}">{}</a>',
+        ((reverse('admin:auth_user_change', args=(user.pk,)), user.email or user.username) for user in users)
+    ) or '-'
@@ -1,10 +1,27 @@
+import json
+import uuid
+from datetime import timedelta
+from urllib.parse import urlencode
+
 from django.contrib import admin
+from django.contrib.auth import get_user_model
 from django.contrib.admin.filters import SimpleListFilter
+from django.core.exceptions import PermissionDenied
+from django.db.models import Sum, Max
 from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from django.utils.timezone import localdate
 from django.utils.translation import gettext_lazy as _
 from mptt.admin import DraggableMPTTAdmin
 
+from member import verification
+from shop import archive
+from shop import exports
 from shop import models
+from shop import refunds
+from shop import transitions
 
 
 # Filter Spec
@@ -99,6 +116,52 @@ class VoucherListPriceFilterSpec(SimpleListFilter):
         return queryset
 
 
+# Actions
+def transition_action(name):
+    new_status = getattr(models.Order.STATUS_CHOICES, name)
+
+    def action(modeladmin, request, queryset):
+        # Selected before the transition, which may move orders out of a status filtered changelist
+        order_ids = list(queryset.values_list('pk', flat=True))
+        logs = transitions.transition(order_ids, new_status, actor=request.user)
+        modeladmin.message_user(request, _('%(count)d of %(total)d orders moved to %(status)s.') % {
+            'count': len(logs),
+            'total': len(order_ids),
+            'status': models.Order.STATUS_CHOICES[new_status],
+        })
+
+    action.__name__ = f'mark_{name}'
+    action.short_description = _('Mark selected orders as %(status)s') % {
+        'status': models.Order.STATUS_CHOICES[new_status],
+    }
+    return action
+
+
+def refund_orders(modeladmin, request, queryset):
+    refund = refunds.refund(queryset, actor=request.user)
+    modeladmin.message_user(request, _('%(count)d orders refunded.') % {'count': len(refund)})
+
+
+refund_orders.short_description = _('Refund selected orders')
+
+
+def refund_order_products(modeladmin, request, queryset):
+    refund = refunds.refund_lines(dict.fromkeys(queryset.values_list('pk', flat=True)), actor=request.user)
+    modeladmin.message_user(request, _('%(count)d orders refunded.') % {'count': len(refund)})
+
+
+refund_order_products.short_description = _('Refund selected order products')
+
+
+def export_action(name, file_format):
+    def action(modeladmin, request, queryset):
+        return exports.response(name, queryset, file_format)
+
+    action.__name__ = f'export_{file_format}'
+    action.short_description = _('Export selected rows as %(format)s') % {'format': file_format.upper()}
+    return action
+
+
 # Formset and Inlines
 
 class OrderPaymentInlineFormset(BaseInlineFormSet):
@@ -182,6 +245,18 @@ class OrderProductInline(admin.TabularInline):
     extra = 0
 
 
+class OrderStatusLogInline(admin.TabularInline):
+    model = models.OrderStatusLog
+    extra = 0
+    fields = ('old_status', 'new_status', 'actor', 'created')
+    readonly_fields = ('old_status', 'new_status', 'actor', 'created')
+    can_delete = False
+    ordering = ['-created']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class PurchaseOrderPaymentInline(admin.StackedInline):
     model = models.PurchaseOrderPayment
     extra = 1
@@ -191,6 +266,45 @@ class PurchaseOrderPaymentInline(admin.StackedInline):
     ordering = ['-created']
 
 
+# Mixins
+
+class ArchiveFallThroughMixin:
+    # A search without results in the hot table links to the archived rows it matches
+    archived_model = None
+
+    def archived_lookups(self, search_term):
+        # Filter of the archived model matching a search term; empty for none
+        return {}
+
+    def fall_through(self, request, queryset, lookups):
+        if not lookups or queryset.exists():
+            return
+
+        count = self.archived_model.objects.filter(**lookups).count()
+
+        if count:
+            opts = self.archived_model._meta
+            query = urlencode({
+                lookup: ','.join(map(str, value)) if isinstance(value, (list, tuple)) else value
+                for lookup, value in lookups.items()
+            })
+            self.message_user(request, format_html(
+                _('{count} archived {name} match the search: <a href="{url}">show</a>'),
+                count=count,
+                name=opts.verbose_name_plural,
+                url=f"{reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')}?{query}",
+            ))
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super(ArchiveFallThroughMixin, self) \
+            .get_search_results(request, queryset, search_term)
+
+        if search_term.strip():
+            self.fall_through(request, queryset, self.archived_lookups(search_term.strip()))
+
+        return queryset, may_have_duplicates
+
+
 class StoreAdmin(admin.ModelAdmin):
     list_display = ('name', 'code', 'theme', 'chunk_size', 'block_size')
     ordering = ['-created']
@@ -204,6 +318,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_display_links = ('name', 'subtitle')
     list_filter = ('store__name', ProductCategoryFilterSpec, 'status', 'stock', 'naver_partner', 'pg')
     ordering = ['category__title', 'position']
+    readonly_fields = ('stock_held',)
     inlines = [ProductInline]
 
 
@@ -221,9 +336,9 @@ class CategoryAdmin(DraggableMPTTAdmin):
     ordering = ['tree_id', 'lft']
 
 
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('order_no', 'fullname', 'payment_method', 'status', 'created', 'is_removed')
-    list_filter = ('payment_method', 'status', RemovedOrderFilterSpec,)
+class OrderAdmin(ArchiveFallThroughMixin, admin.ModelAdmin):
+    list_display = ('order_no', 'fullname', 'payment_method', 'status', 'fraud_score', 'created', 'is_removed')
+    list_filter = ('payment_method', 'status', 'suspicious', RemovedOrderFilterSpec,)
     date_hierarchy = 'created'
     search_fields = ('user__email',)
     fieldsets = (
@@ -235,27 +350,127 @@ class OrderAdmin(admin.ModelAdmin):
         }),
         (_('Transaction Verification'), {
             'fields': (
-                'suspicious',
+                'suspicious', 'fraud_score',
                 'phone_verified_status', 'document_verified',
                 'date_joined', 'last_login_count', 'last_purchased', 'last_total',
                 'max_price', 'average_price', 'total_order_count',
-                'country', 'accept_language', 'user_agent', 'message'
+                'country', 'accept_language', 'user_agent', 'message', 'linked_accounts'
             )
         }),
     )
     readonly_fields = (
         'order_no', 'fullname', 'total_list_price', 'payment_method', 'currency', 'created',
-        'accept_language', 'user_agent', 'message'
+        'accept_language', 'user_agent', 'message', 'linked_accounts', 'fraud_score'
     )
-    inlines = [OrderProductInline, OrderPaymentInline]
+    inlines = [OrderProductInline, OrderPaymentInline, OrderStatusLogInline]
     ordering = ['-created', ]
+    actions = [
+        transition_action('payment_verified'),
+        transition_action('shipped'),
+        transition_action('under_review'),
+        transition_action('voided'),
+        refund_orders,
+        export_action('orders', 'csv'),
+        export_action('orders', 'xlsx'),
+    ]
 
     def get_queryset(self, request):
         return super(OrderAdmin, self).get_queryset(request) \
             .select_related('user', 'user__profile', 'parent')
 
+    archived_model = models.ArchivedOrder
+
+    def linked_accounts(self, instance):
+        if not instance.user_id:
+            return '-'
+        return verification.format_accounts(verification.linked_accounts(instance.user))
+
+    linked_accounts.short_description = _('accounts with the same identity')
+
+    def get_search_results(self, request, queryset, search_term):
+        # An order number finds its order; any other term searches the user email
+        try:
+            order_no = uuid.UUID(search_term.strip())
+        except ValueError:
+            return super(OrderAdmin, self).get_search_results(request, queryset, search_term)
+
+        queryset = queryset.filter(order_no=order_no)
+        self.fall_through(request, queryset, {'order_no': order_no})
+
+        return queryset, False
 
-class VoucherAdmin(admin.ModelAdmin):
+    def archived_lookups(self, search_term):
+        user_ids = list(get_user_model().objects
+                        .filter(email__icontains=search_term)
+                        .values_list('pk', flat=True)[:100])
+
+        return {'user_id__in': user_ids} if user_ids else {}
+
+
+class OrderStatusLogAdmin(admin.ModelAdmin):
+    list_display = ('order', 'old_status', 'new_status', 'actor', 'created')
+    list_select_related = ('order', 'order__user', 'actor')
+    list_filter = ('new_status',)
+    search_fields = ('order__order_no',)
+    date_hierarchy = 'created'
+    readonly_fields = ('order', 'old_status', 'new_status', 'actor', 'created')
+    ordering = ['-created']
+
+
+class VoucherHoldAdmin(admin.ModelAdmin):
+    list_display = ('voucher', 'order', 'product', 'expires', 'created')
+    list_select_related = ('voucher', 'order', 'order__user', 'product')
+    search_fields = ('order__order_no', 'voucher__code')
+    readonly_fields = ('voucher', 'order', 'product', 'expires', 'created')
+    ordering = ['expires']
+
+
+class PaymentCallbackAdmin(admin.ModelAdmin):
+    list_display = ('transaction_id', 'payment_method', 'order_no', 'amount', 'status', 'paid', 'result', 'received',
+                    'processed')
+    list_filter = ('result', 'payment_method', 'paid')
+    search_fields = ('=transaction_id', '=order_no')
+    date_hierarchy = 'received'
+    readonly_fields = ('payment_method', 'transaction_id', 'order_no', 'amount', 'status', 'paid', 'payload', 'result',
+                       'received', 'processed')
+    ordering = ['-received']
+
+    def has_add_permission(self, request):
+        return False
+
+
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_no', 'user_id', 'status', 'total_selling_price', 'currency', 'created', 'archived')
+    list_filter = ('status', 'currency', 'is_removed')
+    search_fields = ('=order_no', '=user_id')
+    date_hierarchy = 'created'
+    exclude = ('payload',)
+    readonly_fields = ('order_id', 'order_no', 'user_id', 'status', 'total_selling_price', 'currency', 'is_removed',
+                       'created', 'archived', 'payload_json')
+    ordering = ['-created']
+
+    def has_add_permission(self, request):
+        return False
+
+    def payload_json(self, obj):
+        return json.dumps(archive.decompress(obj.payload), ensure_ascii=False, indent=2)
+
+    payload_json.short_description = _('payload')
+
+
+class ArchivedVoucherAdmin(admin.ModelAdmin):
+    list_display = ('code', 'product_id', 'status', 'modified', 'archived')
+    list_filter = ('status',)
+    search_fields = ('code',)
+    date_hierarchy = 'modified'
+    readonly_fields = ('voucher_id', 'product_id', 'code', 'remarks', 'status', 'created', 'modified', 'archived')
+    ordering = ['-modified']
+
+    def has_add_permission(self, request):
+        return False
+
+
+class VoucherAdmin(ArchiveFallThroughMixin, admin.ModelAdmin):
     list_display = ('status', 'created')
     list_select_related = ('product',)
     list_filter = ('status', VoucherProductCategoryFilterSpec, VoucherListPriceFilterSpec)
@@ -265,6 +480,10 @@ class VoucherAdmin(admin.ModelAdmin):
     readonly_fields = ('is_removed', 'created')
     inlines = [OrderProductVoucherInline, NaverOrderProductVoucherInline]
     order = ['-created']
+    archived_model = models.ArchivedVoucher
+
+    def archived_lookups(self, search_term):
+        return {'code': search_term}
 
 
 class OrderProductAdmin(admin.ModelAdmin):
@@ -277,6 +496,7 @@ class OrderProductAdmin(admin.ModelAdmin):
     readonly_fields = ('order', 'name', 'code', 'list_price', 'selling_price', 'quantity')
     inlines = [OrderProductVoucherInline]
     order = ['-created']
+    actions = [refund_order_products, ]
 
     def get_queryset(self, request):
         return super(OrderProductAdmin, self).get_queryset(request) \
@@ -292,6 +512,7 @@ class OrderProductVoucherAdmin(admin.ModelAdmin):
     fields = ('order_no', 'product_name_subtitle', 'code_truncated', 'remarks', 'created')
     readonly_fields = ('remarks', 'created',)
     order = ['-created']
+    actions = [export_action('vouchers', 'csv'), export_action('vouchers', 'xlsx'), ]
 
 
 class NaverOrderAdmin(admin.ModelAdmin):
@@ -339,15 +560,32 @@ class NaverOrderProductVoucherAdmin(admin.ModelAdmin):
 
 
 class LegacyOrderAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('customer_id', 'last_purchased', 'total_order_count', 'max_price', 'average_price')
+    list_select_related = ('customer_id',)
+    search_fields = ('customer_id__email', 'customer_id__phone')
+    raw_id_fields = ('customer_id',)
+    ordering = ['-last_purchased']
 
 
 class LegacyOrderProductAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('customer_id', 'product_name')
+    list_select_related = ('customer_id',)
+    search_fields = ('customer_id__email', 'product_name')
+    raw_id_fields = ('customer_id',)
 
 
 class LegacyCustomerAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('customer_id', 'email', 'last_name', 'first_name', 'phone', 'date_joined', 'merged')
+    search_fields = ('email', 'phone')
+    ordering = ['customer_id']
+
+
+class ShortMessageServiceAdmin(admin.ModelAdmin):
+    list_display = ('phone_from', 'phone_to', 'content', 'deposit', 'created')
+    list_filter = ('deposit', 'success')
+    search_fields = ('phone_from', 'content')
+    date_hierarchy = 'created'
+    ordering = ['-created']
 
 
 class NaverAdvertisementLogAdmin(admin.ModelAdmin):
@@ -361,15 +599,127 @@ class NaverAdvertisementLogAdmin(admin.ModelAdmin):
 
 
 class MileageLogAdmin(admin.ModelAdmin):
-    list_display = ('mileage', 'created', 'order')
-    list_select_related = ('user', 'user__profile', 'order')
+    list_display = ('mileage', 'created', 'order', 'archived_order')
+    list_select_related = ('user', 'user__profile', 'order', 'archived_order')
     search_fields = ('user__email',)
-    readonly_fields = ('is_removed', 'created')
+    readonly_fields = ('archived_order', 'is_removed', 'created')
     date_hierarchy = 'created'
     ordering = ['-created']
     raw_id_fields = ('user', 'order')
 
 
+class MileageCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('user', 'mileage', 'log_id', 'logged')
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    readonly_fields = ('user', 'mileage', 'log_id', 'logged', 'created')
+    ordering = ['-logged']
+    raw_id_fields = ('user',)
+
+
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'code', 'name', 'quantity', 'revenue', 'list_revenue', 'currency', 'store')
+    list_select_related = ('store',)
+    list_filter = ('currency', 'store')
+    search_fields = ('code', 'name')
+    date_hierarchy = 'date'
+    readonly_fields = ('date', 'store', 'code', 'name', 'currency', 'quantity', 'revenue', 'list_revenue')
+    ordering = ['-date', 'code']
+    change_list_template = 'admin/shop/dailyproductsales/change_list.html'
+
+    chart_width = 720
+    chart_height = 160
+
+    def get_urls(self):
+        return [
+            path('dashboard/',
+                 self.admin_site.admin_view(self.dashboard_view),
+                 name='shop_dailyproductsales_dashboard'),
+        ] + super(DailyProductSalesAdmin, self).get_urls()
+
+    def chart(self, title, values):
+        # SVG polyline points of a series scaled to the chart box
+        top = max(max(values, default=0), 1)
+        bottom = min(min(values, default=0), 0)
+        step = self.chart_width / max(len(values) - 1, 1)
+        points = ' '.join(
+            f'{index * step:.1f},{self.chart_height - (value - bottom) / (top - bottom) * self.chart_height:.1f}'
+            for index, value in enumerate(values)
+        )
+        return {'title': title, 'points': points, 'total': sum(values)}
+
+    def dashboard_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        try:
+            days = min(max(int(request.GET.get('days', 365)), 1), 3660)
+        except ValueError:
+            days = 365
+
+        queryset = models.DailyProductSales.objects.filter(date__gt=localdate() - timedelta(days=days))
+
+        store = request.GET.get('store')
+
+        if store and store.isdigit():
+            queryset = queryset.filter(store_id=store)
+
+        # Revenues are charted for one currency at a time
+        currency = request.GET.get('currency')
+
+        if currency not in models.Order.CURRENCY_CHOICES:
+            currency = models.Order.CURRENCY_CHOICES.KRW
+
+        queryset = queryset.filter(currency=currency)
+
+        series = list(queryset
+                      .values('date')
+                      .annotate(total_quantity=Sum('quantity'),
+                                total_revenue=Sum('revenue'),
+                                total_list_revenue=Sum('list_revenue'))
+                      .order_by('date'))
+
+        top_products = queryset \
+            .values('code') \
+            .annotate(product_name=Max('name'),
+                      total_quantity=Sum('quantity'),
+                      total_revenue=Sum('revenue'),
+                      total_list_revenue=Sum('list_revenue')) \
+            .order_by('-total_revenue')[:20]
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_('Sales dashboard'),
+            opts=self.model._meta,
+            days=days,
+            store=store,
+            stores=models.Store.objects.only('id', 'name'),
+            currency=currency,
+            currencies=models.Order.CURRENCY_CHOICES,
+            width=self.chart_width,
+            height=self.chart_height,
+            first=series[0]['date'] if series else None,
+            last=series[-1]['date'] if series else None,
+            charts=[
+                self.chart(_('Revenue'), [row['total_revenue'] for row in series]),
+                self.chart(_('Units'), [row['total_quantity'] for row in series]),
+                # No purchase cost is recorded, so the spread below list price stands in for margin
+                self.chart(_('Discount from list price'),
+                           [row['total_list_revenue'] - row['total_revenue'] for row in series]),
+            ],
+            top_products=top_products,
+        )
+
+        return TemplateResponse(request, 'admin/shop/dailyproductsales/dashboard.html', context)
+
+
+class ProductRecommendationAdmin(admin.ModelAdmin):
+    list_display = ('code', 'related', 'updated')
+    search_fields = ('code',)
+    readonly_fields = ('code', 'related', 'updated')
+    ordering = ['code']
+
+
 class PurchaseOrderAdmin(admin.ModelAdmin):
     list_display = ('title', 'bank_account', 'amount', 'paid', 'created')
     search_fields = ('bank_account', 'amount')
@@ -378,6 +728,7 @@ class PurchaseOrderAdmin(admin.ModelAdmin):
     date_hierarchy = 'created'
     ordering = ['-created']
     inlines = [PurchaseOrderPaymentInline, ]
+    actions = [export_action('purchase_orders', 'csv'), export_action('purchase_orders', 'xlsx'), ]
 
 
 admin.site.register(models.Store, StoreAdmin)
@@ -385,8 +736,10 @@ admin.site.register(models.Product, ProductAdmin)
 admin.site.register(models.ProductList, ProductListAdmin)
 admin.site.register(models.Category, CategoryAdmin)
 admin.site.register(models.Order, OrderAdmin)
+admin.site.register(models.OrderStatusLog, OrderStatusLogAdmin)
 admin.site.register(models.OrderProduct, OrderProductAdmin)
 admin.site.register(models.Voucher, VoucherAdmin)
+admin.site.register(models.VoucherHold, VoucherHoldAdmin)
 admin.site.register(models.OrderProductVoucher, OrderProductVoucherAdmin)
 admin.site.register(models.NaverOrder, NaverOrderAdmin)
 admin.site.register(models.NaverOrderProduct, NaverOrderProductAdmin)
@@ -394,6 +747,13 @@ admin.site.register(models.NaverOrderProductVoucher, NaverOrderProductVoucherAdm
 admin.site.register(models.LegacyCustomer, LegacyCustomerAdmin)
 admin.site.register(models.LegacyOrder, LegacyOrderAdmin)
 admin.site.register(models.LegacyOrderProduct, LegacyOrderProductAdmin)
+admin.site.register(models.ShortMessageService, ShortMessageServiceAdmin)
 admin.site.register(models.NaverAdvertisementLog, NaverAdvertisementLogAdmin)
 admin.site.register(models.MileageLog, MileageLogAdmin)
+admin.site.register(models.MileageCheckpoint, MileageCheckpointAdmin)
+admin.site.register(models.DailyProductSales, DailyProductSalesAdmin)
+admin.site.register(models.ProductRecommendation, ProductRecommendationAdmin)
 admin.site.register(models.PurchaseOrder, PurchaseOrderAdmin)
+admin.site.register(models.PaymentCallback, PaymentCallbackAdmin)
+admin.site.register(models.ArchivedOrder, ArchivedOrderAdmin)
+admin.site.register(models.ArchivedVoucher, ArchivedVoucherAdmin)
@@ -6,3 +6,6 @@ class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
     verbose = _('shop')
+
+    def ready(self):
+        from shop import signals  # noqa
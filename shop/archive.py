@@ -0,0 +1,205 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils.timezone import now
+
+from common.batch import keyset_chunks
+from shop import models
+from shop import reservations
+
+STATUS = models.Order.STATUS_CHOICES
+
+VOUCHER_STATUS = models.Voucher.STATUS_CHOICES
+
+CLOSED = (STATUS.shipped, STATUS.voided, STATUS.refunded1, STATUS.refunded2)
+
+ARCHIVED_VOUCHER_STATUSES = (VOUCHER_STATUS.sold, VOUCHER_STATUS.revoked)
+
+
+def cutoff(days=None):
+    return now() - timedelta(days=days or getattr(settings, 'ARCHIVE_AFTER_DAYS', 90))
+
+
+def archivable_orders(before):
+    # Closed parent orders untouched since `before` whose refund orders are too; refund orders go with their parent
+    open_children = models.Order.all_objects \
+        .filter(parent=OuterRef('pk')) \
+        .exclude(status__in=CLOSED, modified__lt=before)
+
+    return models.Order.all_objects \
+        .filter(status__in=CLOSED, modified__lt=before, parent__isnull=True) \
+        .exclude(Exists(open_children))
+
+
+def archivable_vouchers(before):
+    return models.Voucher.all_objects.filter(status__in=ARCHIVED_VOUCHER_STATUSES, modified__lt=before)
+
+
+def compress(data):
+    return zlib.compress(json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode())
+
+
+def decompress(payload):
+    return json.loads(zlib.decompress(bytes(payload)))
+
+
+def by_order(rows, key='order_id'):
+    grouped = defaultdict(list)
+
+    for row in rows:
+        grouped[row[key]].append(row)
+
+    return grouped
+
+
+def archive_orders(order_ids, before=None):
+    """
+    Move orders with their refund orders, lines, vouchers, payments and status logs to ArchivedOrder.
+
+    An order and its refund orders move as a unit, so the refunded quantities of an
+    order are never split between the hot tables and the archive. The orders are
+    locked and checked against archivable_orders again first, so an order changed or
+    refunded since it was picked stays hot. Mileage logs and customer questions keep
+    the archived order in `archived_order` when the delete sets their `order` to null.
+    Archive rows are inserted with ignore_conflicts, so a rerun after a failure is safe.
+    """
+    before = before or cutoff()
+
+    with transaction.atomic():
+        parent_ids = list(archivable_orders(before)
+                          .select_for_update()
+                          .filter(pk__in=order_ids)
+                          .values_list('pk', flat=True))
+
+        order_ids = set(parent_ids)
+        order_ids.update(models.Order.all_objects
+                         .select_for_update()
+                         .filter(parent_id__in=parent_ids)
+                         .values_list('pk', flat=True))
+
+        if not order_ids:
+            return 0
+
+        orders = list(models.Order.all_objects.filter(pk__in=order_ids).values())
+        products = list(models.OrderProduct.all_objects.filter(order_id__in=order_ids).values())
+        vouchers = by_order(models.OrderProductVoucher.all_objects
+                            .filter(order_product__order_id__in=order_ids)
+                            .values(), key='order_product_id')
+        payments = by_order(models.OrderPayment.all_objects.filter(order_id__in=order_ids).values())
+        logs = by_order(models.OrderStatusLog.objects.filter(order_id__in=order_ids).values())
+
+        lines = by_order(products)
+
+        models.ArchivedOrder.objects.bulk_create([
+            models.ArchivedOrder(
+                order_id=order['id'],
+                order_no=order['order_no'],
+                user_id=order['user_id'],
+                parent_id=order['parent_id'],
+                status=order['status'],
+                visible=order['visible'],
+                total_selling_price=order['total_selling_price'],
+                currency=order['currency'],
+                is_removed=order['is_removed'],
+                created=order['created'],
+                payload=compress({
+                    'order': order,
+                    'products': [
+                        dict(product, vouchers=vouchers.get(product['id'], [])) for product in lines[order['id']]
+                    ],
+                    'payments': payments.get(order['id'], []),
+                    'logs': logs.get(order['id'], []),
+                }),
+            )
+            for order in orders
+        ], ignore_conflicts=True)
+
+        for model in (models.MileageLog, models.CustomerQuestion):
+            model.all_objects.filter(order_id__in=order_ids).update(archived_order_id=F('order_id'))
+
+        # Released rather than cascaded, so Product.stock_held goes down with them
+        reservations.release(models.VoucherHold.objects.filter(order_id__in=order_ids), skip_locked=False)
+
+        models.Order.all_objects.filter(pk__in=order_ids).delete()
+
+    return len(orders)
+
+
+def archive_vouchers(voucher_ids, before=None):
+    # Order vouchers keep their code; their link to the voucher is set to null
+    before = before or cutoff()
+
+    with transaction.atomic():
+        # Vouchers changed since they were picked stay hot
+        vouchers = list(archivable_vouchers(before)
+                        .select_for_update()
+                        .filter(pk__in=voucher_ids)
+                        .values('id', 'product_id', 'code', 'remarks', 'status', 'created', 'modified'))
+
+        voucher_ids = [voucher['id'] for voucher in vouchers]
+
+        reservations.release(models.VoucherHold.objects.filter(voucher_id__in=voucher_ids), skip_locked=False)
+
+        models.ArchivedVoucher.objects.bulk_create([
+            models.ArchivedVoucher(
+                voucher_id=voucher['id'],
+                product_id=voucher['product_id'],
+                code=voucher['code'],
+                remarks=voucher['remarks'],
+                status=voucher['status'],
+                created=voucher['created'],
+                modified=voucher['modified'],
+            )
+            for voucher in vouchers
+        ], ignore_conflicts=True)
+
+        models.Voucher.all_objects.filter(pk__in=voucher_ids).delete()
+
+    return len(vouchers)
+
+
+def run(days=None, chunk_size=1000, orders=True, vouchers=True):
+    # Yields (kind, archived count) per chunk, one transaction each
+    before = cutoff(days)
+
+    if orders:
+        for order_ids in keyset_chunks(archivable_orders(before), chunk_size):
+            yield 'orders', archive_orders(order_ids, before)
+
+    if vouchers:
+        for voucher_ids in keyset_chunks(archivable_vouchers(before), chunk_size):
+            yield 'vouchers', archive_vouchers(voucher_ids, before)
+
+
+def order_products(archived_orders):
+    # (order, order product) value dicts of an ArchivedOrder queryset, one payload in memory at a time
+    for payload in archived_orders.values_list('payload', flat=True).iterator(chunk_size=500):
+        data = decompress(payload)
+
+        for product in data['products']:
+            yield data['order'], product
+
+
+def instance(model, data):
+    # An unsaved model instance from archived values, converted back from JSON
+    return model(**{
+        field.attname: field.to_python(data[field.attname])
+        for field in model._meta.concrete_fields if field.attname in data
+    })
+
+
+def archived_order(archived):
+    # An unsaved order with its order products rebuilt from an ArchivedOrder
+    payload = decompress(archived.payload)
+
+    order = instance(models.Order, payload['order'])
+    order.archived = True
+    order.archived_products = [instance(models.OrderProduct, product) for product in payload['products']]
+
+    return order
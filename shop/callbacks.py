@@ -0,0 +1,162 @@
+import hashlib
+import hmac
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from shop import models
+from shop import transitions
+
+PAYMENT_METHOD = models.Order.PAYMENT_METHOD_CHOICES
+
+RESULT = models.PaymentCallback.RESULT_CHOICES
+
+# Payment methods notified by the payment gateway by their callback URL name
+PG_METHODS = {
+    'credit_card': PAYMENT_METHOD.credit_card,
+    'bank_transfer_pg': PAYMENT_METHOD.bank_transfer_pg,
+    'virtual_account': PAYMENT_METHOD.virtual_account,
+    'phone_bill': PAYMENT_METHOD.phone_bill,
+}
+
+
+class CallbackError(Exception):
+    pass
+
+
+def signature(body):
+    return hmac.new(getattr(settings, 'PAYMENT_CALLBACK_SECRET', '').encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify(body, value):
+    # Fails closed while no secret is configured; compared as bytes, since compare_digest rejects non-ASCII str
+    return bool(getattr(settings, 'PAYMENT_CALLBACK_SECRET', '')) \
+        and hmac.compare_digest(signature(body).encode(), value.encode())
+
+
+def text(data, key, required=True):
+    # A string value that fits its PaymentCallback column; longer ones are rejected, not truncated into another key
+    value = str(data[key] if required else data.get(key, ''))
+
+    if len(value) > models.PaymentCallback._meta.get_field(key).max_length or (required and not value):
+        raise ValueError(f'invalid {key}')
+
+    return value
+
+
+def parse(payment_method, body):
+    try:
+        data = json.loads(body)
+        status = text(data, 'status', required=False)
+
+        return models.PaymentCallback(
+            payment_method=payment_method,
+            transaction_id=text(data, 'transaction_id'),
+            order_no=uuid.UUID(str(data['order_no'])),
+            amount=Decimal(str(data['amount'])),
+            status=status,
+            paid=status == 'paid',
+            payload=body.decode(),
+        )
+    except (ValueError, KeyError, TypeError, InvalidOperation) as e:
+        raise CallbackError(f'malformed callback: {e}') from e
+
+
+def ingest(callback):
+    """
+    Queue a callback once per (payment_method, transaction_id, status) and return whether it was new.
+
+    A repeat is found by the unique key; get_or_create raises any other integrity
+    error instead of ignoring it like INSERT IGNORE does on MySQL.
+    """
+    _, created = models.PaymentCallback.objects.get_or_create(
+        payment_method=callback.payment_method,
+        transaction_id=callback.transaction_id,
+        status=callback.status,
+        defaults={
+            'order_no': callback.order_no,
+            'amount': callback.amount,
+            'paid': callback.paid,
+            'payload': callback.payload,
+        },
+    )
+
+    return created
+
+
+def process(batch_size=100):
+    """
+    Apply a batch of queued callbacks and return the number processed.
+
+    Callbacks are claimed with SKIP LOCKED, so workers share the queue without waiting
+    on each other. Paid callbacks whose method and amount match move payment pending
+    orders to payment completed and record the transaction id; the status guard of
+    shop.transitions leaves orders paid already untouched.
+    """
+    with transaction.atomic():
+        callbacks = list(models.PaymentCallback.objects
+                         .select_for_update(skip_locked=True)
+                         .filter(result=RESULT.pending)
+                         .order_by('pk')[:batch_size])
+
+        if not callbacks:
+            return 0
+
+        orders = {
+            order.order_no: order
+            for order in models.Order.all_objects
+            .filter(order_no__in={callback.order_no for callback in callbacks})
+            .only('id', 'order_no', 'payment_method', 'total_selling_price')
+        }
+
+        payments = {}
+
+        for callback in callbacks:
+            order = orders.get(callback.order_no)
+
+            if order is None:
+                callback.result = RESULT.unknown_order
+            elif not callback.paid:
+                callback.result = RESULT.declined
+            elif order.payment_method != callback.payment_method or order.total_selling_price != callback.amount:
+                callback.result = RESULT.mismatch
+            elif order.pk in payments:
+                callback.result = RESULT.ignored
+            else:
+                payments[order.pk] = callback
+
+        logs = transitions.transition(list(payments), models.Order.STATUS_CHOICES.payment_completed)
+        paid = {log.order_id for log in logs}
+
+        models.Order.all_objects.bulk_update([
+            models.Order(pk=order_id, transaction_id=callback.transaction_id)
+            for order_id, callback in payments.items() if order_id in paid
+        ], ['transaction_id'])
+
+        processed = now()
+
+        for order_id, callback in payments.items():
+            callback.result = RESULT.applied if order_id in paid else RESULT.ignored
+
+        for callback in callbacks:
+            callback.processed = processed
+
+        models.PaymentCallback.objects.bulk_update(callbacks, ['result', 'processed'])
+
+    return len(callbacks)
+
+
+def run(batch_size=100):
+    # Drain the queue batch by batch; yields the number of callbacks of each batch
+    while True:
+        count = process(batch_size)
+
+        if count:
+            yield count
+
+        if count < batch_size:
+            return
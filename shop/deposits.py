@@ -0,0 +1,229 @@
+import re
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import localtime, make_aware, now
+
+from common.models import BatchCheckpoint
+from shop import models
+from shop import transitions
+
+CHECKPOINT_NAME = 'shop.deposits.sms'
+
+ACCOUNT = models.OrderPayment.ACCOUNT_CHOICES
+
+# message_id is the ShortMessageService the deposit was read from
+Deposit = namedtuple('Deposit', ['account', 'amount', 'balance', 'name', 'received', 'message_id'], defaults=(None, ))
+
+# Deposit notifications of each bank; the month, day and time are local to the store
+PARSERS = (
+    (ACCOUNT.kb, re.compile(
+        r'\[KB\]\s*(?P<month>\d{2})/(?P<day>\d{2})\s+(?P<hour>\d{2}):(?P<minute>\d{2})\s+\S+\s+'
+        r'(?P<name>.+?)\s+입금\s+(?P<amount>[\d,]+)\s+잔액\s*(?P<balance>[\d,]+)'
+    )),
+    (ACCOUNT.nh, re.compile(
+        r'농협\s*입금\s*(?P<amount>[\d,]+)원\s+(?P<month>\d{2})/(?P<day>\d{2})\s+(?P<hour>\d{2}):(?P<minute>\d{2})\s+'
+        r'\S+\s+(?P<name>.+?)\s+잔액\s*(?P<balance>[\d,]+)원'
+    )),
+    (ACCOUNT.shinhan, re.compile(
+        r'신한\s*(?P<month>\d{2})/(?P<day>\d{2})\s+(?P<hour>\d{2}):(?P<minute>\d{2})\s+\S+\s+'
+        r'입금\s+(?P<amount>[\d,]+)\s+잔액\s+(?P<balance>[\d,]+)\s+(?P<name>.+?)\s*$'
+    )),
+    (ACCOUNT.woori, re.compile(
+        r'우리\s*(?P<month>\d{2})/(?P<day>\d{2})\s+(?P<hour>\d{2}):(?P<minute>\d{2})\s+\S+\s+'
+        r'입금\s*(?P<amount>[\d,]+)원\s+(?P<name>.+?)\s+잔액\s*(?P<balance>[\d,]+)원'
+    )),
+    (ACCOUNT.ibk, re.compile(
+        r'\[IBK\]\s*(?P<month>\d{2})/(?P<day>\d{2})\s+(?P<hour>\d{2}):(?P<minute>\d{2})\s+'
+        r'입금\s*(?P<amount>[\d,]+)원\s+(?P<name>.+?)\s+잔액\s*(?P<balance>[\d,]+)원'
+    )),
+)
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name):
+    return WHITESPACE.sub('', name or '')
+
+
+def received_at(sent, month, day, hour, minute):
+    """
+    The local time of a notification, which carries no year, sent at `sent`.
+
+    A notification is dated in the year it was sent unless that would put it after the
+    day it was sent: 31 Dec read in January belongs to last year, and so does 29 Feb
+    read in a year without one. None for a date that fits neither year.
+    """
+    for year in (sent.year, sent.year - 1):
+        try:
+            received = make_aware(datetime(year, month, day, hour, minute))
+        except ValueError:
+            continue
+
+        if received <= sent + timedelta(days=1):
+            return received
+
+    return None
+
+
+def parse(content, sent=None):
+    # A deposit of a bank notification text, or None for any other message
+    sent = localtime(sent or now())
+
+    for account, parser in PARSERS:
+        match = parser.search(content)
+
+        if not match:
+            continue
+
+        received = received_at(
+            sent, int(match['month']), int(match['day']), int(match['hour']), int(match['minute'])
+        )
+
+        if received is None:
+            return None
+
+        return Deposit(
+            account=account,
+            amount=Decimal(match['amount'].replace(',', '')),
+            balance=Decimal(match['balance'].replace(',', '')),
+            name=normalize_name(match['name']),
+            received=received,
+        )
+
+    return None
+
+
+class PendingOrders:
+    """
+    Bank transfer orders awaiting payment keyed by (amount, depositor name).
+
+    The index is loaded once and topped up with orders newer than the last one seen,
+    so a match is a dictionary lookup however many deposits arrive at once.
+    """
+
+    def __init__(self, days=None):
+        self.days = days or getattr(settings, 'DEPOSIT_MATCH_DAYS', 3)
+        self.orders = defaultdict(set)
+        self.last_id = 0
+
+    def refresh(self):
+        queryset = models.Order.available_objects \
+            .filter(payment_method=models.Order.PAYMENT_METHOD_CHOICES.bank_transfer,
+                    status=models.Order.STATUS_CHOICES.payment_pending,
+                    created__gte=now() - timedelta(days=self.days),
+                    pk__gt=self.last_id) \
+            .order_by('pk') \
+            .values_list('pk', 'total_selling_price', 'fullname')
+
+        for pk, amount, fullname in queryset.iterator(chunk_size=2000):
+            self.orders[(amount, normalize_name(fullname))].add(pk)
+            self.last_id = pk
+
+        return self
+
+    def match(self, deposit):
+        # The order id of a unique match, taken out of the index, or None
+        orders = self.orders.get((deposit.amount, deposit.name))
+
+        if not orders or len(orders) > 1:
+            return None
+
+        order_id = orders.pop()
+        del self.orders[(deposit.amount, deposit.name)]
+
+        return order_id
+
+
+def apply(deposits, pending):
+    """
+    Record the deposits matching a unique pending order and mark those orders paid.
+
+    Returns the deposits left unmatched for the operators.
+    """
+    matched = []
+    payments = []
+    unmatched = []
+
+    for deposit in deposits:
+        order_id = pending.match(deposit)
+
+        if order_id is None:
+            unmatched.append(deposit)
+            continue
+
+        matched.append(deposit)
+        payments.append(models.OrderPayment(
+            order_id=order_id,
+            account=deposit.account,
+            amount=deposit.amount,
+            balance=deposit.balance,
+            received=deposit.received,
+        ))
+
+    with transaction.atomic():
+        # Orders paid by other means since the index was loaded do not move and get no payment
+        paid = {
+            log.order_id for log in transitions.transition(
+                [payment.order_id for payment in payments],
+                models.Order.STATUS_CHOICES.payment_completed,
+            )
+        }
+
+        models.OrderPayment.all_objects.bulk_create([payment for payment in payments if payment.order_id in paid])
+
+    unmatched.extend(deposit for deposit, payment in zip(matched, payments) if payment.order_id not in paid)
+
+    return unmatched
+
+
+def mark(deposits, unmatched):
+    # Record on the notifications which deposits were matched; the admin lists the unmatched ones
+    unmatched_ids = {deposit.message_id for deposit in unmatched}
+
+    for status, message_ids in (
+        (models.ShortMessageService.DEPOSIT_CHOICES.unmatched, unmatched_ids),
+        (models.ShortMessageService.DEPOSIT_CHOICES.matched,
+         {deposit.message_id for deposit in deposits} - unmatched_ids),
+    ):
+        models.ShortMessageService.objects.filter(pk__in=message_ids).update(deposit=status)
+
+
+def run(batch_size=1000, pending=None):
+    # Match the short messages received since the last run; yields (position, deposits, unmatched) per batch
+    pending = pending or PendingOrders()
+    checkpoint, _ = BatchCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+
+    while True:
+        messages = list(models.ShortMessageService.objects
+                        .filter(pk__gt=checkpoint.position)
+                        .order_by('pk')
+                        .values_list('pk', 'content', 'created')[:batch_size])
+
+        if not messages:
+            break
+
+        pending.refresh()
+
+        deposits = []
+
+        for pk, content, created in messages:
+            deposit = parse(content, created)
+
+            if deposit:
+                deposits.append(deposit._replace(message_id=pk))
+
+        # Payments, message statuses and the checkpoint commit together, so a resumed run never
+        # records a deposit twice and no unmatched deposit is passed over unrecorded
+        with transaction.atomic():
+            unmatched = apply(deposits, pending)
+            mark(deposits, unmatched)
+
+            checkpoint.position = messages[-1][0]
+            checkpoint.processed += len(deposits)
+            checkpoint.save(update_fields=['position', 'processed', 'modified'])
+
+        yield checkpoint.position, deposits, unmatched
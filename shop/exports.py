@@ -0,0 +1,271 @@
+import csv
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Sum, Q
+from django.http import StreamingHttpResponse
+from django.utils.timezone import localtime, is_aware
+
+from shop import models
+
+CHUNK_SIZE = 2000
+
+# Leading characters that make a spreadsheet program read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Export name: model and (header, lookup) columns; related lookups are joined in SQL
+EXPORTS = {
+    'orders': (models.Order, (
+        ('order no', 'order_no'),
+        ('created', 'created'),
+        ('email', 'user__email'),
+        ('fullname', 'fullname'),
+        ('payment method', 'payment_method'),
+        ('status', 'status'),
+        ('total list price', 'total_list_price'),
+        ('total selling price', 'total_selling_price'),
+        ('currency', 'currency'),
+        ('transaction id', 'transaction_id'),
+        ('parent order no', 'parent__order_no'),
+    )),
+    'vouchers': (models.OrderProductVoucher, (
+        ('order no', 'order_product__order__order_no'),
+        ('created', 'created'),
+        ('email', 'order_product__order__user__email'),
+        ('product code', 'order_product__code'),
+        ('product name', 'order_product__name'),
+        ('product subtitle', 'order_product__subtitle'),
+        ('selling price', 'order_product__selling_price'),
+        ('voucher code', 'code'),
+        ('remarks', 'remarks'),
+        ('revoked', 'revoked'),
+    )),
+    'purchase_orders': (models.PurchaseOrder, (
+        ('title', 'title'),
+        ('created', 'created'),
+        ('bank account', 'bank_account'),
+        ('amount', 'amount'),
+        ('paid amount', 'paid_amount'),
+        ('paid', 'paid'),
+    )),
+}
+
+ANNOTATIONS = {
+    'purchase_orders': {
+        'paid_amount': Sum('purchaseorderpayment__amount', filter=Q(purchaseorderpayment__is_removed=False)),
+    },
+}
+
+
+class Echo:
+    # File-like object handing back what is written, for csv.writer into a streaming response
+    def write(self, value):
+        return value
+
+
+class Chunks:
+    # Unseekable file-like object collecting bytes written by zipfile until they are drained
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer.extend(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def converters(model, lookups):
+    # Choice fields are written with their labels
+    functions = []
+
+    for lookup in lookups:
+        try:
+            field = model._meta.get_field(lookup)
+        except FieldDoesNotExist:
+            field = None
+
+        if field is not None and field.choices:
+            labels = {value: str(label) for value, label in field.flatchoices}
+            functions.append(lambda value, labels=labels: labels.get(value, value))
+        else:
+            functions.append(None)
+
+    return functions
+
+
+def rows(name, queryset):
+    """
+    Yield the header and the value tuples of an export.
+
+    Values are read with values_list in primary key pages, so no model instance is
+    built and memory stays flat whatever the size of the queryset. MySQL client
+    libraries buffer a whole result set, so QuerySet.iterator() alone would not do.
+    """
+    model, columns = EXPORTS[name]
+    lookups = [lookup for header, lookup in columns]
+
+    queryset = queryset.annotate(**ANNOTATIONS.get(name, {})).order_by('pk').values_list('pk', *lookups)
+    functions = converters(model, lookups)
+
+    yield [header for header, lookup in columns]
+
+    last = None
+
+    while True:
+        chunk = list((queryset if last is None else queryset.filter(pk__gt=last))[:CHUNK_SIZE])
+
+        if not chunk:
+            return
+
+        for row in chunk:
+            yield [function(value) if function else value for function, value in zip(functions, row[1:])]
+
+        last = chunk[-1][0]
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return (localtime(value) if is_aware(value) else value).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def csv_value(value):
+    value = format_value(value)
+
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Text typed by customers, such as a name of "=HYPERLINK(...)", stays text; XLSX inline strings never evaluate
+        return "'" + value
+
+    return value
+
+
+def csv_stream(name, queryset):
+    writer = csv.writer(Echo())
+
+    # Byte order mark for spreadsheet programs opening UTF-8 CSV
+    yield '\ufeff'
+
+    for row in rows(name, queryset):
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def column_name(index):
+    name = ''
+
+    while index >= 0:
+        index, remainder = divmod(index, 26)
+        name = chr(65 + remainder) + name
+        index -= 1
+
+    return name
+
+
+def xlsx_cell(reference, value):
+    value = format_value(value)
+
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+
+    if isinstance(value, date):
+        value = value.isoformat()
+
+    return f'<c r="{reference}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+XLSX_PARTS = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/>'
+     '</Relationships>'),
+)
+
+
+def xlsx_stream(name, queryset):
+    """
+    Yield an XLSX workbook of an export as it is written.
+
+    The worksheet uses inline strings, so it needs no shared string table,
+    and zipfile writes to an unseekable stream with data descriptors.
+    """
+    chunks = Chunks()
+
+    with zipfile.ZipFile(chunks, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for part, content in XLSX_PARTS:
+            workbook.writestr(part, content)
+
+        yield chunks.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+
+            for number, row in enumerate(rows(name, queryset), start=1):
+                cells = ''.join(
+                    xlsx_cell(f'{column_name(index)}{number}', value) for index, value in enumerate(row)
+                )
+                sheet.write(f'<row r="{number}">{cells}</row>'.encode())
+
+                if len(chunks.buffer) >= 64 * 1024:
+                    yield chunks.drain()
+
+            sheet.write(b'</sheetData></worksheet>')
+
+    yield chunks.drain()
+
+
+FORMATS = {
+    'csv': (csv_stream, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_stream, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def response(name, queryset, file_format='csv'):
+    stream, content_type = FORMATS[file_format]
+
+    streaming_response = StreamingHttpResponse(stream(name, queryset), content_type=content_type)
+    streaming_response['Content-Disposition'] = \
+        f'attachment; filename="{name}-{localtime():%Y%m%d%H%M%S}.{file_format}"'
+
+    return streaming_response
@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from shop import models
+
+FLAG_FIELDS = ('under_attack', 'signup_open')
+
+# Per-process copy of the store flags: {store code: (expires, flags)}
+_local_flags = {}
+
+
+def store_code():
+    return getattr(settings, 'STORE_CODE', 'default')
+
+
+def cache_key(code):
+    return f'shop:store:{code}:flags'
+
+
+def store_flags(code=None):
+    # Flags live in the process for a few seconds, in the cache until the store is saved
+    # and in the database only on a cold cache, so requests never query the store table.
+    code = code or store_code()
+    entry = _local_flags.get(code)
+
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+
+    flags = cache.get(cache_key(code))
+
+    if flags is None:
+        flags = refresh_store_flags(code)
+
+    _local_flags[code] = (time.monotonic() + getattr(settings, 'STORE_FLAGS_LOCAL_TTL', 5), flags)
+
+    return flags
+
+
+def refresh_store_flags(code, store=None):
+    if store is None:
+        store = models.Store.objects.filter(code=code).values(*FLAG_FIELDS).first()
+    else:
+        store = {field: getattr(store, field) for field in FLAG_FIELDS}
+
+    flags = store or {'under_attack': False, 'signup_open': True}
+
+    cache.set(cache_key(code), flags, None)
+    _local_flags.pop(code, None)
+
+    return flags
+
+
+def under_attack(code=None):
+    return store_flags(code)['under_attack']
+
+
+def signup_open(code=None):
+    return store_flags(code)['signup_open']
@@ -0,0 +1,132 @@
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.utils.timezone import localdate
+
+from shop import models
+
+SHORT_WINDOW = 7
+LONG_WINDOW = 28
+LEAD_DAYS = 3
+
+Suggestion = namedtuple('Suggestion', [
+    'product_id', 'store_id', 'code', 'name', 'stock', 'demand', 'cover', 'quantity',
+])
+
+
+def catalog():
+    # Enabled products as parallel arrays; the row of a product is its position in `codes`
+    rows = list(models.Product.available_objects
+                .filter(status=models.Product.STATUS_CHOICES.enabled)
+                .order_by('pk')
+                .values_list('pk', 'store_id', 'code', 'name',
+                             'stock_quantity', 'minimum_stock_level', 'maximum_stock_level'))
+
+    if not rows:
+        return None
+
+    ids, store_ids, codes, names, stock, minimum, maximum = zip(*rows)
+
+    return {
+        'ids': ids,
+        'store_ids': store_ids,
+        'codes': codes,
+        'names': names,
+        'stock': np.array(stock, dtype=np.int64),
+        'minimum': np.array(minimum, dtype=np.int64),
+        'maximum': np.array(maximum, dtype=np.int64),
+    }
+
+
+def sales_matrix(codes, days, today=None):
+    """
+    Daily units sold as a (products, days) array from DailyProductSales in one query.
+
+    Column -1 is yesterday, so a partly sold today does not drag the averages down.
+    """
+    today = today or localdate()
+    start = today - timedelta(days=days)
+
+    rows = {code: row for row, code in enumerate(codes)}
+    matrix = np.zeros((len(codes), days), dtype=np.int64)
+
+    # Filtered by date only; rows of products outside the catalog are dropped here
+    sales = [
+        (rows[code], (day - start).days, quantity)
+        for code, day, quantity in models.DailyProductSales.objects
+        .filter(date__gte=start, date__lt=today)
+        .values_list('code', 'date', 'quantity')
+        if code in rows
+    ]
+
+    if sales:
+        sales = np.array(sales, dtype=np.int64)
+        np.add.at(matrix, (sales[:, 0], sales[:, 1]), sales[:, 2])
+
+    return matrix
+
+
+def forecast(short_window=SHORT_WINDOW, long_window=LONG_WINDOW, lead_days=LEAD_DAYS, today=None):
+    """
+    Suggest purchase quantities for the whole catalog.
+
+    Daily demand is the larger of the short and long moving averages, so a recent
+    surge is not hidden by a quiet month. A product is reordered up to its maximum
+    stock level when its stock is at or below the minimum level or would run out
+    within the lead time.
+    """
+    products = catalog()
+
+    if products is None:
+        return []
+
+    matrix = sales_matrix(products['codes'], long_window, today)
+
+    demand = np.maximum(
+        matrix[:, -short_window:].sum(axis=1) / short_window,
+        matrix.sum(axis=1) / long_window,
+    )
+
+    stock = products['stock']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(demand > 0, stock / demand, np.inf)
+
+    quantity = np.maximum(products['maximum'] - stock, 0)
+    reorder = ((stock <= products['minimum']) | (cover < lead_days)) & (quantity > 0)
+
+    return [
+        Suggestion(
+            product_id=products['ids'][row],
+            store_id=products['store_ids'][row],
+            code=products['codes'][row],
+            name=products['names'][row],
+            stock=int(stock[row]),
+            demand=float(demand[row]),
+            cover=float(cover[row]),
+            quantity=int(quantity[row]),
+        )
+        for row in np.flatnonzero(reorder)
+    ]
+
+
+def create_purchase_orders(suggestions, today=None):
+    # One purchase order per store listing the suggested quantities; the amount is left to the invoice
+    today = today or localdate()
+    stores = models.Store.objects.in_bulk({suggestion.store_id for suggestion in suggestions})
+
+    lines = {}
+
+    for suggestion in suggestions:
+        lines.setdefault(suggestion.store_id, []).append(
+            f'{suggestion.code}\t{suggestion.name}\t{suggestion.quantity}'
+        )
+
+    return models.PurchaseOrder.all_objects.bulk_create([
+        models.PurchaseOrder(
+            title=f'{stores[store_id].name} {today:%Y-%m-%d}',
+            content='\n'.join(store_lines),
+        )
+        for store_id, store_lines in lines.items()
+    ])
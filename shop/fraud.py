@@ -0,0 +1,180 @@
+import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from common.cache import incr
+from member import bans
+from member.models import Profile
+from shop import models
+
+WINDOWS = {
+    '1h': 60 * 60,
+    '24h': 24 * 60 * 60,
+}
+
+# (feature, threshold, points): points are added when the feature exceeds the threshold
+VELOCITY_RULES = (
+    ('ip_1h', 3, 15),
+    ('ip_24h', 10, 10),
+    ('user_1h', 3, 15),
+    ('user_24h', 10, 10),
+    ('phone_1h', 3, 15),
+    ('phone_24h', 10, 10),
+    ('payment_method_1h', 200, 5),
+)
+
+
+def dimensions(order, phone):
+    return dimension_values(order.ip_address, order.user_id, phone, order.payment_method)
+
+
+def dimension_values(ip_address, user_id, phone, payment_method):
+    values = {
+        'ip': ip_address,
+        'user': user_id,
+        'phone': re.sub(r'\D', '', phone or ''),
+        'payment_method': payment_method,
+    }
+
+    return {dimension: value for dimension, value in values.items() if value not in (None, '')}
+
+
+def counter_key(dimension, value, window, bucket):
+    return f'shop:fraud:{dimension}:{value}:{window}:{bucket}'
+
+
+def record(order, phone):
+    # One counter per window bucket; a window is read as the current and the previous bucket
+    for dimension, value in dimensions(order, phone).items():
+        for window, seconds in WINDOWS.items():
+            incr(counter_key(dimension, value, window, int(time.time() // seconds)), seconds * 2)
+
+
+def velocity(order, phone):
+    """
+    Sliding-window order counts per IP, user, phone and payment method.
+
+    Each count is the current bucket plus the overlapping part of the previous bucket,
+    read with a single get_many whatever the order history of the customer.
+    """
+    timestamp = time.time()
+    keys = {}
+
+    for dimension, value in dimensions(order, phone).items():
+        for window, seconds in WINDOWS.items():
+            bucket = int(timestamp // seconds)
+            keys[f'{dimension}_{window}'] = (
+                counter_key(dimension, value, window, bucket),
+                counter_key(dimension, value, window, bucket - 1),
+                1 - (timestamp % seconds) / seconds,
+            )
+
+    counts = cache.get_many([key for current, previous, _ in keys.values() for key in (current, previous)])
+
+    return {
+        feature: counts.get(current, 0) + int(counts.get(previous, 0) * weight)
+        for feature, (current, previous, weight) in keys.items()
+    }
+
+
+def historical_velocity(orders):
+    """
+    The velocity features of orders as they were when each order was placed.
+
+    Counted from the orders table rather than the cache counters, which only know the
+    last day: the orders of the whole time span plus the longest window are read in one
+    query, and each count is two bisections in the placement times of a dimension value.
+    """
+    if not orders:
+        return {}
+
+    longest = timedelta(seconds=max(WINDOWS.values()))
+
+    placed = defaultdict(list)
+
+    for created, ip_address, user_id, phone, payment_method in models.Order.all_objects \
+            .filter(created__gte=min(order.created for order in orders) - longest,
+                    created__lte=max(order.created for order in orders)) \
+            .order_by('created') \
+            .values_list('created', 'ip_address', 'user_id', 'user__profile__phone', 'payment_method'):
+        for dimension, value in dimension_values(ip_address, user_id, phone, payment_method).items():
+            placed[(dimension, value)].append(created)
+
+    features = {}
+
+    for order in orders:
+        profile = getattr(order.user, 'profile', None) if order.user_id else None
+        order_features = features[order.pk] = {}
+
+        for dimension, value in dimensions(order, profile.phone if profile else None).items():
+            times = placed[(dimension, value)]
+
+            for window, seconds in WINDOWS.items():
+                order_features[f'{dimension}_{window}'] = \
+                    bisect_right(times, order.created) - bisect_left(times, order.created - timedelta(seconds=seconds))
+
+    return features
+
+
+def score(order, profile, features):
+    points = 0
+
+    for feature, threshold, feature_points in VELOCITY_RULES:
+        if features.get(feature, 0) > threshold:
+            points += feature_points
+
+    if order.user_id and bans.is_email_banned(order.user.email):
+        points += 100
+
+    if profile:
+        if bans.is_phone_banned(profile.phone):
+            points += 100
+
+        if profile.phone_verified_status != Profile.PHONE_VERIFIED_STATUS_CHOICES.verified:
+            points += 20
+
+        if not profile.document_verified:
+            points += 10
+
+        if not profile.total_order_count:
+            points += 10
+        elif profile.max_price and order.total_selling_price > profile.max_price * 3:
+            points += 15
+
+    if order.user_id and order.user.date_joined > now() - timedelta(days=1):
+        points += 15
+
+    return min(points, 100)
+
+
+def evaluate(order, place=False, features=None):
+    """
+    Score an order and set suspicious from the score.
+
+    Order placement passes place=True to count the order in the cache counters first;
+    batch re-scoring passes the features of historical_velocity instead.
+    """
+    profile = getattr(order.user, 'profile', None) if order.user_id else None
+    phone = profile.phone if profile else None
+
+    if place:
+        record(order, phone)
+
+    order.fraud_score = score(order, profile, velocity(order, phone) if features is None else features)
+    order.suspicious = order.fraud_score >= getattr(settings, 'FRAUD_SUSPICIOUS_SCORE', 50)
+
+    return order
+
+
+def place(order_id):
+    order = models.Order.objects.select_related('user', 'user__profile').get(pk=order_id)
+
+    evaluate(order, place=True)
+
+    models.Order.objects.filter(pk=order.pk).update(fraud_score=order.fraud_score, suspicious=order.suspicious)
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Prefetch, Q
+
+from shop import archive
+from shop import models
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+PRODUCT_FIELDS = ('id', 'order_id', 'name', 'subtitle', 'code', 'list_price', 'selling_price', 'quantity')
+
+
+def encode_cursor(created, pk):
+    return f'{(created - EPOCH) // timedelta(microseconds=1)}.{pk}'
+
+
+def decode_cursor(cursor):
+    # (created, pk) of the last order of the previous page; ValueError for a malformed cursor
+    microseconds, pk = cursor.split('.')
+    return EPOCH + timedelta(microseconds=int(microseconds)), int(pk)
+
+
+def order_history(user, cursor=None, limit=PAGE_SIZE):
+    """
+    A page of the visible orders of a user, newest first, and the cursor of the next page.
+
+    Pages are keyset ranges on (user, visible, is_removed, created) seeked from the
+    cursor, so a page costs the same for the thousandth order as for the first. The
+    primary keys of a page are read from the index alone, then their rows and order
+    products are fetched by key.
+
+    Archived orders are paged the same way on (user_id, visible, is_removed, created)
+    and merged in, so the history goes on past the orders left in the hot tables.
+    Archived orders are rebuilt from their payloads with their order products.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    queryset = models.Order.available_objects \
+        .filter(user=user, visible=models.Order.VISIBLE_CHOICES.visible)
+
+    archived = models.ArchivedOrder.objects \
+        .filter(user_id=user.pk, visible=models.Order.VISIBLE_CHOICES.visible, is_removed=False)
+
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created__lt=created) | Q(created=created, pk__lt=pk))
+        archived = archived.filter(Q(created__lt=created) | Q(created=created, order_id__lt=pk))
+
+    keys = sorted(
+        [(created, pk, False) for created, pk in queryset
+         .order_by('-created', '-pk')
+         .values_list('created', 'pk')[:limit + 1]]
+        + [(created, pk, True) for created, pk in archived
+           .order_by('-created', '-order_id')
+           .values_list('created', 'order_id')[:limit + 1]],
+        reverse=True,
+    )
+
+    page = keys[:limit]
+
+    orders = models.Order.available_objects \
+        .filter(pk__in=[pk for created, pk, is_archived in page if not is_archived]) \
+        .prefetch_related(Prefetch('orderproduct_set',
+                                   queryset=models.OrderProduct.available_objects
+                                   .only(*PRODUCT_FIELDS)
+                                   .order_by('pk'),
+                                   to_attr='products')) \
+        .in_bulk()
+
+    for row in models.ArchivedOrder.objects \
+            .filter(order_id__in=[pk for created, pk, is_archived in page if is_archived]):
+        order = archive.archived_order(row)
+        order.products = order.archived_products
+        orders[order.pk] = order
+
+    # An order archived between the reads is missing from this page only
+    orders = [orders[pk] for created, pk, is_archived in page if pk in orders]
+
+    return orders, encode_cursor(*page[-1][:2]) if len(keys) > limit else None
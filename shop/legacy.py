@@ -0,0 +1,149 @@
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.timezone import now
+
+from common.models import BatchCheckpoint
+from member.models import Profile
+from shop import models
+
+CHECKPOINT_NAME = 'shop.legacy.customers'
+
+PROFILE_FIELDS = ('last_purchased', 'total_order_count', 'max_price', 'average_price', 'total_selling_price')
+
+
+def normalize_phone(phone):
+    return re.sub(r'\D', '', phone or '')
+
+
+def phone_variants(phone):
+    # 01012345678 and 010-1234-5678 both occur in profiles
+    digits = normalize_phone(phone)
+
+    if len(digits) == 11:
+        return {digits, f'{digits[:3]}-{digits[3:7]}-{digits[7:]}'}
+    if len(digits) == 10:
+        return {digits, f'{digits[:3]}-{digits[3:6]}-{digits[6:]}'}
+    return {digits}
+
+
+def match_users(customers):
+    # Legacy customer id -> user id, by email first and by phone number second
+    emails = {customer.email.strip().lower() for customer in customers if customer.email}
+    phones = set()
+
+    for customer in customers:
+        if customer.phone:
+            phones |= phone_variants(customer.phone) | {customer.phone}
+
+    # utf8mb4_general_ci compares emails case-insensitively
+    users_by_email = {
+        email.lower(): user_id
+        for user_id, email in get_user_model().objects
+        .filter(email__in=emails)
+        .values_list('id', 'email')
+    }
+
+    users_by_phone = {}
+
+    for user_id, phone in Profile.objects.filter(phone__in=phones).values_list('user_id', 'phone'):
+        users_by_phone.setdefault(normalize_phone(phone), user_id)
+
+    matches = {}
+
+    for customer in customers:
+        user_id = users_by_email.get((customer.email or '').strip().lower())
+
+        if not user_id:
+            user_id = users_by_phone.get(normalize_phone(customer.phone))
+
+        if user_id:
+            matches[customer.customer_id] = user_id
+
+    return matches
+
+
+def merge(profile, order):
+    count = profile.total_order_count + order.total_order_count
+
+    if count:
+        total = profile.average_price * profile.total_order_count + order.average_price * order.total_order_count
+        profile.average_price = (total / count).quantize(Decimal('0.01'))
+
+    profile.total_order_count = count
+    # The recorded total when there is one; the average is rounded
+    profile.total_selling_price += order.last_total or order.average_price * order.total_order_count
+    profile.max_price = max(profile.max_price, order.max_price)
+
+    if order.last_purchased and (not profile.last_purchased or profile.last_purchased < order.last_purchased):
+        profile.last_purchased = order.last_purchased
+
+
+def migrate_customers(customer_ids):
+    # Customers merged already are skipped, so a restarted run never counts them twice
+    customers = list(models.LegacyCustomer.objects
+                     .select_for_update()
+                     .filter(customer_id__in=customer_ids, merged__isnull=True)
+                     .select_related('legacyorder'))
+
+    matches = match_users(customers)
+
+    profiles = {
+        profile.user_id: profile
+        for profile in Profile.objects.filter(user_id__in=set(matches.values())).only('id', 'user_id', *PROFILE_FIELDS)
+    }
+
+    merged = []
+
+    for customer in customers:
+        profile = profiles.get(matches.get(customer.customer_id))
+
+        if not profile:
+            continue
+
+        # Order lines alone tell neither the number of orders nor their totals
+        try:
+            merge(profile, customer.legacyorder)
+        except models.LegacyOrder.DoesNotExist:
+            pass
+
+        merged.append(customer.pk)
+
+    Profile.objects.bulk_update(profiles.values(), PROFILE_FIELDS, batch_size=1000)
+    models.LegacyCustomer.objects.filter(pk__in=merged).update(merged=now())
+
+    return len(customers), len(matches)
+
+
+def run(chunk_size=5000, restart=False):
+    checkpoint, _ = BatchCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+
+    if restart:
+        checkpoint.position = 0
+        checkpoint.processed = 0
+        checkpoint.save()
+
+    matched = 0
+
+    while True:
+        customer_ids = list(models.LegacyCustomer.objects
+                            .filter(customer_id__gt=checkpoint.position)
+                            .order_by('customer_id')
+                            .values_list('customer_id', flat=True)[:chunk_size])
+
+        if not customer_ids:
+            break
+
+        # Profiles and the checkpoint commit together, so a resumed run never merges a customer twice
+        with transaction.atomic():
+            processed, chunk_matched = migrate_customers(customer_ids)
+
+            checkpoint.position = customer_ids[-1]
+            checkpoint.processed += processed
+            checkpoint.save(update_fields=['position', 'processed', 'modified'])
+
+        matched += chunk_matched
+
+        yield checkpoint.position, checkpoint.processed, matched
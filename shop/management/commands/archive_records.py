@@ -0,0 +1,28 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from shop import archive
+
+
+class Command(BaseCommand):
+    help = 'Move closed orders and sold or revoked vouchers older than the threshold into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--skip-orders', action='store_true')
+        parser.add_argument('--skip-vouchers', action='store_true')
+
+    def handle(self, *args, **options):
+        archived = Counter()
+
+        for kind, count in archive.run(options['days'], options['chunk_size'],
+                                       orders=not options['skip_orders'],
+                                       vouchers=not options['skip_vouchers']):
+            archived[kind] += count
+            self.stdout.write(f'{kind}: {archived[kind]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{archived["orders"]} orders and {archived["vouchers"]} vouchers archived'
+        ))
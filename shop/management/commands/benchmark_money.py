@@ -0,0 +1,74 @@
+import random
+import timeit
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from shop import money
+
+
+def decimal_totals(keys, prices, quantities):
+    # The Decimal arithmetic the rollup did before shop.money
+    sums = defaultdict(Decimal)
+
+    for key, price, quantity in zip(keys, prices, quantities):
+        sums[key] += price * quantity
+
+    return sums
+
+
+def add_at(rows, column, length):
+    sums = np.zeros(length, dtype=np.int64)
+    np.add.at(sums, rows, column)
+
+    return sums
+
+
+def bincount(rows, column, length):
+    return np.rint(np.bincount(rows, weights=column, minlength=length)).astype(np.int64)
+
+
+class Command(BaseCommand):
+    help = 'Time the rollup sums of shop.money against Decimal arithmetic on synthetic order products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+
+        # Rollup keys are (date, code, currency) tuples, whose hashing dominates both sides
+        codes = [(f'2023-01-{day % 28 + 1:02d}', f'P{code}', 'USD') for day, code in
+                 ((rng.randrange(28), rng.randrange(options['keys'])) for _ in range(options['keys']))]
+        keys = [rng.choice(codes) for _ in range(options['rows'])]
+        prices = [Decimal(rng.randrange(100, 10000000)).scaleb(-2) for _ in keys]
+        quantities = [rng.randrange(1, 10) for _ in keys]
+
+        minor = [money.to_units(price) for price in prices]
+        revenues = np.array(minor, dtype=np.int64) * np.array(quantities, dtype=np.int64)
+
+        distinct, sums = money.totals(keys, revenues)
+        expected = decimal_totals(keys, prices, quantities)
+
+        if any(money.to_decimal(total) != expected[key] for key, total in zip(distinct, sums[0].tolist())):
+            self.stderr.write('money.totals does not match the Decimal sums')
+            return
+
+        # Key indexing is the same for both kernels, so they are also timed on precomputed row indexes
+        index = {key: row for row, key in enumerate(distinct)}
+        rows = np.array([index[key] for key in keys], dtype=np.int64)
+
+        cases = [
+            ('Decimal', lambda: decimal_totals(keys, prices, quantities)),
+            ('money.totals', lambda: money.totals(keys, revenues)),
+            ('np.add.at kernel', lambda: add_at(rows, revenues, len(index))),
+            ('np.bincount kernel', lambda: bincount(rows, revenues, len(index))),
+        ]
+
+        for name, function in cases:
+            best = min(timeit.repeat(function, number=1, repeat=options['repeat']))
+            self.stdout.write(f'{name}: {best * 1000:.1f} ms')
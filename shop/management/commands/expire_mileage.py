@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from common.batch import keyset_chunks
+from member.models import Profile
+from shop import mileage
+
+
+class Command(BaseCommand):
+    help = 'Expire mileage granted more than MILEAGE_EXPIRATION_DAYS ago'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'MILEAGE_EXPIRATION_DAYS', 365))
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(days=options['days'])
+
+        users = 0
+        total = 0
+
+        queryset = Profile.objects.filter(mileage__gt=0)
+
+        for user_ids in keyset_chunks(queryset, options['chunk_size'], key='user_id'):
+            expired = mileage.expire_mileage(user_ids, cutoff)
+
+            users += len(expired)
+            total += sum(expired.values())
+
+        self.stdout.write(self.style.SUCCESS(f'{total} mileage of {users} users expired before {cutoff}'))
@@ -0,0 +1,38 @@
+import sys
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from shop import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream orders, vouchers or purchase orders to a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', dest='file_format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--days', type=int, default=None, help='Rows created within this many days')
+        parser.add_argument('--output', default=None, help='Output file; standard output if omitted')
+
+    def handle(self, *args, **options):
+        model, columns = exports.EXPORTS[options['name']]
+        queryset = model.available_objects.all()
+
+        if options['days']:
+            queryset = queryset.filter(created__gte=now() - timedelta(days=options['days']))
+
+        stream, content_type = exports.FORMATS[options['file_format']]
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+
+        try:
+            for chunk in stream(options['name'], queryset):
+                output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'{options["name"]} exported to {options["output"]}'))
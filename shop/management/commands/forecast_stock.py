@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from shop import forecast
+
+
+class Command(BaseCommand):
+    help = 'Suggest purchase quantities from daily product sales and optionally create purchase orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--short-window', type=int, default=forecast.SHORT_WINDOW)
+        parser.add_argument('--long-window', type=int, default=forecast.LONG_WINDOW)
+        parser.add_argument('--lead-days', type=int, default=forecast.LEAD_DAYS)
+        parser.add_argument('--create', action='store_true', help='Create a purchase order per store')
+
+    def handle(self, *args, **options):
+        suggestions = forecast.forecast(options['short_window'], options['long_window'], options['lead_days'])
+
+        for suggestion in suggestions:
+            self.stdout.write(
+                f'{suggestion.code}\t{suggestion.name}\tstock {suggestion.stock}\t'
+                f'{suggestion.demand:.1f}/day\t{suggestion.cover:.1f} days\t+{suggestion.quantity}'
+            )
+
+        if options['create'] and suggestions:
+            purchase_orders = forecast.create_purchase_orders(suggestions)
+            self.stdout.write(f'{len(purchase_orders)} purchase orders created')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(suggestions)} products to replenish'))
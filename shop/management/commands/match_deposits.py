@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from shop import deposits
+
+
+class Command(BaseCommand):
+    help = 'Match bank deposit notifications to pending bank transfer orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=None, help='Match orders placed within this many days')
+
+    def handle(self, *args, **options):
+        pending = deposits.PendingOrders(options['days'])
+
+        for position, batch, unmatched in deposits.run(options['batch_size'], pending):
+            self.stdout.write(f'message id {position}: {len(batch) - len(unmatched)} of {len(batch)} deposits matched')
+
+            for deposit in unmatched:
+                self.stdout.write(
+                    f'  unmatched {deposit.account} {deposit.amount} {deposit.name} {deposit.received:%Y-%m-%d %H:%M}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Deposits matched'))
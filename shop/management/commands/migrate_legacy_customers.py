@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop import legacy
+
+
+class Command(BaseCommand):
+    help = 'Merge legacy customer order stats into member profiles, resuming from the last checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--restart', action='store_true', help='Start over from the first legacy customer')
+
+    def handle(self, *args, **options):
+        for position, processed, matched in legacy.run(options['chunk_size'], options['restart']):
+            self.stdout.write(f'customer id {position}: {processed} processed, {matched} matched in this run')
+
+        self.stdout.write(self.style.SUCCESS('Legacy customers migrated'))
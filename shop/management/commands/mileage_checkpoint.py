@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from common.batch import keyset_chunks
+from member.models import Profile
+from shop import mileage
+
+
+class Command(BaseCommand):
+    help = 'Write mileage balance checkpoints for users with new mileage logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = 0
+
+        for user_ids in keyset_chunks(Profile.objects.all(), options['chunk_size'], key='user_id'):
+            created += mileage.create_checkpoints(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'{created} mileage checkpoints created'))
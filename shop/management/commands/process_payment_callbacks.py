@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from shop import callbacks
+
+
+class Command(BaseCommand):
+    help = 'Apply queued payment gateway callbacks to their orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        processed = sum(callbacks.run(options['batch_size']))
+
+        self.stdout.write(self.style.SUCCESS(f'{processed} payment callbacks processed'))
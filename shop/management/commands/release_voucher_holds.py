@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from shop import reservations
+
+
+class Command(BaseCommand):
+    help = 'Release expired voucher holds of unpaid orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        released = reservations.release_expired(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{released} voucher holds released'))
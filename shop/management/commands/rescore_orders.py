@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from common.batch import keyset_chunks
+from shop import fraud
+from shop.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Recompute fraud scores of recent orders with the order velocity at the time they were placed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.filter(created__gte=now() - timedelta(days=options['days']))
+
+        scored = 0
+        suspicious = 0
+
+        for ids in keyset_chunks(queryset, options['chunk_size']):
+            orders = list(Order.objects.filter(pk__in=ids).select_related('user', 'user__profile'))
+
+            features = fraud.historical_velocity(orders)
+
+            for order in orders:
+                fraud.evaluate(order, features=features[order.pk])
+                suspicious += order.suspicious
+
+            Order.objects.bulk_update(orders, ['fraud_score', 'suspicious'])
+
+            scored += len(orders)
+
+        self.stdout.write(self.style.SUCCESS(f'{scored} orders scored, {suspicious} suspicious'))
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localdate
+
+from shop import sales
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily product sales of the days with orders changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Recompute this many recent days instead')
+        parser.add_argument('--since', type=date.fromisoformat, default=None,
+                            help='Recompute every day from this date (YYYY-MM-DD) instead')
+
+    def handle(self, *args, **options):
+        days = None
+        today = localdate()
+
+        if options['since']:
+            days = [options['since'] + timedelta(days=i) for i in range((today - options['since']).days + 1)]
+        elif options['days']:
+            days = [today - timedelta(days=i) for i in range(options['days'])]
+
+        days = sales.run(days)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(days)} days of sales recomputed'))
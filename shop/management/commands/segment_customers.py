@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from member.models import Profile
+from shop import segments
+
+
+class Command(BaseCommand):
+    help = 'Score every customer by recency, frequency and monetary value and label its segment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        counts = segments.run(options['chunk_size'])
+
+        for value, label in Profile.RFM_SEGMENT_CHOICES:
+            self.stdout.write(f'{label}: {counts.get(value, 0)}')
+
+        self.stdout.write(self.style.SUCCESS(f'{sum(counts.values())} customers segmented'))
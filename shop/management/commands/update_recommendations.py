@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from shop import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Update customers-also-bought recommendations from orders verified since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--rebuild', action='store_true', help='Recount every verified order')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--partitions', type=int, default=1,
+                            help='Passes over the orders on rebuild, each holding a share of the products')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            for number, pairs in recommendations.rebuild(options['chunk_size'], options['partitions']):
+                self.stdout.write(f'partition {number + 1}/{options["partitions"]}: {pairs} pairs')
+        else:
+            for position, orders, products in recommendations.run(options['batch_size']):
+                self.stdout.write(f'status log id {position}: {orders} orders, {products} products updated')
+
+        self.stdout.write(self.style.SUCCESS('Recommendations updated'))
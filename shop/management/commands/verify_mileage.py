@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from common.batch import keyset_chunks
+from member.models import Profile
+from shop import mileage
+
+
+class Command(BaseCommand):
+    help = 'Compare profile mileage balances with the mileage ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--fix', action='store_true', help='Set drifted balances to the ledger balance')
+
+    def handle(self, *args, **options):
+        checked = 0
+        drifted = 0
+
+        for user_ids in keyset_chunks(Profile.objects.all(), options['chunk_size'], key='user_id'):
+            checked += len(user_ids)
+
+            drift = mileage.find_drift(user_ids)
+
+            for user_id, balance, ledger in drift:
+                self.stdout.write(f'user {user_id}: profile {balance} ledger {ledger} drift {balance - ledger}')
+
+            drifted += len(drift)
+
+            if options['fix'] and drift:
+                with transaction.atomic():
+                    # Recheck under the row locks the ledger takes when appending
+                    locked = list(Profile.objects.select_for_update()
+                                  .filter(user_id__in=[user_id for user_id, _, _ in drift]))
+                    balances = mileage.ledger_balances([profile.user_id for profile in locked])
+
+                    for profile in locked:
+                        profile.mileage = balances[profile.user_id]
+
+                    Profile.objects.bulk_update(locked, ['mileage'])
+
+        self.stdout.write(self.style.SUCCESS(f'{checked} users checked, {drifted} drifted'))
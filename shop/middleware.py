@@ -0,0 +1,118 @@
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from common.cache import incr
+from common.network import client_ip
+from shop import flags
+
+CHALLENGE_SALT = 'shop.middleware.challenge'
+
+CHALLENGE_PAGE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="robots" content="noindex"><title>...</title></head>
+<body><script>
+document.cookie = "{name}={token}; max-age={max_age}; path=/; samesite=lax";
+location.reload();
+</script><noscript>JavaScript is required.</noscript></body></html>'''
+
+
+class UnderAttackMiddleware:
+    """
+    Sliding-window rate limiting while the store is flagged as under attack.
+
+    A request is counted against its IP and, if it carries a session cookie, against
+    its session with atomic cache increments, after one get_many of both buckets. The
+    count of the current `period` window is added to the count of the previous window
+    weighted by how much of it still overlaps the last `period` seconds, so no more than
+    about `capacity` requests pass in any `period` seconds, including across window
+    edges. The store flag is read from the process-local copy in `shop.flags`, so
+    requests outside an attack cost nothing.
+
+    Behind proxies, the client address is read by common.network.client_ip from
+    `UNDER_ATTACK_IP_HEADER` and `UNDER_ATTACK_PROXY_COUNT`.
+
+    Place it before SessionMiddleware so that rejected requests never load a session,
+    authenticate a user or verify an OTP device.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        self.ip_capacity = getattr(settings, 'UNDER_ATTACK_IP_CAPACITY', 60)
+        self.session_capacity = getattr(settings, 'UNDER_ATTACK_SESSION_CAPACITY', 30)
+        self.period = getattr(settings, 'UNDER_ATTACK_PERIOD', 60)
+        self.challenge = getattr(settings, 'UNDER_ATTACK_CHALLENGE', True)
+        self.challenge_cookie = getattr(settings, 'UNDER_ATTACK_CHALLENGE_COOKIE', 'challenge')
+        self.challenge_max_age = getattr(settings, 'UNDER_ATTACK_CHALLENGE_MAX_AGE', 60 * 60)
+        self.exempt_paths = tuple(getattr(settings, 'UNDER_ATTACK_EXEMPT_PATHS', ()))
+
+    def __call__(self, request):
+        if not flags.under_attack() or request.path.startswith(self.exempt_paths):
+            return self.get_response(request)
+
+        ip_address = client_ip(request)
+
+        if self.challenge and not self.passed_challenge(request, ip_address):
+            return self.challenge_response(ip_address)
+
+        now = time.time()
+        retry_after = self.period - int(now % self.period)
+
+        buckets = [(f'ip:{ip_address}', self.ip_capacity)]
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+        if session_key:
+            buckets.append((f'session:{session_key}', self.session_capacity))
+
+        if not self.take_tokens(buckets, now):
+            return self.too_many_requests(retry_after)
+
+        return self.get_response(request)
+
+    def take_tokens(self, buckets, now):
+        # The previous windows of all (identity, capacity) buckets are read with one get_many; a full bucket stops
+        window, elapsed = divmod(now, self.period)
+        window = int(window)
+
+        previous = cache.get_many([f'shop:bucket:{identity}:{window - 1}' for identity, capacity in buckets])
+
+        for identity, capacity in buckets:
+            current = incr(f'shop:bucket:{identity}:{window}', self.period * 2)
+            weighted = previous.get(f'shop:bucket:{identity}:{window - 1}', 0) * (self.period - elapsed) / self.period
+
+            if weighted + current > capacity:
+                return False
+
+        return True
+
+    def passed_challenge(self, request, ip_address):
+        token = request.COOKIES.get(self.challenge_cookie)
+
+        if not token:
+            return False
+
+        try:
+            return signing.loads(token, salt=CHALLENGE_SALT, max_age=self.challenge_max_age) == ip_address
+        except signing.BadSignature:
+            return False
+
+    def challenge_response(self, ip_address):
+        token = signing.dumps(ip_address, salt=CHALLENGE_SALT)
+
+        response = HttpResponse(
+            CHALLENGE_PAGE.format(name=self.challenge_cookie, token=token, max_age=self.challenge_max_age),
+            status=503,
+        )
+        response['Cache-Control'] = 'no-store'
+        response['Retry-After'] = '1'
+        return response
+
+    @staticmethod
+    def too_many_requests(retry_after):
+        response = HttpResponse(status=429)
+        response['Retry-After'] = str(retry_after)
+        response['Cache-Control'] = 'no-store'
+        return response
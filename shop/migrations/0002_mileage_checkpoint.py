@@ -0,0 +1,51 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:02
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MileageCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('log_id', models.BigIntegerField(verbose_name='last mileage log id')),
+                ('logged', models.DateTimeField(verbose_name='last mileage log date')),
+                ('mileage', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=11, verbose_name='mileage balance')),
+            ],
+            options={
+                'verbose_name': 'mileage checkpoint',
+                'verbose_name_plural': 'mileage checkpoints',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mileagelog',
+            index=models.Index(fields=['user', 'created'], name='shop_mileag_user_id_2ea832_idx'),
+        ),
+        migrations.AddField(
+            model_name='mileagecheckpoint',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+        migrations.AddIndex(
+            model_name='mileagecheckpoint',
+            index=models.Index(fields=['user', 'logged'], name='shop_mileag_user_id_504bde_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mileagecheckpoint',
+            unique_together={('user', 'log_id')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_mileage_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='fraud_score',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='fraud score'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shop', '0003_order_fraud_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.IntegerField(choices=[(0, 'payment pending'), (1, 'payment completed'), (2, 'under review'), (3, 'payment verified'), (4, 'shipped'), (5, 'refund requested'), (6, 'refund pending'), (7, 'refunded'), (8, 'refunded'), (9, 'voided')], verbose_name='old order status')),
+                ('new_status', models.IntegerField(choices=[(0, 'payment pending'), (1, 'payment completed'), (2, 'under review'), (3, 'payment verified'), (4, 'shipped'), (5, 'refund requested'), (6, 'refund pending'), (7, 'refunded'), (8, 'refunded'), (9, 'voided')], verbose_name='new order status')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='actor')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.order', verbose_name='order')),
+            ],
+            options={
+                'verbose_name': 'order status log',
+                'verbose_name_plural': 'order status logs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderstatuslog',
+            index=models.Index(fields=['order', 'created'], name='shop_orders_order_i_fd90da_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:19
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_order_status_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('code', models.CharField(max_length=255, verbose_name='product code')),
+                ('name', models.CharField(max_length=255, verbose_name='product name')),
+                ('quantity', models.IntegerField(default=0, verbose_name='quantity')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=13, verbose_name='revenue')),
+                ('list_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=13, verbose_name='list price revenue')),
+            ],
+            options={
+                'verbose_name': 'daily product sales',
+                'verbose_name_plural': 'daily product sales',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['modified'], name='shop_order_modifie_92dbef_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='store',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shop.store', verbose_name='store'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyproductsales',
+            index=models.Index(fields=['store', 'date'], name='shop_dailyp_store_i_e8fa36_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyproductsales',
+            unique_together={('date', 'code')},
+        ),
+    ]
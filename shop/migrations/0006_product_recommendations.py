@@ -0,0 +1,40 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_daily_product_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255, unique=True, verbose_name='product code')),
+                ('related', models.TextField(blank=True, verbose_name='related product codes')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+            ],
+            options={
+                'verbose_name': 'product recommendation',
+                'verbose_name_plural': 'product recommendations',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255, verbose_name='product code')),
+                ('related_code', models.CharField(max_length=255, verbose_name='related product code')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='order count')),
+            ],
+            options={
+                'verbose_name': 'product pair',
+                'verbose_name_plural': 'product pairs',
+                'unique_together': {('code', 'related_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_held',
+            field=models.IntegerField(default=0, verbose_name='stock held'),
+        ),
+        migrations.CreateModel(
+            name='VoucherHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expires', models.DateTimeField(db_index=True, verbose_name='expiration date')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.order', verbose_name='order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.product', verbose_name='product')),
+                ('voucher', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='shop.voucher', verbose_name='voucher')),
+            ],
+            options={
+                'verbose_name': 'voucher hold',
+                'verbose_name_plural': 'voucher holds',
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:25
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_voucher_hold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(unique=True, verbose_name='order id')),
+                ('order_no', models.UUIDField(unique=True, verbose_name='order no')),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='user id')),
+                ('status', models.IntegerField(choices=[(0, 'payment pending'), (1, 'payment completed'), (2, 'under review'), (3, 'payment verified'), (4, 'shipped'), (5, 'refund requested'), (6, 'refund pending'), (7, 'refunded'), (8, 'refunded'), (9, 'voided')], verbose_name='order status')),
+                ('total_selling_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=11, verbose_name='total price')),
+                ('created', models.DateTimeField(verbose_name='created')),
+                ('payload', models.BinaryField(verbose_name='payload')),
+                ('archived', models.DateTimeField(default=django.utils.timezone.now, verbose_name='archived date')),
+            ],
+            options={
+                'verbose_name': 'archived order',
+                'verbose_name_plural': 'archived orders',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedVoucher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('voucher_id', models.BigIntegerField(unique=True, verbose_name='voucher id')),
+                ('product_id', models.BigIntegerField(db_index=True, verbose_name='product id')),
+                ('code', models.CharField(db_index=True, max_length=64, verbose_name='voucher code')),
+                ('remarks', models.CharField(blank=True, max_length=64, verbose_name='voucher remarks')),
+                ('status', models.IntegerField(choices=[(0, 'purchased'), (1, 'sold'), (2, 'revoked')], verbose_name='status')),
+                ('created', models.DateTimeField(verbose_name='created')),
+                ('modified', models.DateTimeField(verbose_name='modified')),
+                ('archived', models.DateTimeField(default=django.utils.timezone.now, verbose_name='archived date')),
+            ],
+            options={
+                'verbose_name': 'archived voucher',
+                'verbose_name_plural': 'archived vouchers',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='naverorder',
+            index=models.Index(fields=['is_removed', 'status', 'created'], name='shop_navero_is_remo_12779f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='noticemessage',
+            index=models.Index(fields=['is_removed', 'created'], name='shop_notice_is_remo_c00a74_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_removed', 'status', 'created'], name='shop_order_is_remo_93084d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_removed', 'status', 'created'], name='shop_produc_is_remo_a8b1e8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['is_removed', 'status', 'created'], name='shop_vouche_is_remo_b292d3_idx'),
+        ),
+    ]
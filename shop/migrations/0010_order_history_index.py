@@ -0,0 +1,17 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'visible', 'is_removed', 'created'], name='shop_order_user_id_f9b88f_idx'),
+        ),
+    ]
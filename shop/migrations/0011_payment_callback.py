@@ -0,0 +1,46 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_order_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_method', models.IntegerField(choices=[(0, 'Bank Transfer'), (1, 'Escrow (KB)'), (2, 'PayPal'), (3, 'Credit Card'), (4, 'Bank Transfer (PG)'), (5, 'Virtual Account'), (6, 'Phone Bill')], verbose_name='payment method')),
+                ('transaction_id', models.CharField(max_length=64, verbose_name='transaction id')),
+                ('order_no', models.UUIDField(verbose_name='order no')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=11, verbose_name='amount')),
+                ('paid', models.BooleanField(verbose_name='paid')),
+                ('payload', models.TextField(verbose_name='payload')),
+                ('result', models.IntegerField(choices=[(0, 'pending'), (1, 'applied'), (2, 'ignored'), (3, 'declined'), (4, 'method or amount mismatch'), (5, 'unknown order')], default=0, verbose_name='result')),
+                ('received', models.DateTimeField(default=django.utils.timezone.now, verbose_name='received date')),
+                ('processed', models.DateTimeField(blank=True, null=True, verbose_name='processed date')),
+            ],
+            options={
+                'verbose_name': 'payment callback',
+                'verbose_name_plural': 'payment callbacks',
+            },
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='transaction_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='transaction id'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentcallback',
+            index=models.Index(fields=['result'], name='shop_paymen_result_7d5970_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='paymentcallback',
+            unique_together={('payment_method', 'transaction_id')},
+        ),
+    ]
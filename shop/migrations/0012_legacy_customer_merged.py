@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_payment_callback'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='legacycustomer',
+            name='merged',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='merged date'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_legacy_customer_merged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderproduct',
+            name='refunded_order_product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='refund_order_products', to='shop.orderproduct', verbose_name='refunded order product'),
+        ),
+    ]
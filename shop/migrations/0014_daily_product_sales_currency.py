@@ -0,0 +1,34 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:46
+
+from django.db import migrations, models
+
+
+def rebuild_rollup(apps, schema_editor):
+    # Rows written before the currency column mixed currencies; the next rollup_sales rebuilds them all
+    apps.get_model('shop', 'DailyProductSales').objects.all().delete()
+    apps.get_model('common', 'BatchCheckpoint').objects.filter(name='shop.sales.rollup').update(position=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_batch_checkpoint'),
+        ('shop', '0013_refunded_order_product'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dailyproductsales',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='currency',
+            field=models.CharField(choices=[('KRW', 'KRW'), ('USD', 'USD')], default='KRW', max_length=3, verbose_name='currency'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyproductsales',
+            unique_together={('date', 'code', 'currency')},
+        ),
+        migrations.RunPython(rebuild_rollup, migrations.RunPython.noop),
+    ]
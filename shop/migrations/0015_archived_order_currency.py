@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:50
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def fill_from_payload(apps, schema_editor):
+    ArchivedOrder = apps.get_model('shop', 'ArchivedOrder')
+
+    for archived in ArchivedOrder.objects.only('pk', 'payload').iterator(chunk_size=500):
+        order = json.loads(zlib.decompress(bytes(archived.payload)))['order']
+
+        ArchivedOrder.objects \
+            .filter(pk=archived.pk) \
+            .update(currency=order['currency'], is_removed=order['is_removed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_daily_product_sales_currency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='currency',
+            field=models.CharField(choices=[('KRW', 'KRW'), ('USD', 'USD')], default='KRW', max_length=3, verbose_name='currency'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='is_removed',
+            field=models.BooleanField(default=False, verbose_name='removed'),
+        ),
+        migrations.RunPython(fill_from_payload, migrations.RunPython.noop),
+    ]
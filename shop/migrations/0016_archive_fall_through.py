@@ -0,0 +1,57 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:53
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_from_payload(apps, schema_editor):
+    ArchivedOrder = apps.get_model('shop', 'ArchivedOrder')
+
+    for archived in ArchivedOrder.objects.only('pk', 'payload').iterator(chunk_size=500):
+        order = json.loads(zlib.decompress(bytes(archived.payload)))['order']
+
+        ArchivedOrder.objects \
+            .filter(pk=archived.pk) \
+            .update(parent_id=order['parent_id'], visible=order['visible'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_archived_order_currency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='parent_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='parent order id'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='visible',
+            field=models.IntegerField(choices=[(0, 'Hidden'), (1, 'Visible')], default=1, verbose_name='visible status'),
+        ),
+        migrations.AddField(
+            model_name='customerquestion',
+            name='archived_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.archivedorder', to_field='order_id', verbose_name='archived order'),
+        ),
+        migrations.AddField(
+            model_name='mileagelog',
+            name='archived_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.archivedorder', to_field='order_id', verbose_name='archived order'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user_id', 'visible', 'is_removed', 'created'], name='shop_archiv_user_id_8e7e3a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedvoucher',
+            index=models.Index(fields=['product_id', 'code'], name='shop_archiv_product_5f5afb_idx'),
+        ),
+        migrations.RunPython(fill_from_payload, migrations.RunPython.noop),
+    ]
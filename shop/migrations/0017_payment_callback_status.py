@@ -0,0 +1,50 @@
+# Generated by Django 4.1.5 on 2026-10-19 19:59
+
+import json
+
+from django.db import migrations, models
+
+
+CHUNK_SIZE = 500
+
+
+def fill_status(apps, schema_editor):
+    PaymentCallback = apps.get_model('shop', 'PaymentCallback')
+    last = 0
+
+    while True:
+        callbacks = list(PaymentCallback.objects.filter(pk__gt=last).order_by('pk').only('pk', 'payload')[:CHUNK_SIZE])
+
+        if not callbacks:
+            return
+
+        for callback in callbacks:
+            callback.status = str(json.loads(callback.payload).get('status', ''))[:32]
+
+        PaymentCallback.objects.bulk_update(callbacks, ['status'])
+
+        last = callbacks[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0016_archive_fall_through'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='paymentcallback',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='paymentcallback',
+            name='status',
+            field=models.CharField(blank=True, max_length=32, verbose_name='status'),
+        ),
+        migrations.RunPython(fill_status, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='paymentcallback',
+            unique_together={('payment_method', 'transaction_id', 'status')},
+        ),
+    ]
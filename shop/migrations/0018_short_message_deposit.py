@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-19 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0017_payment_callback_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shortmessageservice',
+            name='deposit',
+            field=models.IntegerField(blank=True, choices=[(0, 'matched'), (1, 'unmatched')], db_index=True, null=True, verbose_name='deposit'),
+        ),
+    ]
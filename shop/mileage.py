@@ -0,0 +1,244 @@
+import logging
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Max, OuterRef, Subquery, Value, Case, When, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+from member.models import Profile
+from shop import models
+
+
+EXPIRATION_MEMO = 'mileage expired'
+
+logger = logging.getLogger(__name__)
+
+
+class MileageError(Exception):
+    pass
+
+
+def add_mileage(user, mileage, order=None, memo='', allow_negative=False):
+    # The profile row lock serializes ledger appends of a user, so the log and the balance never diverge.
+    mileage = Decimal(mileage)
+
+    with transaction.atomic():
+        profile = Profile.objects.select_for_update().only('id', 'mileage').get(user=user)
+
+        if not allow_negative and profile.mileage + mileage < 0:
+            raise MileageError(f'insufficient mileage: {profile.mileage} < {-mileage}')
+
+        log = models.MileageLog.objects.create(user=user, order=order, mileage=mileage, memo=memo)
+
+        Profile.objects.filter(pk=profile.pk).update(mileage=F('mileage') + mileage)
+
+    return log
+
+
+def last_checkpoints(user_ids):
+    return {
+        checkpoint.user_id: checkpoint
+        for checkpoint in models.MileageCheckpoint.objects
+        .filter(user_id__in=user_ids,
+                log_id=Subquery(models.MileageCheckpoint.objects
+                                .filter(user=OuterRef('user'))
+                                .order_by('-log_id')
+                                .values('log_id')[:1]))
+    }
+
+
+def ledger_totals(user_ids, watermark=None):
+    """
+    Sum of the logs after the last checkpoint of each user in one grouped query.
+
+    With a watermark, only logs up to the last log of each user created by then are summed.
+    """
+    last_log_id = Subquery(models.MileageCheckpoint.objects
+                           .filter(user=OuterRef('user'))
+                           .order_by('-log_id')
+                           .values('log_id')[:1])
+
+    logs = models.MileageLog.available_objects \
+        .filter(user_id__in=user_ids) \
+        .filter(id__gt=Coalesce(last_log_id, Value(0)))
+
+    if watermark is not None:
+        logs = logs.filter(id__lte=Subquery(models.MileageLog.available_objects
+                                            .filter(user=OuterRef('user'), created__lte=watermark)
+                                            .order_by('-id')
+                                            .values('id')[:1]))
+
+    return {
+        row['user']: row
+        for row in logs
+        .values('user')
+        .annotate(total=Sum('mileage'), log_id=Max('id'), logged=Max('created'))
+        .order_by()
+    }
+
+
+def ledger_balances(user_ids):
+    checkpoints = last_checkpoints(user_ids)
+    totals = ledger_totals(user_ids)
+
+    balances = {}
+
+    for user_id in user_ids:
+        balance = checkpoints[user_id].mileage if user_id in checkpoints else Decimal('0.00')
+
+        if user_id in totals:
+            balance += totals[user_id]['total']
+
+        balances[user_id] = balance
+
+    return balances
+
+
+def balance_at(user, when=None):
+    # Nearest checkpoint before the date plus the few logs after it instead of a full-history SUM
+    when = when or now()
+
+    checkpoint = models.MileageCheckpoint.objects \
+        .filter(user=user, logged__lte=when) \
+        .order_by('-log_id') \
+        .first()
+
+    logs = models.MileageLog.available_objects.filter(user=user, created__lte=when)
+
+    if checkpoint:
+        logs = logs.filter(id__gt=checkpoint.log_id)
+
+    total = logs.aggregate(total=Sum('mileage'))['total'] or Decimal('0.00')
+
+    return (checkpoint.mileage if checkpoint else Decimal('0.00')) + total
+
+
+def create_checkpoints(user_ids, lag=None):
+    """
+    Write a checkpoint per user covering the logs older than the lag.
+
+    Auto-increment ids are taken on insert but become visible on commit, so a recent
+    log may still be uncommitted while a log with a higher id is visible. Covering only
+    logs up to the last one created before now - lag keeps every log below the
+    checkpoint committed, as long as no transaction runs longer than the lag.
+    """
+    lag = getattr(settings, 'MILEAGE_CHECKPOINT_LAG', 60 * 60) if lag is None else lag
+
+    checkpoints = last_checkpoints(user_ids)
+
+    new_checkpoints = []
+
+    for user_id, row in ledger_totals(user_ids, now() - timedelta(seconds=lag)).items():
+        previous = checkpoints[user_id].mileage if user_id in checkpoints else Decimal('0.00')
+
+        new_checkpoints.append(models.MileageCheckpoint(
+            user_id=user_id,
+            log_id=row['log_id'],
+            logged=row['logged'],
+            mileage=previous + row['total'],
+        ))
+
+    models.MileageCheckpoint.objects.bulk_create(new_checkpoints, ignore_conflicts=True)
+
+    return len(new_checkpoints)
+
+
+def find_drift(user_ids):
+    balances = ledger_balances(user_ids)
+
+    return [
+        (user_id, mileage, balances[user_id])
+        for user_id, mileage in Profile.objects.filter(user_id__in=user_ids).values_list('user_id', 'mileage')
+        if mileage != balances[user_id]
+    ]
+
+
+def expire_mileage(user_ids, cutoff):
+    """
+    Expire mileage granted before cutoff and not spent yet.
+
+    Spending and earlier expirations consume grants first-in first-out, so whatever
+    is left of grants older than cutoff expires. Expired amounts are ledger debits
+    too, which makes a rerun for the same cutoff a no-op. An expiration never takes
+    more than the profile balance; a ledger that disagrees with the balance is logged
+    as drift for find_drift to look at.
+    """
+    with transaction.atomic():
+        balances = dict(Profile.objects.select_for_update()
+                        .filter(user_id__in=user_ids, mileage__gt=0)
+                        .values_list('user_id', 'mileage'))
+
+        user_ids = list(balances)
+
+        expired = {}
+        overdrawn = {}
+        grants = deque()
+        current = None
+
+        logs = models.MileageLog.available_objects \
+            .filter(user_id__in=user_ids) \
+            .order_by('user_id', 'created', 'id') \
+            .values_list('user_id', 'mileage', 'created')
+
+        for user_id, mileage, created in logs.iterator(chunk_size=5000):
+            if user_id != current:
+                if current is not None:
+                    expired[current] = remaining_before(grants, cutoff)
+                current = user_id
+                grants.clear()
+                overdrawn[user_id] = Decimal('0.00')
+
+            if mileage > 0:
+                grants.append([mileage, created])
+                continue
+
+            debit = -mileage
+
+            while debit > 0 and grants:
+                if grants[0][0] > debit:
+                    grants[0][0] -= debit
+                    debit = 0
+                    break
+
+                debit -= grants.popleft()[0]
+
+            # Debits beyond every earlier grant
+            overdrawn[user_id] += debit
+
+        if current is not None:
+            expired[current] = remaining_before(grants, cutoff)
+
+        for user_id, amount in overdrawn.items():
+            if amount > 0:
+                logger.warning('mileage ledger of user %s debits %s more than its grants', user_id, amount)
+
+        for user_id, amount in expired.items():
+            if amount > balances[user_id]:
+                logger.warning('mileage of user %s expires %s but the balance is %s',
+                               user_id, amount, balances[user_id])
+                expired[user_id] = balances[user_id]
+
+        expired = {user_id: amount for user_id, amount in expired.items() if amount > 0}
+
+        if not expired:
+            return {}
+
+        models.MileageLog.objects.bulk_create([
+            models.MileageLog(user_id=user_id, mileage=-amount, memo=EXPIRATION_MEMO)
+            for user_id, amount in expired.items()
+        ])
+
+        Profile.objects.filter(user_id__in=expired.keys()).update(mileage=F('mileage') - Case(
+            *[When(user_id=user_id, then=Value(amount)) for user_id, amount in expired.items()],
+            output_field=DecimalField(max_digits=11, decimal_places=2),
+        ))
+
+    return expired
+
+
+def remaining_before(grants, cutoff):
+    return sum((amount for amount, created in grants if created < cutoff), Decimal('0.00'))
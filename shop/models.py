@@ -2,6 +2,7 @@ import uuid
 from decimal import Decimal
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
@@ -172,7 +173,7 @@ class Category(common_models.AbstractCategory):
         return self.title
 
 
-class Product(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class Product(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     STATUS_CHOICES = Choices(
         (0, 'enabled', _('enabled')),
         (1, 'disabled', _('disabled')),
@@ -262,6 +263,12 @@ class Product(model_utils_models.SoftDeletableModel, model_utils_models.TimeStam
         default=0,
     )
 
+    # Vouchers held for pending orders by shop.reservations
+    stock_held = models.IntegerField(
+        verbose_name=_('stock held'),
+        default=0,
+    )
+
     stock = models.IntegerField(
         verbose_name=_('stock'),
         choices=STOCK_CHOICES,
@@ -316,6 +323,10 @@ class Product(model_utils_models.SoftDeletableModel, model_utils_models.TimeStam
         verbose_name = _('product')
         verbose_name_plural = _('products')
 
+        indexes = [
+            models.Index(fields=['is_removed', 'status', 'created', ]),
+        ]
+
     def __str__(self):
         return '{} {}'.format(self.name, self.subtitle)
 
@@ -372,7 +383,7 @@ class ProductListMembership(models.Model):
         verbose_name_plural = _('product list membership')
 
 
-class Order(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class Order(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     PAYMENT_METHOD_CHOICES = Choices(
         (0, 'bank_transfer', _('Bank Transfer')),
         (1, 'escrow', _('Escrow (KB)')),
@@ -456,6 +467,7 @@ class Order(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampe
         verbose_name=_('transaction id'),
         max_length=64,
         blank=True,
+        db_index=True,
     )
 
     status = models.IntegerField(
@@ -510,15 +522,72 @@ class Order(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampe
         default=False,
     )
 
+    fraud_score = models.PositiveSmallIntegerField(
+        verbose_name=_('fraud score'),
+        default=0,
+    )
+
     class Meta:
         verbose_name = _('pincoin order')
         verbose_name_plural = _('pincoin orders')
 
+        indexes = [
+            models.Index(fields=['modified', ]),
+            models.Index(fields=['is_removed', 'status', 'created', ]),
+            models.Index(fields=['user', 'visible', 'is_removed', 'created', ]),
+        ]
+
     def __str__(self):
         return f'{self.user} {self.total_selling_price} {self.created}'
 
 
-class OrderPayment(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class OrderStatusLog(models.Model):
+    # Append-only; written in bulk by shop.transitions
+    order = models.ForeignKey(
+        'shop.Order',
+        verbose_name=_('order'),
+        db_index=True,
+        on_delete=models.CASCADE,
+    )
+
+    old_status = models.IntegerField(
+        verbose_name=_('old order status'),
+        choices=Order.STATUS_CHOICES,
+    )
+
+    new_status = models.IntegerField(
+        verbose_name=_('new order status'),
+        choices=Order.STATUS_CHOICES,
+    )
+
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('actor'),
+        db_index=True,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    created = models.DateTimeField(
+        verbose_name=_('created'),
+        default=now,
+        editable=False,
+    )
+
+    class Meta:
+        verbose_name = _('order status log')
+        verbose_name_plural = _('order status logs')
+
+        indexes = [
+            models.Index(fields=['order', 'created', ]),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id} {self.old_status}->{self.new_status} {self.created}'
+
+
+class OrderPayment(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     ACCOUNT_CHOICES = Choices(
         (0, 'kb', _('KOOKMIN BANK')),
         (1, 'nh', _('NONGHYUP BANK')),
@@ -567,7 +636,7 @@ class OrderPayment(model_utils_models.SoftDeletableModel, model_utils_models.Tim
         return f'order - {self.order.order_no} / payment - {self.account} {self.amount} {self.received}'
 
 
-class OrderProduct(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class OrderProduct(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     order = models.ForeignKey(
         'shop.Order',
         verbose_name=_('order'),
@@ -611,6 +680,16 @@ class OrderProduct(model_utils_models.SoftDeletableModel, model_utils_models.Tim
         default=0,
     )
 
+    # The line of the original order that a line of a refund order refunds
+    refunded_order_product = models.ForeignKey(
+        'shop.OrderProduct',
+        verbose_name=_('refunded order product'),
+        null=True,
+        blank=True,
+        related_name='refund_order_products',
+        on_delete=models.SET_NULL,
+    )
+
     class Meta:
         verbose_name = _('order product')
         verbose_name_plural = _('order products')
@@ -619,7 +698,7 @@ class OrderProduct(model_utils_models.SoftDeletableModel, model_utils_models.Tim
         return f'order - {self.order.order_no} / product - {self.name}'
 
 
-class OrderProductVoucher(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class OrderProductVoucher(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     order_product = models.ForeignKey(
         'shop.OrderProduct',
         verbose_name=_('order product'),
@@ -659,7 +738,7 @@ class OrderProductVoucher(model_utils_models.SoftDeletableModel, model_utils_mod
         return f'{self.order_product.name} ({self.code}-{self.remarks})'
 
 
-class Voucher(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class Voucher(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     STATUS_CHOICES = Choices(
         (0, 'purchased', _('purchased')),
         (1, 'sold', _('sold')),
@@ -699,13 +778,68 @@ class Voucher(model_utils_models.SoftDeletableModel, model_utils_models.TimeStam
 
         indexes = [
             models.Index(fields=['code', ]),
+            models.Index(fields=['is_removed', 'status', 'created', ]),
         ]
 
     def __str__(self):
         return self.code
 
+    def validate_unique(self, exclude=None):
+        super(Voucher, self).validate_unique(exclude)
+
+        # Archived vouchers have left the table, but their codes stay taken
+        if exclude and ('product' in exclude or 'code' in exclude):
+            return
+
+        if ArchivedVoucher.objects \
+                .filter(product_id=self.product_id, code=self.code) \
+                .exclude(voucher_id=self.pk) \
+                .exists():
+            raise ValidationError({'code': _('This voucher code was used by an archived voucher.')})
+
+
+class VoucherHold(models.Model):
+    # A voucher reserved for a pending order until it is paid or the hold expires
+    voucher = models.OneToOneField(
+        'shop.Voucher',
+        verbose_name=_('voucher'),
+        on_delete=models.CASCADE,
+    )
+
+    order = models.ForeignKey(
+        'shop.Order',
+        verbose_name=_('order'),
+        db_index=True,
+        on_delete=models.CASCADE,
+    )
+
+    product = models.ForeignKey(
+        'shop.Product',
+        verbose_name=_('product'),
+        db_index=True,
+        on_delete=models.CASCADE,
+    )
+
+    expires = models.DateTimeField(
+        verbose_name=_('expiration date'),
+        db_index=True,
+    )
+
+    created = models.DateTimeField(
+        verbose_name=_('created'),
+        default=now,
+        editable=False,
+    )
+
+    class Meta:
+        verbose_name = _('voucher hold')
+        verbose_name_plural = _('voucher holds')
+
+    def __str__(self):
+        return f'{self.voucher_id} {self.order_id} {self.expires}'
+
 
-class NoticeMessage(model_utils_models.SoftDeletableModel, common_models.AbstractPage):
+class NoticeMessage(common_models.SoftDeletableModel, common_models.AbstractPage):
     CATEGORY_CHOICES = Choices(
         (0, 'common', _('Common')),
         (1, 'event', _('Game Event')),
@@ -733,11 +867,15 @@ class NoticeMessage(model_utils_models.SoftDeletableModel, common_models.Abstrac
         verbose_name = _('notice')
         verbose_name_plural = _('notice')
 
+        indexes = [
+            models.Index(fields=['is_removed', 'created', ]),
+        ]
+
     def __str__(self):
         return self.title
 
 
-class FaqMessage(model_utils_models.SoftDeletableModel, common_models.AbstractPage):
+class FaqMessage(common_models.SoftDeletableModel, common_models.AbstractPage):
     CATEGORY_CHOICES = Choices(
         (0, 'registration', _('Registration')),
         (1, 'verification', _('Verification')),
@@ -775,7 +913,7 @@ class FaqMessage(model_utils_models.SoftDeletableModel, common_models.AbstractPa
         return self.title
 
 
-class CustomerQuestion(model_utils_models.SoftDeletableModel, common_models.AbstractPage):
+class CustomerQuestion(common_models.SoftDeletableModel, common_models.AbstractPage):
     CATEGORY_CHOICES = Choices(
         (0, 'registration', _('Registration')),
         (1, 'verification', _('Verification')),
@@ -798,6 +936,17 @@ class CustomerQuestion(model_utils_models.SoftDeletableModel, common_models.Abst
         on_delete=models.SET_NULL,
     )
 
+    # Set by shop.archive when the order is archived and `order` is set to null
+    archived_order = models.ForeignKey(
+        'shop.ArchivedOrder',
+        verbose_name=_('archived order'),
+        to_field='order_id',
+        null=True,
+        blank=True,
+        related_name='+',
+        on_delete=models.SET_NULL,
+    )
+
     content = models.TextField(
         verbose_name=_('content'),
     )
@@ -833,7 +982,7 @@ class QuestionAnswer(model_utils_models.TimeStampedModel):
         verbose_name_plural = _('question answers')
 
 
-class Testimonials(model_utils_models.SoftDeletableModel, common_models.AbstractPage):
+class Testimonials(common_models.SoftDeletableModel, common_models.AbstractPage):
     store = models.ForeignKey(
         'shop.Store',
         verbose_name=_('store'),
@@ -869,6 +1018,11 @@ class TestimonialsAnswer(model_utils_models.TimeStampedModel):
 
 
 class ShortMessageService(model_utils_models.TimeStampedModel):
+    DEPOSIT_CHOICES = Choices(
+        (0, 'matched', _('matched')),
+        (1, 'unmatched', _('unmatched')),
+    )
+
     phone_from = models.CharField(
         verbose_name=_('from phone number'),
         max_length=16,
@@ -892,6 +1046,15 @@ class ShortMessageService(model_utils_models.TimeStampedModel):
         default=True,
     )
 
+    # Set by shop.deposits for bank deposit notifications; unmatched ones are left to the operators
+    deposit = models.IntegerField(
+        verbose_name=_('deposit'),
+        choices=DEPOSIT_CHOICES,
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+
     class Meta:
         verbose_name = _('short message')
         verbose_name_plural = _('short messages')
@@ -933,6 +1096,13 @@ class LegacyCustomer(models.Model):
         null=True,
     )
 
+    # Set once the customer is merged into a profile by shop.legacy
+    merged = models.DateTimeField(
+        verbose_name=_('merged date'),
+        null=True,
+        blank=True,
+    )
+
     class Meta:
         verbose_name = _('legacy customer')
         verbose_name_plural = _('legacy customers')
@@ -1011,7 +1181,7 @@ class LegacyOrderProduct(models.Model):
         return f'{self.customer_id} {self.product_name}'
 
 
-class NaverOrder(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class NaverOrder(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     PAYMENT_METHOD_CHOICES = Choices(
         (0, 'bank_transfer', _('Bank Transfer')),
     )
@@ -1090,11 +1260,15 @@ class NaverOrder(model_utils_models.SoftDeletableModel, model_utils_models.TimeS
         verbose_name = _('naver order')
         verbose_name_plural = _('naver orders')
 
+        indexes = [
+            models.Index(fields=['is_removed', 'status', 'created', ]),
+        ]
+
     def __str__(self):
         return f'{self.fullname} {self.total_selling_price} {self.created}'
 
 
-class NaverOrderProduct(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class NaverOrderProduct(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     order = models.ForeignKey(
         'shop.NaverOrder',
         verbose_name=_('order'),
@@ -1146,7 +1320,7 @@ class NaverOrderProduct(model_utils_models.SoftDeletableModel, model_utils_model
         return f'order - {self.order.order_no} / product - {self.name}'
 
 
-class NaverOrderProductVoucher(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class NaverOrderProductVoucher(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     order_product = models.ForeignKey(
         'shop.NaverOrderProduct',
         verbose_name=_('order product'),
@@ -1397,7 +1571,7 @@ class NaverAdvertisementLog(model_utils_models.TimeStampedModel):
         return f'{self.keyword}-{self.ip_address}-{self.created}'
 
 
-class MileageLog(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class MileageLog(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         verbose_name=_('user'),
@@ -1414,6 +1588,17 @@ class MileageLog(model_utils_models.SoftDeletableModel, model_utils_models.TimeS
         on_delete=models.SET_NULL,
     )
 
+    # Set by shop.archive when the order is archived and `order` is set to null
+    archived_order = models.ForeignKey(
+        'shop.ArchivedOrder',
+        verbose_name=_('archived order'),
+        to_field='order_id',
+        null=True,
+        blank=True,
+        related_name='+',
+        on_delete=models.SET_NULL,
+    )
+
     mileage = models.DecimalField(
         verbose_name=_('mileage'),
         max_digits=11,
@@ -1430,11 +1615,385 @@ class MileageLog(model_utils_models.SoftDeletableModel, model_utils_models.TimeS
         verbose_name = _('mileage log')
         verbose_name_plural = _('mileage logs')
 
+        indexes = [
+            models.Index(fields=['user', 'created', ]),
+        ]
+
     def __str__(self):
         return f'{self.user}-{self.created}'
 
 
-class PurchaseOrder(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class MileageCheckpoint(model_utils_models.TimeStampedModel):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('user'),
+        db_index=True,
+        on_delete=models.CASCADE,
+    )
+
+    # Balance of all mileage logs of the user up to and including this log id
+    log_id = models.BigIntegerField(
+        verbose_name=_('last mileage log id'),
+    )
+
+    logged = models.DateTimeField(
+        verbose_name=_('last mileage log date'),
+    )
+
+    mileage = models.DecimalField(
+        verbose_name=_('mileage balance'),
+        max_digits=11,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+
+    class Meta:
+        verbose_name = _('mileage checkpoint')
+        verbose_name_plural = _('mileage checkpoints')
+
+        unique_together = ('user', 'log_id',)
+
+        indexes = [
+            models.Index(fields=['user', 'logged', ]),
+        ]
+
+    def __str__(self):
+        return f'{self.user}-{self.log_id}-{self.mileage}'
+
+
+class DailyProductSales(models.Model):
+    # Rollup of sold order products by local order date; refund orders count negative
+    date = models.DateField(
+        verbose_name=_('date'),
+    )
+
+    store = models.ForeignKey(
+        'shop.Store',
+        verbose_name=_('store'),
+        db_index=True,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    code = models.CharField(
+        verbose_name=_('product code'),
+        max_length=255,
+    )
+
+    name = models.CharField(
+        verbose_name=_('product name'),
+        max_length=255,
+    )
+
+    # Revenues of orders in different currencies are never added up
+    currency = models.CharField(
+        verbose_name=_('currency'),
+        max_length=3,
+        choices=Order.CURRENCY_CHOICES,
+        default=Order.CURRENCY_CHOICES.KRW,
+    )
+
+    quantity = models.IntegerField(
+        verbose_name=_('quantity'),
+        default=0,
+    )
+
+    revenue = models.DecimalField(
+        verbose_name=_('revenue'),
+        max_digits=13,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+
+    list_revenue = models.DecimalField(
+        verbose_name=_('list price revenue'),
+        max_digits=13,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+
+    class Meta:
+        verbose_name = _('daily product sales')
+        verbose_name_plural = _('daily product sales')
+
+        unique_together = ('date', 'code', 'currency',)
+
+        indexes = [
+            models.Index(fields=['store', 'date', ]),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.code} {self.currency} {self.quantity}'
+
+
+class ProductPair(models.Model):
+    # Sparse co-occurrence matrix: verified orders containing both products, stored in both directions
+    code = models.CharField(
+        verbose_name=_('product code'),
+        max_length=255,
+    )
+
+    related_code = models.CharField(
+        verbose_name=_('related product code'),
+        max_length=255,
+    )
+
+    count = models.PositiveIntegerField(
+        verbose_name=_('order count'),
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = _('product pair')
+        verbose_name_plural = _('product pairs')
+
+        unique_together = ('code', 'related_code',)
+
+    def __str__(self):
+        return f'{self.code}-{self.related_code} {self.count}'
+
+
+class ProductRecommendation(models.Model):
+    code = models.CharField(
+        verbose_name=_('product code'),
+        max_length=255,
+        unique=True,
+    )
+
+    # Top related product codes, most bought together first, separated by spaces
+    related = models.TextField(
+        verbose_name=_('related product codes'),
+        blank=True,
+    )
+
+    updated = models.DateTimeField(
+        verbose_name=_('updated'),
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = _('product recommendation')
+        verbose_name_plural = _('product recommendations')
+
+    def __str__(self):
+        return f'{self.code} {self.related}'
+
+
+class PaymentCallback(models.Model):
+    # A payment gateway notification queued by the callback view and applied by shop.callbacks
+    RESULT_CHOICES = Choices(
+        (0, 'pending', _('pending')),
+        (1, 'applied', _('applied')),
+        (2, 'ignored', _('ignored')),
+        (3, 'declined', _('declined')),
+        (4, 'mismatch', _('method or amount mismatch')),
+        (5, 'unknown_order', _('unknown order')),
+    )
+
+    payment_method = models.IntegerField(
+        verbose_name=_('payment method'),
+        choices=Order.PAYMENT_METHOD_CHOICES,
+    )
+
+    transaction_id = models.CharField(
+        verbose_name=_('transaction id'),
+        max_length=64,
+    )
+
+    order_no = models.UUIDField(
+        verbose_name=_('order no'),
+    )
+
+    amount = models.DecimalField(
+        verbose_name=_('amount'),
+        max_digits=11,
+        decimal_places=2,
+    )
+
+    status = models.CharField(
+        verbose_name=_('status'),
+        max_length=32,
+        blank=True,
+    )
+
+    paid = models.BooleanField(
+        verbose_name=_('paid'),
+    )
+
+    payload = models.TextField(
+        verbose_name=_('payload'),
+    )
+
+    result = models.IntegerField(
+        verbose_name=_('result'),
+        choices=RESULT_CHOICES,
+        default=RESULT_CHOICES.pending,
+    )
+
+    received = models.DateTimeField(
+        verbose_name=_('received date'),
+        default=now,
+    )
+
+    processed = models.DateTimeField(
+        verbose_name=_('processed date'),
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = _('payment callback')
+        verbose_name_plural = _('payment callbacks')
+
+        # The idempotency key: a repeated notification of a transaction event is dropped on insert
+        unique_together = ('payment_method', 'transaction_id', 'status',)
+
+        indexes = [
+            models.Index(fields=['result', ]),
+        ]
+
+    def __str__(self):
+        return f'{self.get_payment_method_display()} {self.transaction_id} {self.amount}'
+
+
+class ArchivedOrder(models.Model):
+    # A closed order moved out of the hot tables by shop.archive with its lines, vouchers, payments and logs
+    order_id = models.BigIntegerField(
+        verbose_name=_('order id'),
+        unique=True,
+    )
+
+    order_no = models.UUIDField(
+        verbose_name=_('order no'),
+        unique=True,
+    )
+
+    user_id = models.BigIntegerField(
+        verbose_name=_('user id'),
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+
+    # Refund orders are archived with their parent order
+    parent_id = models.BigIntegerField(
+        verbose_name=_('parent order id'),
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+
+    status = models.IntegerField(
+        verbose_name=_('order status'),
+        choices=Order.STATUS_CHOICES,
+    )
+
+    visible = models.IntegerField(
+        verbose_name=_('visible status'),
+        choices=Order.VISIBLE_CHOICES,
+        default=Order.VISIBLE_CHOICES.visible,
+    )
+
+    total_selling_price = models.DecimalField(
+        verbose_name=_('total price'),
+        max_digits=11,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+
+    currency = models.CharField(
+        verbose_name=_('currency'),
+        max_length=3,
+        choices=Order.CURRENCY_CHOICES,
+        default=Order.CURRENCY_CHOICES.KRW,
+    )
+
+    is_removed = models.BooleanField(
+        verbose_name=_('removed'),
+        default=False,
+    )
+
+    created = models.DateTimeField(
+        verbose_name=_('created'),
+    )
+
+    # zlib-compressed JSON
+    payload = models.BinaryField(
+        verbose_name=_('payload'),
+    )
+
+    archived = models.DateTimeField(
+        verbose_name=_('archived date'),
+        default=now,
+    )
+
+    class Meta:
+        verbose_name = _('archived order')
+        verbose_name_plural = _('archived orders')
+
+        indexes = [
+            models.Index(fields=['user_id', 'visible', 'is_removed', 'created', ]),
+        ]
+
+    def __str__(self):
+        return f'{self.order_no} {self.created}'
+
+
+class ArchivedVoucher(models.Model):
+    voucher_id = models.BigIntegerField(
+        verbose_name=_('voucher id'),
+        unique=True,
+    )
+
+    product_id = models.BigIntegerField(
+        verbose_name=_('product id'),
+        db_index=True,
+    )
+
+    code = models.CharField(
+        verbose_name=_('voucher code'),
+        max_length=64,
+        db_index=True,
+    )
+
+    remarks = models.CharField(
+        verbose_name=_('voucher remarks'),
+        max_length=64,
+        blank=True,
+    )
+
+    status = models.IntegerField(
+        verbose_name=_('status'),
+        choices=Voucher.STATUS_CHOICES,
+    )
+
+    created = models.DateTimeField(
+        verbose_name=_('created'),
+    )
+
+    modified = models.DateTimeField(
+        verbose_name=_('modified'),
+    )
+
+    archived = models.DateTimeField(
+        verbose_name=_('archived date'),
+        default=now,
+    )
+
+    class Meta:
+        verbose_name = _('archived voucher')
+        verbose_name_plural = _('archived vouchers')
+
+        indexes = [
+            models.Index(fields=['product_id', 'code', ]),
+        ]
+
+    def __str__(self):
+        return self.code
+
+
+class PurchaseOrder(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     title = models.CharField(
         verbose_name=_('purchase order title'),
         max_length=255,
@@ -1471,7 +2030,7 @@ class PurchaseOrder(model_utils_models.SoftDeletableModel, model_utils_models.Ti
         return f'{self.title}-{self.created}'
 
 
-class PurchaseOrderPayment(model_utils_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
+class PurchaseOrderPayment(common_models.SoftDeletableModel, model_utils_models.TimeStampedModel):
     ACCOUNT_CHOICES = Choices(
         (0, 'kb', _('KOOKMIN BANK')),
         (1, 'nh', _('NONGHYUP BANK')),
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from functools import total_ordering
+
+import numpy as np
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, Round
+
+# Currencies of Order.CURRENCY_CHOICES
+CURRENCIES = ('KRW', 'USD')
+
+# Decimal places of the money fields of shop.models
+STORAGE_PLACES = 2
+
+STORAGE_QUANTUM = Decimal(1).scaleb(-STORAGE_PLACES)
+
+# Float64 sums of np.bincount are exact below this magnitude
+EXACT_FLOAT_LIMIT = 2 ** 53
+
+
+class MoneyError(Exception):
+    pass
+
+
+def check_currency(currency):
+    if currency not in CURRENCIES:
+        raise MoneyError(f'unknown currency {currency}')
+
+    return currency
+
+
+def to_units(value):
+    # Integer hundredths of a money field value; exact, MoneyError instead of rounding a finer amount
+    scaled = Decimal(value).scaleb(STORAGE_PLACES)
+
+    if scaled != scaled.to_integral_value():
+        raise MoneyError(f'{value} has more than {STORAGE_PLACES} decimal places')
+
+    return int(scaled)
+
+
+def to_decimal(units):
+    # A Decimal with the scale of the model fields
+    return Decimal(int(units)).scaleb(-STORAGE_PLACES).quantize(STORAGE_QUANTUM)
+
+
+def storage_units(field):
+    # A money column read as an integer of hundredths, so the rows carry no Decimal; ROUND only absorbs float reads
+    return Cast(Round(F(field) * 10 ** STORAGE_PLACES), BigIntegerField())
+
+
+def totals(keys, *columns):
+    """
+    Sums of int64 columns grouped by key with one np.bincount per column.
+
+    Returns the distinct keys in order of first appearance and a (columns, keys) array.
+    np.bincount sums in float64, so a column whose absolute values add up to 2 ** 53
+    or more is summed with the slower but exact np.add.at instead.
+    """
+    index = {}
+    rows = np.fromiter((index.setdefault(key, len(index)) for key in keys), dtype=np.int64, count=len(keys))
+
+    sums = np.zeros((len(columns), len(index)), dtype=np.int64)
+
+    for row, column in enumerate(columns):
+        column = np.asarray(column, dtype=np.int64)
+
+        if np.abs(column).sum() < EXACT_FLOAT_LIMIT:
+            sums[row] = np.rint(np.bincount(rows, weights=column, minlength=len(index)))
+        else:
+            np.add.at(sums[row], rows, column)
+
+    return list(index), sums
+
+
+@total_ordering
+class Money:
+    """
+    An amount in integer hundredths of its currency, the scale of the money fields.
+
+    Legacy KRW prices carry fractions of a won, so amounts are not rounded to the won:
+    sums are exactly what Decimal arithmetic on the fields gives. Amounts of different
+    currencies do not mix.
+    """
+    __slots__ = ('units', 'currency')
+
+    def __init__(self, units=0, currency='KRW'):
+        self.units = int(units)
+        self.currency = check_currency(currency)
+
+    @classmethod
+    def from_decimal(cls, value, currency='KRW'):
+        return cls(to_units(value), currency)
+
+    def to_decimal(self):
+        return to_decimal(self.units)
+
+    def same_currency(self, other):
+        if not isinstance(other, Money) or other.currency != self.currency:
+            raise MoneyError(f'{self!r} and {other!r} do not mix')
+
+        return other
+
+    def __add__(self, other):
+        return Money(self.units + self.same_currency(other).units, self.currency)
+
+    def __sub__(self, other):
+        return Money(self.units - self.same_currency(other).units, self.currency)
+
+    def __neg__(self):
+        return Money(-self.units, self.currency)
+
+    def __mul__(self, quantity):
+        if not isinstance(quantity, int):
+            return NotImplemented
+
+        return Money(self.units * quantity, self.currency)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and (self.units, self.currency) == (other.units, other.currency)
+
+    def __lt__(self, other):
+        return self.units < self.same_currency(other).units
+
+    def __hash__(self):
+        return hash((self.units, self.currency))
+
+    def __bool__(self):
+        return self.units != 0
+
+    def __repr__(self):
+        return f'Money({self.units}, {self.currency!r})'
+
+    def __str__(self):
+        return f'{self.to_decimal()} {self.currency}'
@@ -0,0 +1,313 @@
+import hashlib
+import zlib
+from collections import Counter, defaultdict
+from itertools import groupby, permutations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from common.batch import keyset_chunks
+from common.models import BatchCheckpoint
+from shop import archive
+from shop import models
+
+CHECKPOINT_NAME = 'shop.recommendations'
+
+STATUS = models.Order.STATUS_CHOICES
+
+VERIFIED = (STATUS.payment_verified, STATUS.shipped)
+
+TOP_K = 10
+
+
+def cache_key(code):
+    # Codes come from the URL, so they are hashed into a key any cache backend accepts
+    return f'shop:recommendations:{hashlib.sha256(code.encode()).hexdigest()}'
+
+
+def cache_timeout():
+    return getattr(settings, 'RECOMMENDATION_CACHE_TTL', 24 * 60 * 60)
+
+
+def related_products(code):
+    # Codes of products bought together with a product: one cache read, one unique key read on a miss
+    related = cache.get(cache_key(code))
+
+    if related is None:
+        related = models.ProductRecommendation.objects.filter(code=code).values_list('related', flat=True).first()
+        related = related.split() if related else []
+        cache.set(cache_key(code), related, cache_timeout())
+
+    return related
+
+
+def weight(old_status, new_status):
+    # 1 for a status log bringing an order into VERIFIED, -1 for one taking it out, else 0
+    return (new_status in VERIFIED) - (old_status in VERIFIED)
+
+
+def latest_log():
+    return models.OrderStatusLog.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def log_weights(start, end):
+    # Weight of each order over the status logs after `start` up to `end`
+    weights = defaultdict(int)
+
+    for order_id, old_status, new_status in models.OrderStatusLog.objects \
+            .filter(pk__gt=start, pk__lte=end) \
+            .values_list('order_id', 'old_status', 'new_status'):
+        weights[order_id] += weight(old_status, new_status)
+
+    return {order_id: order_weight for order_id, order_weight in weights.items() if order_weight}
+
+
+def order_codes(order_ids):
+    codes = defaultdict(set)
+
+    for order_id, code in models.OrderProduct.available_objects \
+            .filter(order_id__in=order_ids) \
+            .values_list('order_id', 'code'):
+        codes[order_id].add(code)
+
+    return codes
+
+
+def archived_order_codes():
+    # (order id, codes) of archived verified orders, one payload at a time
+    products = archive.order_products(models.ArchivedOrder.objects.filter(status__in=VERIFIED).order_by('pk'))
+
+    for order_id, rows in groupby(products, key=lambda row: row[0]['id']):
+        codes = {product['code'] for order, product in rows if not order['is_removed'] and not product['is_removed']}
+
+        if codes:
+            yield order_id, codes
+
+
+def count_pairs(orders, counts, weights=None, partition=None):
+    """
+    Add the ordered product pairs of (order id, codes) items to `counts`.
+
+    Each order counts by its entry in `weights`, or once without weights. With a
+    partition only pairs whose left code belongs to it are kept.
+    """
+    for order_id, codes in orders:
+        order_weight = 1 if weights is None else weights[order_id]
+
+        for code, related_code in permutations(sorted(codes), 2):
+            if partition is None or in_partition(code, partition):
+                counts[(code, related_code)] += order_weight
+
+
+def in_partition(code, partition):
+    number, partitions = partition
+    return zlib.crc32(code.encode()) % partitions == number
+
+
+def top_k(counts):
+    related = defaultdict(list)
+
+    for (code, related_code), count in counts.items():
+        if count > 0:
+            related[code].append((-count, related_code))
+
+    return {code: [related_code for _, related_code in sorted(pairs)[:TOP_K]] for code, pairs in related.items()}
+
+
+def save_recommendations(recommendations):
+    models.ProductRecommendation.objects.bulk_create(
+        [models.ProductRecommendation(code=code, related=' '.join(related))
+         for code, related in recommendations.items()],
+        update_conflicts=True,
+        unique_fields=['code'],
+        update_fields=['related', 'updated'],
+        batch_size=1000,
+    )
+
+    cache.set_many({cache_key(code): related for code, related in recommendations.items()}, cache_timeout())
+
+
+def update(weights):
+    """
+    Add orders to the co-occurrence matrix by weight and refresh the top-K of their products.
+
+    Orders entering VERIFIED have a weight of 1 and orders leaving it -1. The pairs of
+    the touched products are locked and read once, the changed pairs are written back
+    with one upsert, and only the touched top-K lists are recomputed.
+    """
+    weights = {order_id: order_weight for order_id, order_weight in weights.items() if order_weight}
+
+    counts = Counter()
+    count_pairs(order_codes(weights).items(), counts, weights=weights)
+
+    counts = {pair: count for pair, count in counts.items() if count}
+
+    if not counts:
+        return 0
+
+    codes = {code for code, related_code in counts}
+
+    with transaction.atomic():
+        pairs = Counter({
+            (code, related_code): count
+            for code, related_code, count in models.ProductPair.objects
+            .select_for_update()
+            .filter(code__in=codes)
+            .values_list('code', 'related_code', 'count')
+        })
+
+        pairs.update(counts)
+
+        models.ProductPair.objects.bulk_create(
+            [models.ProductPair(code=code, related_code=related_code, count=max(pairs[(code, related_code)], 0))
+             for code, related_code in counts],
+            update_conflicts=True,
+            unique_fields=['code', 'related_code'],
+            update_fields=['count'],
+            batch_size=1000,
+        )
+
+        # Products left with no pair keep an empty list rather than a stale one
+        save_recommendations({**dict.fromkeys(codes, []), **top_k(pairs)})
+
+    return len(codes)
+
+
+def run(batch_size=1000):
+    """
+    Apply the status logs of shop.transitions written since the last run.
+
+    Orders entering VERIFIED are added and orders leaving it, such as refunded orders,
+    are taken out again, so the matrix matches what rebuild counts. Each batch locks
+    the checkpoint first, like rebuild does when it swaps a partition in.
+    """
+    while True:
+        with transaction.atomic():
+            checkpoint, _ = BatchCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+
+            logs = list(models.OrderStatusLog.objects
+                        .filter(pk__gt=checkpoint.position)
+                        .order_by('pk')
+                        .values_list('pk', 'order_id', 'old_status', 'new_status')[:batch_size])
+
+            if not logs:
+                break
+
+            weights = defaultdict(int)
+
+            for pk, order_id, old_status, new_status in logs:
+                weights[order_id] += weight(old_status, new_status)
+
+            products = update(weights)
+
+            orders = sum(1 for order_weight in weights.values() if order_weight)
+
+            checkpoint.position = logs[-1][0]
+            checkpoint.processed += orders
+            checkpoint.save(update_fields=['position', 'processed', 'modified'])
+
+        yield checkpoint.position, orders, products
+
+
+def count_partition(chunk_size, partition=None):
+    """
+    Pair counts of a partition as of the latest status log when the pass starts.
+
+    Hot orders of every status are read in id chunks, so an order that was verified
+    at that log and has moved since is not missed. Orders whose status changed after
+    that log by the time their chunk is read count by their status before the change.
+    Archived orders are closed and count by their archived status.
+    """
+    position = latest_log()
+    counts = Counter()
+    changed = set()
+
+    for order_ids in keyset_chunks(models.Order.available_objects.all(), chunk_size):
+        verified = set(models.Order.available_objects
+                       .filter(pk__in=order_ids, status__in=VERIFIED)
+                       .values_list('pk', flat=True))
+        moved = set(models.OrderStatusLog.objects
+                    .filter(order_id__in=order_ids, pk__gt=position)
+                    .values_list('order_id', flat=True))
+
+        changed |= moved
+        count_pairs(order_codes(verified - moved).items(), counts, partition=partition)
+
+    # The status of a changed order at `position` is the old status of its first later log
+    before = {}
+
+    for order_id, old_status in models.OrderStatusLog.objects \
+            .filter(order_id__in=changed, pk__gt=position) \
+            .order_by('pk') \
+            .values_list('order_id', 'old_status'):
+        before.setdefault(order_id, old_status)
+
+    count_pairs(order_codes([order_id for order_id, status in before.items() if status in VERIFIED]).items(),
+                counts, partition=partition)
+    count_pairs(archived_order_codes(), counts, partition=partition)
+
+    return position, counts
+
+
+def partition_codes(model, partition):
+    codes = model.objects.values_list('code', flat=True).distinct()
+    return {code for code in codes if partition is None or in_partition(code, partition)}
+
+
+def replace(counts, partition=None):
+    # Swap the pairs and top-K lists of a partition for recounted ones
+    counts = {pair: count for pair, count in counts.items() if count > 0}
+    recommendations = top_k(counts)
+
+    stale_pairs = partition_codes(models.ProductPair, partition)
+    stale_recommendations = partition_codes(models.ProductRecommendation, partition) - set(recommendations)
+
+    for start in range(0, len(stale_pairs), 1000):
+        models.ProductPair.objects.filter(code__in=list(stale_pairs)[start:start + 1000]).delete()
+
+    for start in range(0, len(stale_recommendations), 1000):
+        models.ProductRecommendation.objects.filter(code__in=list(stale_recommendations)[start:start + 1000]).delete()
+
+    models.ProductPair.objects.bulk_create(
+        [models.ProductPair(code=code, related_code=related_code, count=count)
+         for (code, related_code), count in counts.items()],
+        batch_size=1000,
+    )
+
+    save_recommendations(recommendations)
+    cache.delete_many([cache_key(code) for code in stale_recommendations])
+
+
+def rebuild(chunk_size=5000, partitions=1):
+    """
+    Recount the matrix from every verified order, hot or archived.
+
+    Each partition of product codes is counted outside any transaction and swapped
+    in by a short transaction of its own, so memory holds the pairs of one partition
+    and no lock is held for the whole rebuild. The swap locks the checkpoint and
+    brings the counts to the position of the incremental run, so the two can run
+    at the same time without counting an order twice.
+    """
+    for number in range(partitions):
+        partition = (number, partitions) if partitions > 1 else None
+        position, counts = count_partition(chunk_size, partition)
+
+        with transaction.atomic():
+            checkpoint, _ = BatchCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+
+            if checkpoint.position > position:
+                # Logs the incremental run has applied since the pass started
+                weights = log_weights(position, checkpoint.position)
+                count_pairs(order_codes(weights).items(), counts, weights=weights, partition=partition)
+            elif checkpoint.position < position:
+                # Partitions swapped in earlier catch up before the checkpoint moves past their logs
+                if number:
+                    update(log_weights(checkpoint.position, position))
+
+                checkpoint.position = position
+                checkpoint.save(update_fields=['position', 'modified'])
+
+            replace(counts, partition)
+
+        yield number, len(counts)
@@ -0,0 +1,234 @@
+import uuid
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum, Case, When, Value, IntegerField
+from django.utils.timezone import now
+
+from shop import archive
+from shop import models
+from shop import sales
+from shop.money import Money
+from shop import transitions
+
+STATUS = models.Order.STATUS_CHOICES
+
+REFUNDABLE = transitions.TRANSITIONS[STATUS.refunded1]
+
+
+class RefundError(Exception):
+    pass
+
+
+def refunded_quantities(order_ids):
+    """
+    Quantities already refunded of the order products of orders, by order product id.
+
+    Refund lines are read with a locking read, so a refund committed while the orders
+    were being locked is seen even under REPEATABLE READ. Refund orders archived apart
+    from their parent, before the archive moved them together, are read from the
+    archive. Refund lines written before they recorded the line they refund are
+    spread over the lines of the same product code in order.
+    """
+    refunded = defaultdict(int)
+    unlinked = defaultdict(int)
+
+    lines = list(models.OrderProduct.available_objects
+                 .select_for_update(of=('self',))
+                 .filter(order__parent_id__in=order_ids, order__status=STATUS.refunded2)
+                 .values_list('order__parent_id', 'refunded_order_product_id', 'code', 'quantity'))
+
+    lines.extend(
+        (order['parent_id'], product.get('refunded_order_product_id'), product['code'], product['quantity'])
+        for order, product in archive.order_products(models.ArchivedOrder.objects
+                                                     .filter(parent_id__in=order_ids, status=STATUS.refunded2))
+        if not order['is_removed'] and not product['is_removed']
+    )
+
+    for parent_id, refunded_order_product_id, code, quantity in lines:
+        if refunded_order_product_id:
+            refunded[refunded_order_product_id] += quantity
+        else:
+            unlinked[(parent_id, code)] += quantity
+
+    if unlinked:
+        for pk, order_id, code, quantity in models.OrderProduct.available_objects \
+                .filter(order_id__in={order_id for order_id, code in unlinked}) \
+                .order_by('pk') \
+                .values_list('pk', 'order_id', 'code', 'quantity'):
+            taken = min(unlinked[(order_id, code)], quantity - refunded[pk])
+
+            if taken > 0:
+                refunded[pk] += taken
+                unlinked[(order_id, code)] -= taken
+
+    return refunded
+
+
+def restore_stock(deltas):
+    # One UPDATE with a quantity delta per product code
+    deltas = {code: quantity for code, quantity in deltas.items() if quantity}
+
+    if not deltas:
+        return 0
+
+    return models.Product.all_objects \
+        .filter(code__in=deltas) \
+        .update(stock_quantity=F('stock_quantity') + Case(
+            *[When(code=code, then=Value(quantity)) for code, quantity in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+
+
+def refund_lines(lines, actor=None, message=''):
+    """
+    Refund order products in one transaction.
+
+    `lines` maps an order product id to the quantity to refund, or None for what is left
+    of the line. Every refunded order gets one child order in `refunded2` holding the
+    refunded lines. The vouchers given for those lines are revoked, the stock of the
+    products is put back, and orders refunded in full move to `refunded1`. Orders whose
+    status is not refundable are skipped. Returns the refund orders.
+
+    The orders are locked before anything else is read, so concurrent refunds of an
+    order run one after the other and the second sees the refund lines of the first.
+    """
+    if any(quantity is not None and quantity < 1 for quantity in lines.values()):
+        raise RefundError('refund quantities must be positive')
+
+    with transaction.atomic():
+        orders = {
+            order.pk: order
+            for order in models.Order.available_objects
+            .select_for_update(of=('self',))
+            .filter(orderproduct__in=list(lines), status__in=REFUNDABLE)
+        }
+
+        order_products = list(
+            models.OrderProduct.available_objects
+            .filter(pk__in=lines, order_id__in=orders)
+            .order_by('order_id', 'pk')
+        )
+
+        refunded = refunded_quantities(orders)
+
+        # Vouchers still given for the lines, oldest first
+        vouchers = defaultdict(list)
+
+        for voucher in models.OrderProductVoucher.available_objects \
+                .filter(order_product__in=[order_product.pk for order_product in order_products], revoked=False) \
+                .order_by('pk') \
+                .values('pk', 'order_product_id', 'voucher_id'):
+            vouchers[voucher['order_product_id']].append(voucher)
+
+        refund_orders = {}
+        refund_totals = {}
+        refund_products = []
+        revoked = []
+        stock = defaultdict(int)
+
+        for order_product in order_products:
+            order = orders[order_product.order_id]
+
+            left = order_product.quantity - refunded[order_product.pk]
+            quantity = left if lines[order_product.pk] is None else min(lines[order_product.pk], left)
+
+            if quantity <= 0:
+                continue
+
+            refunded[order_product.pk] += quantity
+
+            if order.pk not in refund_orders:
+                refund_orders[order.pk] = models.Order(
+                    order_no=uuid.uuid4(),
+                    user_id=order.user_id,
+                    fullname=order.fullname,
+                    ip_address=order.ip_address,
+                    payment_method=order.payment_method,
+                    transaction_id=order.transaction_id,
+                    status=STATUS.refunded2,
+                    currency=order.currency,
+                    message=message,
+                    parent_id=order.pk,
+                )
+                refund_totals[order.pk] = [Money(0, order.currency), Money(0, order.currency)]
+
+            totals = refund_totals[order.pk]
+            totals[0] += Money.from_decimal(order_product.list_price, order.currency) * quantity
+            totals[1] += Money.from_decimal(order_product.selling_price, order.currency) * quantity
+
+            refund_products.append((order.pk, models.OrderProduct(
+                name=order_product.name,
+                subtitle=order_product.subtitle,
+                code=order_product.code,
+                list_price=order_product.list_price,
+                selling_price=order_product.selling_price,
+                quantity=quantity,
+                refunded_order_product_id=order_product.pk,
+            )))
+
+            revoked.extend(vouchers[order_product.pk][:quantity])
+            stock[order_product.code] += quantity
+
+        if not refund_orders:
+            return []
+
+        for order_id, (total_list_price, total_selling_price) in refund_totals.items():
+            refund_orders[order_id].total_list_price = total_list_price.to_decimal()
+            refund_orders[order_id].total_selling_price = total_selling_price.to_decimal()
+
+        models.Order.all_objects.bulk_create(refund_orders.values())
+
+        # MySQL does not return the ids of bulk inserted rows
+        refund_ids = dict(
+            models.Order.all_objects
+            .filter(order_no__in=[refund_order.order_no for refund_order in refund_orders.values()])
+            .values_list('parent_id', 'pk')
+        )
+
+        for order_id, refund_product in refund_products:
+            refund_product.order_id = refund_ids[order_id]
+
+        models.OrderProduct.all_objects.bulk_create([refund_product for _, refund_product in refund_products])
+        sales.push(dict.fromkeys(refund_ids.values(), sales.WEIGHTS[STATUS.refunded2]))
+
+        if revoked:
+            models.OrderProductVoucher.all_objects \
+                .filter(pk__in=[voucher['pk'] for voucher in revoked]) \
+                .update(revoked=True, modified=now())
+
+            models.Voucher.all_objects \
+                .filter(pk__in=[voucher['voucher_id'] for voucher in revoked if voucher['voucher_id']]) \
+                .update(status=models.Voucher.STATUS_CHOICES.revoked, modified=now())
+
+        restore_stock(stock)
+
+        # Orders with quantities left keep their status; the others are refunded in full
+        partial = {
+            order_id
+            for pk, order_id, quantity in models.OrderProduct.available_objects
+            .filter(order_id__in=refund_orders)
+            .values_list('pk', 'order_id', 'quantity')
+            if quantity > refunded[pk]
+        }
+
+        transitions.transition(
+            [order_id for order_id in refund_orders if order_id not in partial],
+            STATUS.refunded1,
+            actor=actor,
+        )
+
+        for refund_order in refund_orders.values():
+            refund_order.pk = refund_ids[refund_order.parent_id]
+
+    return list(refund_orders.values())
+
+
+def refund(orders, actor=None, message=''):
+    # Refund orders in full; `orders` is an Order queryset or a list of order ids
+    lines = dict.fromkeys(
+        models.OrderProduct.available_objects.filter(order__in=orders).values_list('pk', flat=True)
+    )
+
+    return refund_lines(lines, actor=actor, message=message)
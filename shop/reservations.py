@@ -0,0 +1,171 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Case, Count, When, Value, IntegerField, Q
+from django.utils.timezone import now
+
+from shop import models
+
+VOUCHER_STATUS = models.Voucher.STATUS_CHOICES
+
+
+class ReservationError(Exception):
+    pass
+
+
+def available_stock(product):
+    # Sellable vouchers without a join on the holds
+    return product.stock_quantity - product.stock_held
+
+
+def adjust(deltas, **fields):
+    # One UPDATE adding per-product deltas to counter fields, e.g. adjust({1: -2}, stock_held=1)
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+
+    if not deltas:
+        return 0
+
+    return models.Product.all_objects \
+        .filter(pk__in=deltas) \
+        .update(**{
+            field: F(field) + sign * Case(
+                *[When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            for field, sign in fields.items()
+        })
+
+
+def hold(order, quantities, ttl=None):
+    """
+    Hold vouchers of products for a pending order.
+
+    `quantities` maps a product id to the number of vouchers to hold. Free vouchers are
+    picked with SKIP LOCKED, so concurrent checkouts take different rows instead of
+    waiting on each other. Either every quantity is held or ReservationError is raised.
+    """
+    ttl = ttl or getattr(settings, 'VOUCHER_HOLD_TTL', 30 * 60)
+    expires = now() + timedelta(seconds=ttl)
+
+    holds = []
+
+    with transaction.atomic():
+        for product_id, quantity in quantities.items():
+            # Only the vouchers are locked; the outer join on the holds has a nullable side
+            voucher_ids = list(models.Voucher.available_objects
+                               .select_for_update(skip_locked=True, of=('self',))
+                               .filter(product_id=product_id,
+                                       status=VOUCHER_STATUS.purchased,
+                                       voucherhold__isnull=True)
+                               .order_by('pk')
+                               .values_list('pk', flat=True)[:quantity])
+
+            if len(voucher_ids) < quantity:
+                raise ReservationError(f'product {product_id}: {len(voucher_ids)} of {quantity} vouchers available')
+
+            holds.extend(
+                models.VoucherHold(voucher_id=voucher_id, order_id=order.pk, product_id=product_id, expires=expires)
+                for voucher_id in voucher_ids
+            )
+
+        models.VoucherHold.objects.bulk_create(holds)
+        adjust(quantities, stock_held=1)
+
+    return holds
+
+
+def confirm(order_ids):
+    """
+    Turn the holds of paid orders into sold vouchers given for their order products.
+
+    Holds are matched to order products by product code, up to the quantity of each
+    order product not given a voucher yet. Holds of products the order does not contain
+    and holds beyond that quantity are released instead. Returns the number of vouchers sold.
+    """
+    with transaction.atomic():
+        holds = list(models.VoucherHold.objects
+                     .select_for_update(of=('self',))
+                     .filter(order_id__in=order_ids)
+                     .select_related('voucher', 'product')
+                     .order_by('pk'))
+
+        if not holds:
+            return 0
+
+        # [order product id, vouchers still to give] by (order id, code)
+        lines = defaultdict(list)
+
+        for pk, order_id, code, quantity, given in models.OrderProduct.available_objects \
+                .filter(order_id__in={h.order_id for h in holds}) \
+                .annotate(given=Count('orderproductvoucher', filter=Q(orderproductvoucher__is_removed=False))) \
+                .order_by('pk') \
+                .values_list('pk', 'order_id', 'code', 'quantity', 'given'):
+            lines[(order_id, code)].append([pk, quantity - given])
+
+        matched = []
+        unmatched = []
+
+        for h in holds:
+            line = next((line for line in lines[(h.order_id, h.product.code)] if line[1] > 0), None)
+
+            if line is None:
+                unmatched.append(h)
+                continue
+
+            line[1] -= 1
+            matched.append((line[0], h))
+
+        models.OrderProductVoucher.all_objects.bulk_create([
+            models.OrderProductVoucher(
+                order_product_id=order_product_id,
+                voucher_id=h.voucher_id,
+                code=h.voucher.code,
+                remarks=h.voucher.remarks,
+            )
+            for order_product_id, h in matched
+        ])
+
+        models.Voucher.all_objects \
+            .filter(pk__in=[h.voucher_id for order_product_id, h in matched]) \
+            .update(status=VOUCHER_STATUS.sold, modified=now())
+
+        models.VoucherHold.objects.filter(pk__in=[h.pk for h in holds]).delete()
+
+        adjust(Counter(h.product_id for order_product_id, h in matched), stock_held=-1, stock_quantity=-1)
+        adjust(Counter(h.product_id for h in unmatched), stock_held=-1)
+
+    return len(matched)
+
+
+def release(queryset, skip_locked=True):
+    # Delete locked holds and give their vouchers back to the stock; returns the number released
+    with transaction.atomic():
+        holds = list(queryset.select_for_update(skip_locked=skip_locked).values_list('pk', 'product_id'))
+
+        if not holds:
+            return 0
+
+        models.VoucherHold.objects.filter(pk__in=[pk for pk, product_id in holds]).delete()
+
+        adjust(Counter(product_id for pk, product_id in holds), stock_held=-1)
+
+    return len(holds)
+
+
+def release_orders(order_ids):
+    return release(models.VoucherHold.objects.filter(order_id__in=order_ids))
+
+
+def release_expired(batch_size=1000):
+    # Release expired holds batch by batch, each in its own short transaction
+    released = 0
+
+    while True:
+        count = release(models.VoucherHold.objects.filter(expires__lt=now()).order_by('pk')[:batch_size])
+        released += count
+
+        if count < batch_size:
+            return released
@@ -0,0 +1,237 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Sum, Max
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import get_current_timezone, localtime, make_aware, now
+
+from common.models import BatchCheckpoint
+from shop import archive
+from shop import models
+from shop import money
+
+CHECKPOINT_NAME = 'shop.sales.rollup'
+
+STATUS = models.Order.STATUS_CHOICES
+
+# Order status: sign of its order products in the rollup
+WEIGHTS = {
+    STATUS.payment_verified: 1,
+    STATUS.shipped: 1,
+    STATUS.refund_requested: 1,
+    STATUS.refund_pending: 1,
+    STATUS.refunded1: 1,
+    STATUS.refunded2: -1,
+}
+
+
+def stores(codes):
+    return dict(models.Product.all_objects.filter(code__in=codes).values_list('code', 'store_id'))
+
+
+def push(weights):
+    """
+    Add the order products of orders to the rollup, multiplied by `weights` of order ids.
+
+    Rows are created empty if missing, locked, and written back with one bulk_update,
+    so concurrent pushes for the same day and product serialize on the row lock.
+    """
+    weights = {order_id: weight for order_id, weight in weights.items() if weight}
+
+    if not weights:
+        return
+
+    # The same rows as day_totals reads, so pushes and recompute agree
+    rows = list(models.OrderProduct.available_objects
+                .filter(order_id__in=weights, order__is_removed=False)
+                .annotate(list_units=money.storage_units('list_price'),
+                          selling_units=money.storage_units('selling_price'))
+                .values_list('order_id', 'order__created', 'code', 'order__currency', 'name',
+                             'list_units', 'selling_units', 'quantity'))
+
+    if not rows:
+        return
+
+    order_ids, created, codes, currencies, names, list_prices, selling_prices, quantities = zip(*rows)
+
+    keys = [
+        (localtime(order_created).date(), code, currency)
+        for order_created, code, currency in zip(created, codes, currencies)
+    ]
+    quantities = np.array(quantities, dtype=np.int64) * np.array([weights[pk] for pk in order_ids], dtype=np.int64)
+
+    deltas = summarize(keys, names, quantities,
+                       np.array(selling_prices, dtype=np.int64) * quantities,
+                       np.array(list_prices, dtype=np.int64) * quantities)
+
+    store_ids = stores({code for day, code, currency in deltas})
+
+    with transaction.atomic():
+        models.DailyProductSales.objects.bulk_create([
+            models.DailyProductSales(date=day, code=code, currency=currency, name=name, store_id=store_ids.get(code))
+            for (day, code, currency), (quantity, revenue, list_revenue, name) in deltas.items()
+        ], ignore_conflicts=True)
+
+        rows = models.DailyProductSales.objects \
+            .select_for_update() \
+            .filter(date__in={key[0] for key in deltas}, code__in={key[1] for key in deltas})
+
+        updated = []
+
+        for row in rows:
+            if (row.date, row.code, row.currency) not in deltas:
+                continue
+
+            quantity, revenue, list_revenue, name = deltas[(row.date, row.code, row.currency)]
+            row.quantity += quantity
+            row.revenue += revenue
+            row.list_revenue += list_revenue
+            updated.append(row)
+
+        models.DailyProductSales.objects.bulk_update(updated, ['quantity', 'revenue', 'list_revenue'])
+
+
+def summarize(keys, names, quantities, revenues, list_revenues):
+    # {(date, code, currency): [quantity, revenue, list revenue, last name]}
+    # Sums stay in storage hundredths and are converted to Decimal once per key
+    distinct, sums = money.totals(keys, quantities, revenues, list_revenues)
+    names = dict(zip(keys, names))
+
+    return {
+        key: [quantity, money.to_decimal(revenue), money.to_decimal(list_revenue), names[key]]
+        for key, quantity, revenue, list_revenue in zip(distinct, *sums.tolist())
+    }
+
+
+def push_transitions(logs):
+    # Status logs of shop.transitions: the rollup changes by the weight difference of the two statuses
+    weights = defaultdict(int)
+
+    for log in logs:
+        weights[log.order_id] += WEIGHTS.get(log.new_status, 0) - WEIGHTS.get(log.old_status, 0)
+
+    push(weights)
+
+
+def day_range(day):
+    start = make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def day_totals(start=None, end=None):
+    """
+    Rollup rows {(date, code, currency): [quantity, revenue, list revenue, name]} of
+    orders created in [start, end), or of all orders without bounds.
+
+    Order products of hot orders are grouped by one query; archived orders are read
+    from their payloads, so moving orders to the archive leaves the rollup unchanged.
+    """
+    revenue = money.storage_units('selling_price') * F('quantity')
+    list_revenue = money.storage_units('list_price') * F('quantity')
+
+    queryset = models.OrderProduct.available_objects.filter(order__is_removed=False, order__status__in=WEIGHTS)
+    archived = models.ArchivedOrder.objects.filter(status__in=WEIGHTS)
+
+    if start is not None:
+        queryset = queryset.filter(order__created__gte=start, order__created__lt=end)
+        archived = archived.filter(created__gte=start, created__lt=end)
+
+    rows = list(queryset
+                .annotate(day=TruncDate('order__created', tzinfo=get_current_timezone()))
+                .values_list('day', 'code', 'order__currency', 'order__status')
+                .annotate(product_name=Max('name'), total_quantity=Sum('quantity'),
+                          revenue=Sum(revenue), list_revenue=Sum(list_revenue))
+                .order_by())
+
+    for order, product in archive.order_products(archived):
+        if order['is_removed'] or product['is_removed']:
+            continue
+
+        rows.append((
+            localtime(parse_datetime(order['created'])).date(), product['code'], order['currency'], order['status'],
+            product['name'], product['quantity'],
+            money.to_units(product['selling_price']) * product['quantity'],
+            money.to_units(product['list_price']) * product['quantity'],
+        ))
+
+    if not rows:
+        return {}
+
+    days, codes, currencies, statuses, names, quantities, revenues, list_revenues = zip(*rows)
+    signs = np.array([WEIGHTS[status] for status in statuses], dtype=np.int64)
+
+    return summarize(list(zip(days, codes, currencies)), names,
+                     signs * np.array(quantities, dtype=np.int64),
+                     signs * np.array(revenues, dtype=np.int64),
+                     signs * np.array(list_revenues, dtype=np.int64))
+
+
+def save(totals):
+    store_ids = stores({code for day, code, currency in totals})
+
+    models.DailyProductSales.objects.bulk_create([
+        models.DailyProductSales(
+            date=day, code=code, currency=currency, name=name, store_id=store_ids.get(code),
+            quantity=quantity, revenue=revenue, list_revenue=list_revenue,
+        )
+        for (day, code, currency), (quantity, revenue, list_revenue, name) in totals.items()
+    ], batch_size=1000)
+
+
+def recompute(days):
+    """
+    Rebuild the rollup rows of local dates from orders and order products.
+
+    One grouped query per day replaces whatever deltas were pushed for it.
+    """
+    for day in sorted(days):
+        totals = day_totals(*day_range(day))
+
+        with transaction.atomic():
+            models.DailyProductSales.objects.filter(date=day).delete()
+            save(totals)
+
+
+def backfill():
+    # Rebuild the whole rollup with one grouped query instead of one query per day; returns the dates
+    totals = day_totals()
+
+    with transaction.atomic():
+        models.DailyProductSales.objects.all().delete()
+        save(totals)
+
+    return {day for day, code, currency in totals}
+
+
+def dirty_days(since):
+    # Local dates of orders changed since a time, including status changes by queryset update
+    return set(
+        models.Order.all_objects
+        .filter(modified__gte=since)
+        .annotate(day=TruncDate('created', tzinfo=get_current_timezone()))
+        .values_list('day', flat=True)
+        .distinct()
+    )
+
+
+def run(days=None):
+    # Recompute the given days, or the days of orders changed since the last run; the first run backfills
+    checkpoint, _ = BatchCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    started = now()
+
+    if days is None and not checkpoint.position:
+        days = backfill()
+    else:
+        if days is None:
+            days = dirty_days(datetime.fromtimestamp(checkpoint.position, tz=started.tzinfo))
+
+        recompute(days)
+
+    checkpoint.position = int(started.timestamp())
+    checkpoint.processed += len(days)
+    checkpoint.save(update_fields=['position', 'processed', 'modified'])
+
+    return days
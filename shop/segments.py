@@ -0,0 +1,180 @@
+import numpy as np
+from django.db.models import Count, Max, Sum
+from django.utils.timezone import now
+
+from common.batch import keyset_chunks
+from member.models import Profile
+from shop import models
+
+STATUS = models.Order.STATUS_CHOICES
+
+SEGMENT = Profile.RFM_SEGMENT_CHOICES
+
+# Orders counted as purchases
+PURCHASED = (STATUS.payment_verified, STATUS.shipped)
+
+# Monetary values are scored within each currency, since no exchange rate is kept
+CURRENCIES = [currency for currency, label in models.Order.CURRENCY_CHOICES]
+
+# Merged legacy profile stats are amounts of the Korean shop
+LEGACY_CURRENCY = models.Order.CURRENCY_CHOICES.KRW
+
+FIELDS = ['rfm_recency', 'rfm_frequency', 'rfm_monetary', 'rfm_segment', 'rfm_updated']
+
+
+def purchases(user_ids):
+    """
+    (last purchase, order count, {currency: total}) of users from hot and archived orders.
+
+    Archived orders are closed, so shipped orders are the purchases among them.
+    """
+    result = {}
+
+    hot = models.Order.available_objects \
+        .filter(user_id__in=user_ids, status__in=PURCHASED) \
+        .values('user_id', 'currency')
+
+    archived = models.ArchivedOrder.objects \
+        .filter(user_id__in=user_ids, status__in=PURCHASED, is_removed=False) \
+        .values('user_id', 'currency')
+
+    for queryset in (hot, archived):
+        for user_id, currency, last, count, total in queryset \
+                .annotate(last=Max('created'), count=Count('pk'), total=Sum('total_selling_price')) \
+                .values_list('user_id', 'currency', 'last', 'count', 'total') \
+                .order_by():
+            previous, previous_count, totals = result.get(user_id, (None, 0, {}))
+            totals[currency] = totals.get(currency, 0) + (total or 0)
+            result[user_id] = (max(filter(None, (previous, last)), default=None), previous_count + count, totals)
+
+    return result
+
+
+def aggregates(chunk_size=10000, today=None):
+    """
+    Recency in days, frequency and monetary values of every profile as NumPy arrays.
+
+    Monetary values are a (currencies, profiles) array of order totals in each currency.
+    Profiles are read in primary key chunks with grouped order queries per chunk.
+    The profile stats of merged legacy orders are taken when they are larger, since
+    they may or may not include the orders of this shop already.
+    """
+    today = today or now()
+
+    profile_ids = []
+    recency = []
+    frequency = []
+    monetary = []
+
+    for ids in keyset_chunks(Profile.objects.all(), chunk_size):
+        profiles = list(Profile.objects
+                        .filter(pk__in=ids)
+                        .order_by('pk')
+                        .values_list('pk', 'user_id', 'last_purchased', 'total_order_count', 'total_selling_price'))
+
+        orders = purchases([profile[1] for profile in profiles])
+
+        for pk, user_id, last_purchased, total_order_count, total_selling_price in profiles:
+            last, count, totals = orders.get(user_id, (None, 0, {}))
+            last = max(filter(None, (last, last_purchased)), default=None)
+
+            totals = dict(totals)
+            totals[LEGACY_CURRENCY] = max(totals.get(LEGACY_CURRENCY, 0), total_selling_price or 0)
+
+            profile_ids.append(pk)
+            recency.append((today - last).days if last else -1)
+            frequency.append(max(count, total_order_count or 0))
+            monetary.append([float(totals.get(currency, 0)) for currency in CURRENCIES])
+
+    return (
+        np.array(profile_ids, dtype=np.int64),
+        np.array(recency, dtype=np.int64),
+        np.array(frequency, dtype=np.int64),
+        np.array(monetary, dtype=np.float64).reshape(-1, len(CURRENCIES)).T,
+    )
+
+
+def scores(values, purchased, reverse=False):
+    """
+    Scores from 1 to 5 by rank among the customers with purchases; 0 for the others.
+
+    A score is the quintile of the share of customers ranked strictly below, so tied
+    customers share the lower score: when most customers bought once, one order does
+    not reach the top quintiles of frequency. With `reverse` smaller values rank higher.
+    """
+    ranked = np.sort(values[purchased])
+
+    if not len(ranked):
+        return np.zeros(len(values), dtype=np.int64)
+
+    if reverse:
+        below = len(ranked) - np.searchsorted(ranked, values, side='right')
+    else:
+        below = np.searchsorted(ranked, values, side='left')
+
+    return np.where(purchased, below * 5 // len(ranked) + 1, 0)
+
+
+def monetary_scores(monetary):
+    # Each currency is ranked on its own; a customer keeps the best score of its currencies
+    return np.max([scores(totals, totals > 0) for totals in monetary], axis=0, initial=0)
+
+
+def segments(recency, frequency):
+    conditions = [
+        recency == 0,
+        (recency >= 4) & (frequency >= 4),
+        frequency >= 4,
+        (recency >= 4) & (frequency == 1),
+        recency >= 3,
+        frequency >= 3,
+        recency >= 2,
+    ]
+
+    choices = [
+        SEGMENT.none,
+        SEGMENT.champions,
+        SEGMENT.loyal,
+        SEGMENT.new,
+        SEGMENT.potential,
+        SEGMENT.at_risk,
+        SEGMENT.hibernating,
+    ]
+
+    return np.select(conditions, choices, default=SEGMENT.lost)
+
+
+def run(chunk_size=10000):
+    """
+    Score and segment every customer.
+
+    Returns the number of profiles in each segment.
+    """
+    updated = now()
+
+    profile_ids, recency_days, frequency, monetary = aggregates(chunk_size, updated)
+
+    purchased = recency_days >= 0
+
+    recency_scores = scores(recency_days, purchased, reverse=True)
+    frequency_scores = scores(frequency, purchased)
+    monetary_values = monetary_scores(monetary)
+    segment_values = segments(recency_scores, frequency_scores)
+
+    for start in range(0, len(profile_ids), chunk_size):
+        end = start + chunk_size
+
+        Profile.objects.bulk_update([
+            Profile(pk=pk, rfm_recency=r, rfm_frequency=f, rfm_monetary=m, rfm_segment=s, rfm_updated=updated)
+            for pk, r, f, m, s in zip(
+                profile_ids[start:end].tolist(),
+                recency_scores[start:end].tolist(),
+                frequency_scores[start:end].tolist(),
+                monetary_values[start:end].tolist(),
+                segment_values[start:end].tolist(),
+            )
+        ], FIELDS, batch_size=1000)
+
+    values, counts = np.unique(segment_values, return_counts=True)
+
+    return dict(zip(values.tolist(), counts.tolist()))
@@ -0,0 +1,56 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from shop import flags
+from shop import fraud
+from shop import models
+from shop import reservations
+from shop import sales
+from shop import transitions
+
+logger = logging.getLogger(__name__)
+
+# Statuses in which the vouchers held for an order are sold to it
+PAID = (models.Order.STATUS_CHOICES.payment_completed, models.Order.STATUS_CHOICES.payment_verified)
+
+
+@receiver(post_save, sender=models.Store)
+def store_saved(sender, instance, **kwargs):
+    flags.refresh_store_flags(instance.code, instance)
+
+
+@receiver(post_delete, sender=models.Store)
+def store_deleted(sender, instance, **kwargs):
+    flags.refresh_store_flags(instance.code)
+
+
+@receiver(post_save, sender=models.Order)
+def order_saved(sender, instance, created, **kwargs):
+    if created:
+        # Score after commit, when the order products and totals of the order are saved too
+        transaction.on_commit(lambda: place_order(instance.pk))
+
+
+def place_order(order_id):
+    # The order is committed already; a scoring failure must not fail the checkout
+    try:
+        fraud.place(order_id)
+    except Exception:
+        logger.exception('fraud scoring of order %s failed', order_id)
+
+
+@receiver(transitions.status_changed, sender=models.Order)
+def order_status_changed(sender, logs, **kwargs):
+    sales.push_transitions(logs)
+
+    paid = [log.order_id for log in logs if log.new_status in PAID]
+    voided = [log.order_id for log in logs if log.new_status == models.Order.STATUS_CHOICES.voided]
+
+    if paid:
+        reservations.confirm(paid)
+
+    if voided:
+        reservations.release_orders(voided)
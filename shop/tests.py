@@ -1,3 +1,865 @@
-from django.test import TestCase
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import localdate, localtime, now
+
+from common import softdelete
+from common.network import client_ip
+from member.models import Profile
+from shop import archive
+from shop import callbacks
+from shop import deposits
+from shop import exports
+from shop import forecast
+from shop import fraud
+from shop import history
+from shop import legacy
+from shop import mileage
+from shop import models
+from shop import money
+from shop import recommendations
+from shop import refunds
+from shop import reservations
+from shop import sales
+from shop import segments
+from shop import transitions
+from shop.admin import transition_action
+from shop.middleware import UnderAttackMiddleware
+
+
+@override_settings(UNDER_ATTACK_CHALLENGE=False, UNDER_ATTACK_IP_CAPACITY=3, UNDER_ATTACK_PERIOD=60,
+                   UNDER_ATTACK_IP_HEADER='HTTP_X_FORWARDED_FOR', UNDER_ATTACK_PROXY_COUNT=1)
+class UnderAttackMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('shop.flags.under_attack', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = UnderAttackMiddleware(lambda request: HttpResponse())
+        self.factory = RequestFactory()
+
+    def request(self, forwarded_for):
+        return self.factory.get('/', HTTP_X_FORWARDED_FOR=forwarded_for)
+
+    def test_client_address_is_the_hop_added_by_the_proxy(self):
+        self.assertEqual(client_ip(self.request('6.6.6.6, 1.2.3.4')), '1.2.3.4')
+
+    def test_spoofed_hops_share_one_bucket(self):
+        statuses = [self.middleware(self.request(f'10.0.0.{i}, 1.2.3.4')).status_code for i in range(5)]
+        self.assertEqual(statuses, [200, 200, 200, 429, 429])
+
+    def test_previous_window_counts_across_the_edge(self):
+        for _ in range(3):
+            self.assertTrue(self.middleware.take_tokens([('ip:edge', 3)], 59.0))
+
+        # One second into the next window almost the whole previous window still counts
+        self.assertFalse(self.middleware.take_tokens([('ip:edge', 3)], 61.0))
+        # A full period later the previous window no longer counts
+        self.assertTrue(self.middleware.take_tokens([('ip:edge', 3)], 179.0))
+
+    def test_buckets_are_read_with_one_round_trip(self):
+        request = self.request('1.2.3.4')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = 'session'
+
+        with mock.patch('shop.middleware.cache.get_many', return_value={}) as get_many, \
+                mock.patch('shop.middleware.cache.get') as get:
+            self.assertEqual(self.middleware(request).status_code, 200)
+
+        get_many.assert_called_once()
+        get.assert_not_called()
+
+    def test_payment_callbacks_are_exempt_by_default(self):
+        path = reverse('shop:payment-callback', args=['credit_card'])
+        statuses = [
+            self.middleware(self.factory.post(path, HTTP_X_FORWARDED_FOR='1.2.3.4')).status_code for _ in range(5)
+        ]
+
+        self.assertEqual(statuses, [200] * 5)
+
+
+class MileageTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='mileage', password='secret')
+        self.profile = Profile.objects.create(user=self.user)
+
+    def log(self, amount, age=None):
+        log = mileage.add_mileage(self.user, amount)
+
+        if age is not None:
+            models.MileageLog.objects.filter(pk=log.pk).update(created=now() - age)
+
+        return log
+
+
+class MileageCheckpointTest(MileageTestCase):
+    def test_checkpoint_leaves_recent_logs_out(self):
+        old = self.log(100, timedelta(hours=2))
+        self.log(50)
+
+        self.assertEqual(mileage.create_checkpoints([self.user.pk], lag=60 * 60), 1)
+
+        checkpoint = models.MileageCheckpoint.objects.get(user=self.user)
+        self.assertEqual((checkpoint.log_id, checkpoint.mileage), (old.pk, Decimal('100.00')))
+        self.assertEqual(mileage.ledger_balances([self.user.pk]), {self.user.pk: Decimal('150.00')})
+        self.assertEqual(mileage.find_drift([self.user.pk]), [])
+
+    def test_no_checkpoint_without_old_logs(self):
+        self.log(50)
+
+        self.assertEqual(mileage.create_checkpoints([self.user.pk], lag=60 * 60), 0)
+
+
+class ExpireMileageTest(MileageTestCase):
+    def test_expires_unspent_old_grants(self):
+        self.log(100, timedelta(days=400))
+        self.log(-30, timedelta(days=10))
+        self.log(20)
+
+        self.assertEqual(mileage.expire_mileage([self.user.pk], now() - timedelta(days=365)),
+                         {self.user.pk: Decimal('70.00')})
+        self.assertEqual(mileage.expire_mileage([self.user.pk], now() - timedelta(days=365)), {})
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.mileage, Decimal('20.00'))
+
+    def test_expiration_is_clamped_at_the_balance(self):
+        self.log(100, timedelta(days=400))
+        # Drift: the balance lost 60 without a ledger entry
+        Profile.objects.filter(pk=self.profile.pk).update(mileage=Decimal('40.00'))
+
+        with self.assertLogs('shop.mileage', 'WARNING'):
+            expired = mileage.expire_mileage([self.user.pk], now() - timedelta(days=365))
+
+        self.assertEqual(expired, {self.user.pk: Decimal('40.00')})
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.mileage, Decimal('0.00'))
+
+
+class LegacyCustomerTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='legacy', email='old@example.com', password='x')
+        self.profile = Profile.objects.create(user=self.user)
+
+    def customer(self, customer_id, email, **order):
+        customer = models.LegacyCustomer.objects.create(customer_id=customer_id, email=email, last_name='k',
+                                                        first_name='m', date_joined=now())
+        if order:
+            models.LegacyOrder.objects.create(customer_id=customer, last_purchased=now(), **order)
+        return customer
+
+    def test_merge_uses_the_recorded_total_and_is_idempotent(self):
+        self.customer(1, 'OLD@example.com', total_order_count=3, last_total=Decimal('100.00'),
+                      max_price=Decimal('50.00'), average_price=Decimal('33.33'))
+
+        list(legacy.run())
+        list(legacy.run(restart=True))
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.total_order_count, 3)
+        self.assertEqual(self.profile.total_selling_price, Decimal('100.00'))
+        self.assertEqual(self.profile.average_price, Decimal('33.33'))
+        self.assertIsNotNone(models.LegacyCustomer.objects.get(customer_id=1).merged)
+
+    def test_order_lines_alone_do_not_count_as_orders(self):
+        customer = self.customer(2, 'old@example.com')
+        models.LegacyOrderProduct.objects.create(customer_id=customer, product_name='a')
+        models.LegacyOrderProduct.objects.create(customer_id=customer, product_name='b')
+
+        list(legacy.run())
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.total_order_count, 0)
+        self.assertEqual(self.profile.average_price, Decimal('0.00'))
+
+
+class FraudTest(TestCase):
+    def order(self, age, ip_address='10.0.0.1'):
+        order = models.Order.objects.create(ip_address=ip_address)
+        models.Order.all_objects.filter(pk=order.pk).update(created=now() - age)
+        return models.Order.all_objects.get(pk=order.pk)
+
+    def test_historical_velocity_counts_orders_before_each_order(self):
+        orders = [self.order(timedelta(days=10, minutes=minutes)) for minutes in (50, 40, 30, 20)]
+        self.order(timedelta(days=3))
+
+        features = fraud.historical_velocity(orders)
+
+        self.assertEqual([features[order.pk]['ip_1h'] for order in orders], [1, 2, 3, 4])
+        self.assertEqual(features[orders[-1].pk]['ip_24h'], 4)
+
+    def test_rescoring_clears_suspicious(self):
+        order = self.order(timedelta(days=1))
+        order.suspicious = True
+
+        fraud.evaluate(order, features={})
+
+        self.assertEqual((order.fraud_score, order.suspicious), (0, False))
+
+    def test_scoring_failure_after_commit_is_logged(self):
+        with mock.patch('shop.fraud.place', side_effect=RuntimeError('cache down')), \
+                self.assertLogs('shop.signals', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            models.Order.objects.create(ip_address='10.0.0.2')
+
+
+class OrderTestCase(TestCase):
+    def order(self, status=models.Order.STATUS_CHOICES.shipped, lines=(('A', 2), )):
+        order = models.Order.objects.create(status=status, currency='KRW', ip_address='10.0.0.1')
+
+        for code, quantity in lines:
+            models.OrderProduct.objects.create(order=order, code=code, name=code, list_price=Decimal('1000'),
+                                               selling_price=Decimal('900'), quantity=quantity)
+
+        return order
+
+    def status(self, order):
+        return models.Order.all_objects.get(pk=order.pk).status
+
+    def archive_order(self, order, age=timedelta(days=100)):
+        models.Order.all_objects.filter(Q(pk=order.pk) | Q(parent=order)).update(modified=now() - age)
+        return archive.archive_orders([order.pk])
+
+
+class PurgeTest(OrderTestCase):
+    def test_queryset_delete_stamps_the_removal_time(self):
+        order = self.order()
+        models.Order.objects.filter(pk=order.pk).update(modified=now() - timedelta(days=400))
+
+        models.Order.available_objects.filter(pk=order.pk).delete()
+
+        self.assertFalse(softdelete.purgeable(models.Order, now() - timedelta(days=365)).exists())
+        self.assertTrue(softdelete.purgeable(models.Order, now() + timedelta(minutes=1)).exists())
+
+    def test_rows_restored_since_they_were_picked_are_kept(self):
+        order = self.order()
+        models.Order.all_objects.filter(pk=order.pk).update(is_removed=True)
+
+        with mock.patch.object(softdelete, 'keyset_chunks', return_value=[[order.pk]]):
+            models.Order.all_objects.filter(pk=order.pk).update(is_removed=False)
+            self.assertEqual(list(softdelete.purge(models.Order, now() + timedelta(minutes=1))), [0])
+
+        self.assertTrue(models.Order.objects.filter(pk=order.pk).exists())
+
+    def test_removed_parents_of_live_refund_orders_are_kept(self):
+        order = self.order()
+        refund = self.order(status=models.Order.STATUS_CHOICES.refunded2)
+        models.Order.objects.filter(pk=refund.pk).update(parent=order)
+        order.delete()
+
+        self.assertEqual(list(softdelete.purge(models.Order, now() + timedelta(minutes=1))), [])
+
+        models.Order.objects.filter(pk=refund.pk).delete()
+
+        self.assertEqual(list(softdelete.purge(models.Order, now() + timedelta(minutes=1))), [2])
+
+    def test_zero_days_purges_every_removed_row(self):
+        order = self.order()
+        order.delete()
+
+        with mock.patch('common.management.commands.purge_soft_deleted.now',
+                        return_value=now() + timedelta(minutes=1)):
+            call_command('purge_soft_deleted', 'shop.Order', days=0, stdout=mock.Mock())
+
+        self.assertFalse(models.Order.all_objects.filter(pk=order.pk).exists())
+
+
+class TransitionTest(OrderTestCase):
+    def test_only_allowed_sources_move(self):
+        STATUS = models.Order.STATUS_CHOICES
+        pending = self.order(status=STATUS.payment_pending)
+        voided = self.order(status=STATUS.voided)
+
+        logs = transitions.transition([pending.pk, voided.pk], STATUS.payment_completed)
+
+        self.assertEqual([log.order_id for log in logs], [pending.pk])
+        self.assertEqual((self.status(pending), self.status(voided)), (STATUS.payment_completed, STATUS.voided))
+
+    def test_admin_action_counts_the_selection_before_moving_it(self):
+        STATUS = models.Order.STATUS_CHOICES
+        orders = [self.order(status=STATUS.payment_completed) for _ in range(2)]
+        action = transition_action('payment_verified')
+        modeladmin = mock.Mock()
+
+        action(modeladmin, mock.Mock(user=None), models.Order.objects.filter(status=STATUS.payment_completed))
+
+        self.assertIn('2 of 2', modeladmin.message_user.call_args[0][1])
+        self.assertEqual({self.status(order) for order in orders}, {STATUS.payment_verified})
+
+
+class RefundTest(OrderTestCase):
+    def lines(self, order):
+        return list(order.orderproduct_set.order_by('pk').values_list('pk', flat=True))
+
+    def test_lines_with_the_same_code_are_refunded_separately(self):
+        order = self.order(lines=(('A', 2), ('A', 3)))
+        first, second = self.lines(order)
+
+        refunds.refund_lines({first: None})
+        self.assertEqual(self.status(order), models.Order.STATUS_CHOICES.shipped)
+
+        refunds.refund_lines({second: 3})
+        self.assertEqual(self.status(order), models.Order.STATUS_CHOICES.refunded1)
+        self.assertEqual(refunds.refunded_quantities([order.pk]), {first: 2, second: 3})
+
+    def test_partial_refunds_never_exceed_the_line(self):
+        order = self.order()
+        line, = self.lines(order)
+
+        refunds.refund_lines({line: 1})
+        refunds.refund_lines({line: 5})
+
+        self.assertEqual(refunds.refund_lines({line: None}), [])
+        self.assertEqual(refunds.refunded_quantities([order.pk]), {line: 2})
+
+    def test_zero_quantity_is_rejected(self):
+        order = self.order()
+
+        with self.assertRaises(refunds.RefundError):
+            refunds.refund_lines({self.lines(order)[0]: 0})
+
+        self.assertEqual(refunds.refunded_quantities([order.pk]), {})
+
+    def test_unlinked_refund_lines_fill_lines_of_their_code_in_order(self):
+        order = self.order(lines=(('A', 2), ('A', 3)))
+        first, second = self.lines(order)
+
+        child = models.Order.objects.create(status=models.Order.STATUS_CHOICES.refunded2, parent=order,
+                                            ip_address='10.0.0.1')
+        models.OrderProduct.objects.create(order=child, code='A', name='A', list_price=Decimal('1000'),
+                                           selling_price=Decimal('900'), quantity=3)
+
+        self.assertEqual(refunds.refunded_quantities([order.pk]), {first: 2, second: 1})
+
+
+@override_settings(PAYMENT_CALLBACK_SECRET='secret')
+class CallbackTest(OrderTestCase):
+    def callback(self, order, transaction_id='T-1', status='paid', amount='900'):
+        body = json.dumps({'transaction_id': transaction_id, 'order_no': str(order.order_no),
+                           'amount': amount, 'status': status}).encode()
+        return callbacks.parse(callbacks.PG_METHODS['credit_card'], body)
+
+    def setUp(self):
+        self.pending = self.order(status=models.Order.STATUS_CHOICES.payment_pending)
+        models.Order.objects.filter(pk=self.pending.pk).update(
+            payment_method=models.Order.PAYMENT_METHOD_CHOICES.credit_card, total_selling_price=Decimal('900'))
+
+    def test_signature_headers_are_compared_as_bytes(self):
+        self.assertTrue(callbacks.verify(b'{}', callbacks.signature(b'{}')))
+        self.assertFalse(callbacks.verify(b'{}', 'sïgnature'))
+
+    def test_oversized_transaction_ids_are_rejected(self):
+        with self.assertRaises(callbacks.CallbackError):
+            self.callback(self.pending, transaction_id='T' * 65)
+
+    def test_each_event_of_a_transaction_is_queued_once(self):
+        self.assertTrue(callbacks.ingest(self.callback(self.pending, status='ready')))
+        self.assertTrue(callbacks.ingest(self.callback(self.pending)))
+        self.assertFalse(callbacks.ingest(self.callback(self.pending)))
+        self.assertEqual(models.PaymentCallback.objects.count(), 2)
+
+    def test_paid_callbacks_complete_matching_orders(self):
+        mismatch = self.order(status=models.Order.STATUS_CHOICES.payment_pending)
+        callbacks.ingest(self.callback(self.pending))
+        callbacks.ingest(self.callback(mismatch, transaction_id='T-2'))
+
+        self.assertEqual(sum(callbacks.run()), 2)
+        self.assertEqual(self.status(self.pending), models.Order.STATUS_CHOICES.payment_completed)
+        self.assertEqual(self.status(mismatch), models.Order.STATUS_CHOICES.payment_pending)
+        self.assertEqual(dict(models.PaymentCallback.objects.values_list('transaction_id', 'result')),
+                         {'T-1': models.PaymentCallback.RESULT_CHOICES.applied,
+                          'T-2': models.PaymentCallback.RESULT_CHOICES.mismatch})
+
+    def test_only_gateway_payment_methods_take_callbacks(self):
+        for method, status_code in (('bank_transfer', 404), ('credit_card', 403)):
+            response = self.client.post(f'/shop/payments/{method}/callback/', b'{}', content_type='application/json',
+                                        HTTP_X_SIGNATURE='sïgnature')
+            self.assertEqual(response.status_code, status_code)
+
+
+class DepositParseTest(SimpleTestCase):
+    message = '[KB] {}/{} 09:30 123***45 홍 길동 입금 10,000 잔액 50,000'
+
+    def received(self, month, day, sent):
+        return deposits.parse(self.message.format(month, day), sent).received
+
+    def test_year_follows_the_local_date_of_the_message(self):
+        # 1 Jan 00:30 in Seoul is still 31 Dec in UTC
+        sent = datetime(2025, 12, 31, 15, 30, tzinfo=timezone.utc)
+
+        self.assertEqual(self.received('01', '01', sent).year, 2026)
+        self.assertEqual(self.received('12', '31', sent).year, 2025)
+
+    def test_leap_day_read_in_a_common_year_belongs_to_last_year(self):
+        received = self.received('02', '29', datetime(2025, 3, 1, 3, tzinfo=timezone.utc))
+
+        self.assertEqual((received.year, received.month, received.day), (2024, 2, 29))
+
+    def test_impossible_date_is_not_a_deposit(self):
+        self.assertIsNone(deposits.parse(self.message.format('02', '30'), now()))
+
+
+class DepositMatchTest(OrderTestCase):
+    def message(self, amount):
+        today = localtime()
+        return models.ShortMessageService.objects.create(
+            content=f'[KB] {today:%m/%d} 00:00 123***45 홍 길동 입금 {amount} 잔액 50,000')
+
+    def test_unmatched_deposits_are_recorded_before_the_checkpoint_moves(self):
+        order = self.order(status=models.Order.STATUS_CHOICES.payment_pending)
+        models.Order.objects.filter(pk=order.pk).update(fullname='홍길동', total_selling_price=Decimal('10000'))
+        matched, unmatched = self.message('10,000'), self.message('20,000')
+        other = models.ShortMessageService.objects.create(content='hello')
+
+        batches = list(deposits.run())
+
+        DEPOSIT = models.ShortMessageService.DEPOSIT_CHOICES
+        self.assertEqual([(position, len(batch), len(left)) for position, batch, left in batches], [(other.pk, 2, 1)])
+        self.assertEqual(dict(models.ShortMessageService.objects.values_list('pk', 'deposit')),
+                         {matched.pk: DEPOSIT.matched, unmatched.pk: DEPOSIT.unmatched, other.pk: None})
+        self.assertEqual(self.status(order), models.Order.STATUS_CHOICES.payment_completed)
+
+
+class ExportTest(OrderTestCase):
+    def test_formulas_are_written_as_text(self):
+        order = self.order()
+        models.Order.objects.filter(pk=order.pk).update(fullname='=HYPERLINK("http://x","y")')
+
+        content = ''.join(exports.csv_stream('orders', models.Order.objects.all()))
+
+        self.assertIn('"\'=HYPERLINK(""http://x"",""y"")"', content)
+        self.assertEqual(exports.csv_value('-1+2'), "'-1+2")
+        self.assertEqual(exports.csv_value(Decimal('-1')), Decimal('-1'))
+
+    def test_xlsx_inline_strings_are_written_as_is(self):
+        self.assertEqual(exports.xlsx_cell('A1', '=1+2'), '<c r="A1" t="inlineStr"><is><t>=1+2</t></is></c>')
+
+
+class SalesTest(OrderTestCase):
+    def rollup(self):
+        return sorted(models.DailyProductSales.objects.values_list('code', 'currency', 'quantity', 'revenue'))
+
+    def test_currencies_are_rolled_up_separately(self):
+        krw = self.order()
+        usd = self.order()
+        models.Order.objects.filter(pk=usd.pk).update(currency='USD')
+
+        sales.push({krw.pk: 1, usd.pk: 1})
+
+        self.assertEqual(self.rollup(), [('A', 'KRW', 2, Decimal('1800.00')), ('A', 'USD', 2, Decimal('1800.00'))])
+
+    def test_pushes_skip_removed_orders_like_recompute(self):
+        live = self.order()
+        removed = self.order()
+        models.Order.objects.filter(pk=removed.pk).delete()
+
+        sales.push({live.pk: 1, removed.pk: 1})
+        pushed = self.rollup()
+        sales.recompute([localdate()])
+
+        self.assertEqual(pushed, [('A', 'KRW', 2, Decimal('1800.00'))])
+        self.assertEqual(self.rollup(), pushed)
+
+    def test_recompute_counts_archived_orders(self):
+        order = self.order()
+        refund = self.order(status=models.Order.STATUS_CHOICES.refunded2, lines=(('A', 1), ))
+        models.Order.objects.filter(pk=refund.pk).update(parent=order)
+
+        self.archive_order(order)
+        sales.recompute([localdate()])
+
+        self.assertFalse(models.Order.all_objects.exists())
+        self.assertEqual(self.rollup(), [('A', 'KRW', 1, Decimal('900.00'))])
+
+    def test_first_run_backfills_with_one_query(self):
+        self.order()
+
+        with mock.patch('shop.sales.recompute') as recompute:
+            self.assertEqual(sales.run(), {localdate()})
+
+        recompute.assert_not_called()
+        self.assertEqual(self.rollup(), [('A', 'KRW', 2, Decimal('1800.00'))])
+
+
+class MoneyTest(OrderTestCase):
+    def test_fractional_won_is_kept_exactly(self):
+        total = money.Money.from_decimal(Decimal('1000.50'), 'KRW') * 2
+
+        self.assertEqual(total.to_decimal(), Decimal('2001.00'))
+        self.assertEqual(money.Money.from_decimal(Decimal('9.99'), 'USD'), money.Money(999, 'USD'))
+
+    def test_currencies_do_not_mix(self):
+        with self.assertRaises(money.MoneyError):
+            money.Money(1, 'KRW') + money.Money(1, 'USD')
+
+    def test_storage_units_are_read_exactly_in_sql(self):
+        order = self.order()
+        models.OrderProduct.objects.update(selling_price=Decimal('900.50'))
+
+        rows = models.OrderProduct.objects \
+            .annotate(units=money.storage_units('selling_price')) \
+            .values_list('order_id', 'units')
+
+        self.assertEqual(dict(rows), {order.pk: 90050})
+
+    def test_rollup_matches_decimal_arithmetic_on_legacy_won(self):
+        order = self.order()
+        models.OrderProduct.objects.filter(order=order).update(selling_price=Decimal('1000.50'))
+        self.archive_order(self.order())
+        models.ArchivedOrder.objects.update(payload=archive.compress({
+            'order': {'created': now().isoformat(), 'currency': 'KRW', 'status': order.status, 'is_removed': False},
+            'products': [{'code': 'A', 'name': 'A', 'quantity': 2, 'selling_price': '1000.50', 'list_price': '1000',
+                          'is_removed': False}],
+        }))
+
+        self.assertEqual(sales.day_totals()[(localdate(), 'A', 'KRW')][:2], [4, Decimal('1000.50') * 4])
+
+    def test_totals_match_exact_sums(self):
+        keys = ['a', 'b', 'a', 'c', 'b']
+
+        for column in ([1, 2, 3, 4, -5], [2 ** 60, 1, 2 ** 60, 7, -1]):
+            distinct, sums = money.totals(keys, column)
+            expected = {key: sum(value for k, value in zip(keys, column) if k == key) for key in distinct}
+
+            self.assertEqual(dict(zip(distinct, sums[0].tolist())), expected)
+
+
+class ForecastTest(TestCase):
+    today = date(2026, 3, 1)
+
+    def setUp(self):
+        self.store = models.Store.objects.create(name='store', code='store')
+        self.category = models.Category.objects.create(store=self.store, title='category', slug='category',
+                                                       discount_rate=Decimal('0'))
+
+    def product(self, code, stock, minimum, maximum):
+        return models.Product.objects.create(
+            name=code, code=code, list_price=Decimal('1000'), selling_price=Decimal('900'), store=self.store,
+            category=self.category, position=0, status=models.Product.STATUS_CHOICES.enabled,
+            stock_quantity=stock, minimum_stock_level=minimum, maximum_stock_level=maximum)
+
+    def sold(self, code, days_ago, quantity):
+        models.DailyProductSales.objects.create(date=self.today - timedelta(days=days_ago), code=code, name=code,
+                                                quantity=quantity)
+
+    def test_sales_matrix_ends_yesterday(self):
+        self.sold('A', 1, 5)
+        self.sold('A', 3, 2)
+        self.sold('A', 0, 100)
+        self.sold('X', 1, 100)
+
+        matrix = forecast.sales_matrix(['A', 'B'], 4, self.today)
+
+        self.assertEqual(matrix.tolist(), [[0, 2, 0, 5], [0, 0, 0, 0]])
+
+    def test_demand_is_the_larger_moving_average_and_lead_time_triggers_reorders(self):
+        surge = self.product('A', stock=10, minimum=2, maximum=50)
+        steady = self.product('B', stock=100, minimum=5, maximum=200)
+        idle = self.product('C', stock=1, minimum=2, maximum=10)
+
+        for days_ago in range(1, 8):
+            self.sold('A', days_ago, 7)
+
+        for days_ago in range(1, 29):
+            self.sold('B', days_ago, 1)
+
+        suggestions = {suggestion.code: suggestion for suggestion in forecast.forecast(today=self.today)}
+
+        self.assertEqual(set(suggestions), {'A', 'C'})
+        # The 7 day average of 7 a day beats the 28 day average of 1.75; 10 units cover under the 3 lead days
+        self.assertEqual((suggestions['A'].demand, suggestions['A'].quantity), (7.0, 40))
+        self.assertAlmostEqual(suggestions['A'].cover, 10 / 7)
+        # No sales, but stock is at or below the minimum level
+        self.assertEqual((suggestions['C'].demand, suggestions['C'].quantity), (0.0, 9))
+        self.assertEqual((suggestions['A'].product_id, suggestions['C'].product_id), (surge.pk, idle.pk))
+        self.assertNotIn(steady.pk, [suggestion.product_id for suggestion in suggestions.values()])
+
+    def test_one_purchase_order_per_store(self):
+        other = models.Store.objects.create(name='other', code='other')
+        suggestions = [
+            forecast.Suggestion(1, self.store.pk, 'A', 'a', 0, 1.0, 0.0, 5),
+            forecast.Suggestion(2, self.store.pk, 'B', 'b', 0, 1.0, 0.0, 3),
+            forecast.Suggestion(3, other.pk, 'C', 'c', 0, 1.0, 0.0, 2),
+        ]
+
+        forecast.create_purchase_orders(suggestions, self.today)
+
+        self.assertEqual(sorted(models.PurchaseOrder.objects.values_list('title', 'content')), [
+            ('other 2026-03-01', 'C\tc\t2'),
+            ('store 2026-03-01', 'A\ta\t5\nB\tb\t3'),
+        ])
+
+
+class RecommendationTest(OrderTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def pair_counts(self):
+        return dict(((code, related_code), count) for code, related_code, count
+                    in models.ProductPair.objects.values_list('code', 'related_code', 'count'))
+
+    def test_run_follows_orders_into_and_out_of_verified(self):
+        STATUS = models.Order.STATUS_CHOICES
+        order = self.order(status=STATUS.payment_pending, lines=(('A', 1), ('B', 1)))
+
+        transitions.transition([order.pk], STATUS.payment_verified)
+        list(recommendations.run())
+        self.assertEqual(recommendations.related_products('A'), ['B'])
+
+        transitions.transition([order.pk], STATUS.refunded1)
+        list(recommendations.run())
+        self.assertEqual(self.pair_counts(), {('A', 'B'): 0, ('B', 'A'): 0})
+        self.assertEqual(recommendations.related_products('B'), [])
+
+    def test_rebuild_counts_archived_orders_once(self):
+        STATUS = models.Order.STATUS_CHOICES
+        archived = self.order(lines=(('A', 1), ('B', 1)))
+        self.archive_order(archived)
+
+        pending = self.order(status=STATUS.payment_pending, lines=(('A', 1), ('B', 1)))
+        transitions.transition([pending.pk], STATUS.payment_verified)
+
+        self.assertEqual([number for number, pairs in recommendations.rebuild(partitions=2)], [0, 1])
+        list(recommendations.run())
+
+        self.assertEqual(self.pair_counts(), {('A', 'B'): 2, ('B', 'A'): 2})
+
+    def test_rebuild_catches_up_with_logs_applied_during_the_pass(self):
+        STATUS = models.Order.STATUS_CHOICES
+        order = self.order(status=STATUS.payment_pending, lines=(('A', 1), ('B', 1)))
+
+        def verify_during_pass(*args, **kwargs):
+            # The order is verified and applied by the incremental run while the pass is counting
+            counted = count_partition(*args, **kwargs)
+            transitions.transition([order.pk], STATUS.payment_verified)
+            list(recommendations.run())
+            return counted
+
+        count_partition = recommendations.count_partition
+
+        with mock.patch('shop.recommendations.count_partition', side_effect=verify_during_pass):
+            list(recommendations.rebuild())
+
+        self.assertEqual(self.pair_counts(), {('A', 'B'): 1, ('B', 'A'): 1})
+
+    def test_cache_key_is_safe_for_any_code(self):
+        self.assertRegex(recommendations.cache_key('a b\n' + 'x' * 300), r'^shop:recommendations:[0-9a-f]{64}$')
+
+
+class SegmentTest(OrderTestCase):
+    def test_one_time_buyers_score_lowest_frequency(self):
+        frequency = np.array([1] * 7 + [2, 3, 10, 0])
+
+        self.assertEqual(segments.scores(frequency, frequency > 0).tolist(), [1] * 7 + [4, 5, 5, 0])
+
+    def test_recent_customers_score_high_recency(self):
+        days = np.array([0, 10, 10, 300, -1])
+
+        self.assertEqual(segments.scores(days, days >= 0, reverse=True).tolist(), [4, 2, 2, 1, 0])
+
+    def test_currencies_are_scored_apart(self):
+        # A large USD total is not ranked against KRW totals
+        monetary = np.array([[0, 0, 10000, 20000], [0, 50, 0, 0]], dtype=np.float64)
+
+        self.assertEqual(segments.monetary_scores(monetary).tolist(), [0, 1, 1, 3])
+
+    def test_archived_orders_are_purchases(self):
+        user = get_user_model().objects.create_user(username='segment', password='secret')
+        order = self.order()
+        usd = self.order()
+        models.Order.objects.filter(pk=order.pk).update(user=user, total_selling_price=Decimal('1800'))
+        models.Order.objects.filter(pk=usd.pk).update(user=user, total_selling_price=Decimal('20'), currency='USD')
+
+        self.archive_order(order)
+
+        last, count, totals = segments.purchases([user.pk])[user.pk]
+
+        self.assertEqual((count, totals), (2, {'KRW': Decimal('1800'), 'USD': Decimal('20')}))
+
+
+class ReservationTest(OrderTestCase):
+    def setUp(self):
+        self.store = models.Store.objects.create(name='store', code='store')
+        self.category = models.Category.objects.create(store=self.store, title='category', slug='category',
+                                                       discount_rate=Decimal('0'))
+
+    def product(self, code, vouchers):
+        product = models.Product.objects.create(name=code, code=code, list_price=Decimal('1000'),
+                                                selling_price=Decimal('900'), store=self.store,
+                                                category=self.category, position=0, stock_quantity=vouchers)
+
+        for number in range(vouchers):
+            models.Voucher.objects.create(product=product, code=f'{code}-{number}')
+
+        return product
+
+    def stock(self, product):
+        product = models.Product.all_objects.get(pk=product.pk)
+        return product.stock_quantity, product.stock_held, reservations.available_stock(product)
+
+    def test_hold_is_all_or_nothing(self):
+        a = self.product('a', 2)
+        b = self.product('b', 1)
+        order = self.order(status=models.Order.STATUS_CHOICES.payment_pending)
+
+        with self.assertRaises(reservations.ReservationError):
+            reservations.hold(order, {a.pk: 1, b.pk: 2})
+
+        self.assertFalse(models.VoucherHold.objects.exists())
+        self.assertEqual(self.stock(a), (2, 0, 2))
+
+    def test_confirm_sells_matched_holds_and_releases_the_others(self):
+        a = self.product('A', 2)
+        b = self.product('B', 1)
+        order = self.order(status=models.Order.STATUS_CHOICES.payment_pending, lines=(('A', 2), ))
+
+        reservations.hold(order, {a.pk: 2, b.pk: 1})
+        self.assertEqual(self.stock(a), (2, 2, 0))
+
+        self.assertEqual(reservations.confirm([order.pk]), 2)
+
+        self.assertEqual((self.stock(a), self.stock(b)), ((0, 0, 0), (1, 0, 1)))
+        self.assertEqual(
+            sorted(models.Voucher.all_objects.values_list('code', 'status')),
+            [('A-0', models.Voucher.STATUS_CHOICES.sold), ('A-1', models.Voucher.STATUS_CHOICES.sold),
+             ('B-0', models.Voucher.STATUS_CHOICES.purchased)],
+        )
+        self.assertEqual(models.OrderProductVoucher.all_objects.count(), 2)
+        self.assertFalse(models.VoucherHold.objects.exists())
+
+    def test_confirm_sells_no_more_than_the_ordered_quantity(self):
+        a = self.product('A', 3)
+        order = self.order(status=models.Order.STATUS_CHOICES.payment_pending, lines=(('A', 2), ))
+
+        reservations.hold(order, {a.pk: 2})
+        reservations.hold(order, {a.pk: 1})
+
+        self.assertEqual(reservations.confirm([order.pk]), 2)
+        self.assertEqual(self.stock(a), (1, 0, 1))
+        self.assertEqual(models.OrderProductVoucher.all_objects.count(), 2)
+
+    def test_expired_holds_are_released(self):
+        a = self.product('A', 3)
+        order = self.order(status=models.Order.STATUS_CHOICES.payment_pending)
+
+        expired = reservations.hold(order, {a.pk: 2})
+        reservations.hold(order, {a.pk: 1})
+        models.VoucherHold.objects.filter(pk__in=[h.pk for h in expired]).update(expires=now() - timedelta(seconds=1))
+
+        self.assertEqual(reservations.release_expired(batch_size=1), 2)
+        self.assertEqual(self.stock(a), (3, 1, 2))
+        self.assertEqual(models.VoucherHold.objects.count(), 1)
+
+    def test_archiving_an_order_releases_its_holds(self):
+        a = self.product('A', 2)
+        order = self.order()
+        reservations.hold(order, {a.pk: 2})
+
+        self.assertEqual(self.archive_order(order), 1)
+        self.assertEqual(self.stock(a), (2, 0, 2))
+        self.assertFalse(models.VoucherHold.objects.exists())
+
+
+class ArchiveTest(OrderTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='archive', password='secret')
+
+    def test_refund_orders_are_archived_only_with_their_parent(self):
+        order = self.order()
+        refund = self.order(status=models.Order.STATUS_CHOICES.refunded2, lines=(('A', 1), ))
+        models.Order.objects.filter(pk=refund.pk).update(parent=order, modified=now() - timedelta(days=100))
+
+        self.assertEqual(archive.archive_orders([refund.pk]), 0)
+        self.assertEqual(self.archive_order(order), 2)
+        self.assertEqual(set(models.ArchivedOrder.objects.values_list('order_id', 'parent_id')),
+                         {(order.pk, None), (refund.pk, order.pk)})
+
+    def test_orders_changed_since_they_were_picked_stay_hot(self):
+        order = self.order()
+
+        self.assertEqual(self.archive_order(order, age=timedelta(days=1)), 0)
+        self.assertTrue(models.Order.all_objects.filter(pk=order.pk).exists())
+
+    def test_mileage_logs_keep_the_archived_order(self):
+        Profile.objects.create(user=self.user)
+        order = self.order()
+        log = mileage.add_mileage(self.user, Decimal('100'), order=order)
+
+        self.archive_order(order)
+
+        log = models.MileageLog.all_objects.get(pk=log.pk)
+        self.assertEqual((log.order_id, log.archived_order_id), (None, order.pk))
+
+    def test_refunds_archived_apart_from_their_parent_still_count(self):
+        order = self.order()
+        line, = order.orderproduct_set.values_list('pk', flat=True)
+
+        models.ArchivedOrder.objects.create(
+            order_id=order.pk + 1000, order_no=uuid.uuid4(), parent_id=order.pk,
+            status=models.Order.STATUS_CHOICES.refunded2, created=now(),
+            payload=archive.compress({
+                'order': {'id': order.pk + 1000, 'parent_id': order.pk, 'is_removed': False},
+                'products': [{'code': 'A', 'quantity': 2, 'is_removed': False}],
+            }),
+        )
+
+        self.assertEqual(refunds.refunded_quantities([order.pk]), {line: 2})
+        self.assertEqual(refunds.refund_lines({line: None}), [])
+
+    def test_history_goes_on_into_the_archive(self):
+        orders = []
+
+        for age in (3, 2, 1):
+            order = self.order()
+            models.Order.objects.filter(pk=order.pk).update(user=self.user, created=now() - timedelta(days=age))
+            orders.append(order)
+
+        self.archive_order(orders[0])
+        self.archive_order(orders[1])
+
+        page, cursor = history.order_history(self.user, limit=2)
+        rest, end = history.order_history(self.user, cursor, limit=2)
+
+        self.assertEqual([order.pk for order in page + rest], [orders[2].pk, orders[1].pk, orders[0].pk])
+        self.assertEqual([product.code for product in rest[0].products], ['A'])
+        self.assertIsNone(end)
+
+    def test_archived_voucher_codes_stay_taken(self):
+        store = models.Store.objects.create(name='store', code='store')
+        category = models.Category.objects.create(store=store, title='category', slug='category',
+                                                  discount_rate=Decimal('0'))
+        product = models.Product.objects.create(name='A', code='A', list_price=Decimal('1000'),
+                                                selling_price=Decimal('900'), store=store, category=category,
+                                                position=0)
+        models.ArchivedVoucher.objects.create(voucher_id=1, product_id=product.pk, code='A-0',
+                                              status=models.Voucher.STATUS_CHOICES.sold,
+                                              created=now(), modified=now())
+
+        with self.assertRaises(ValidationError):
+            models.Voucher(product=product, code='A-0').validate_unique()
+
+    def test_admin_search_points_to_archived_orders(self):
+        order = self.order()
+        self.archive_order(order)
+        order_admin = admin.site._registry[models.Order]
+
+        with mock.patch.object(order_admin, 'message_user') as message_user:
+            queryset, may_have_duplicates = order_admin.get_search_results(
+                RequestFactory().get('/'), models.Order.all_objects.all(), str(order.order_no))
+
+        self.assertFalse(queryset.exists())
+        self.assertIn(f'?order_no={order.order_no}', message_user.call_args[0][1])
@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.dispatch import Signal
+from django.utils.timezone import now
+
+from shop import models
+
+STATUS = models.Order.STATUS_CHOICES
+
+# Target status: statuses an order may move from
+TRANSITIONS = {
+    STATUS.payment_completed: (STATUS.payment_pending,),
+    STATUS.under_review: (STATUS.payment_pending, STATUS.payment_completed),
+    STATUS.payment_verified: (STATUS.payment_pending, STATUS.payment_completed, STATUS.under_review),
+    STATUS.shipped: (STATUS.payment_verified,),
+    STATUS.refund_requested: (STATUS.payment_verified, STATUS.shipped),
+    STATUS.refund_pending: (STATUS.refund_requested,),
+    STATUS.refunded1: (STATUS.payment_verified, STATUS.shipped, STATUS.refund_requested, STATUS.refund_pending),
+    STATUS.voided: (STATUS.payment_pending, STATUS.payment_completed, STATUS.under_review),
+}
+
+# Sent once per bulk transition with the written `logs`, since a queryset update sends no model signals
+status_changed = Signal()
+
+
+class TransitionError(Exception):
+    pass
+
+
+def can_transition(old_status, new_status):
+    return old_status in TRANSITIONS.get(new_status, ())
+
+
+def transition(orders, new_status, actor=None, **fields):
+    """
+    Move orders to `new_status` with one guarded UPDATE and one log INSERT.
+
+    `orders` is an Order queryset or a list of order ids. Orders whose current status
+    is not a source of `new_status` in TRANSITIONS are skipped. Extra `fields` are set
+    by the same UPDATE. Returns the status logs of the orders that moved.
+    """
+    if new_status not in TRANSITIONS:
+        raise TransitionError(f'no transition to {new_status}')
+
+    sources = TRANSITIONS[new_status]
+
+    if isinstance(orders, QuerySet):
+        queryset = orders
+    else:
+        queryset = models.Order.available_objects.filter(pk__in=orders)
+
+    with transaction.atomic():
+        # Lock the movable rows so that the statuses logged are the ones replaced
+        current = list(queryset.select_for_update().filter(status__in=sources).values_list('pk', 'status'))
+
+        if not current:
+            return []
+
+        updated = models.Order.all_objects \
+            .filter(pk__in=[pk for pk, status in current], status__in=sources) \
+            .update(status=new_status, modified=now(), **fields)
+
+        if updated != len(current):
+            raise TransitionError(f'{len(current) - updated} orders changed during the transition')
+
+        actor_id = actor.pk if actor is not None else None
+
+        logs = models.OrderStatusLog.objects.bulk_create([
+            models.OrderStatusLog(order_id=pk, old_status=status, new_status=new_status, actor_id=actor_id)
+            for pk, status in current
+        ], batch_size=1000)
+
+        status_changed.send(sender=models.Order, logs=logs)
+
+    return logs
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from shop import views
+
+app_name = 'shop'
+
+urlpatterns = [
+    path('orders/', views.OrderHistoryView.as_view(), name='order-history'),
+    path('payments/<str:payment_method>/callback/', views.PaymentCallbackView.as_view(),
+         name='payment-callback'),
+    path('products/<str:code>/related/', views.RelatedProductsView.as_view(), name='related-products'),
+]
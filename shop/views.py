@@ -1,3 +1,75 @@
-from django.shortcuts import render
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import generic
+from django.views.decorators.csrf import csrf_exempt
 
-# Create your views here.
+from shop import callbacks
+from shop import history
+from shop import recommendations
+
+
+class RelatedProductsView(generic.View):
+    def get(self, request, code):
+        return JsonResponse({'code': code, 'related': recommendations.related_products(code)})
+
+
+class OrderHistoryView(LoginRequiredMixin, generic.View):
+    raise_exception = True
+
+    def get(self, request):
+        try:
+            orders, cursor = history.order_history(request.user,
+                                                   request.GET.get('cursor'),
+                                                   int(request.GET.get('limit', history.PAGE_SIZE)))
+        except ValueError:
+            return JsonResponse({'error': 'invalid cursor or limit'}, status=400)
+
+        return JsonResponse({
+            'orders': [
+                {
+                    'order_no': order.order_no,
+                    'status': order.get_status_display(),
+                    'payment_method': order.get_payment_method_display(),
+                    'total_list_price': order.total_list_price,
+                    'total_selling_price': order.total_selling_price,
+                    'currency': order.currency,
+                    'created': order.created,
+                    'products': [
+                        {
+                            'name': product.name,
+                            'subtitle': product.subtitle,
+                            'code': product.code,
+                            'list_price': product.list_price,
+                            'selling_price': product.selling_price,
+                            'quantity': product.quantity,
+                        }
+                        for product in order.products
+                    ],
+                }
+                for order in orders
+            ],
+            'next': cursor,
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class PaymentCallbackView(generic.View):
+    def post(self, request, payment_method):
+        payment_method = callbacks.PG_METHODS.get(payment_method)
+
+        if payment_method is None:
+            raise Http404
+
+        if not callbacks.verify(request.body, request.headers.get('X-Signature', '')):
+            return JsonResponse({'error': 'invalid signature'}, status=403)
+
+        try:
+            callback = callbacks.parse(payment_method, request.body)
+        except callbacks.CallbackError:
+            return JsonResponse({'error': 'malformed callback'}, status=400)
+
+        # Queued only; process_payment_callbacks applies it
+        callbacks.ingest(callback)
+
+        return JsonResponse({'result': 'ok'})